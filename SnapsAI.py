@@ -1,32 +1,818 @@
 import requests
-from typing import List, Dict, Any
 import random
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain.chains import RetrievalQA
-from langchain.schema import Document
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Callable, Tuple, TYPE_CHECKING
 import os
 import time
-from datetime import datetime, timedelta
+import threading
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict, Counter
+from bisect import bisect_left
+from functools import lru_cache
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import re
+import numpy as np
+from datetime import datetime, timedelta, timezone, date
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
+from requests.structures import CaseInsensitiveDict
 import logging
-from bson.objectid import ObjectId
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+# LLM/벡터 스토어 의존성(langchain, openai, httpx)은 RAGConverter를 처음 만들 때 불러옵니다.
+# LLM을 쓰지 않는 라우트와 워커 시작 시간에 수 초의 import 비용이 들지 않도록 합니다.
+if TYPE_CHECKING:
+    import httpx
 
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# 메트릭 (Prometheus 텍스트 형식)
+# 외부 의존성 없이 프로세스(워커)마다 집계하고, app_v1의 /metrics가 METRICS.render()로 내보냅니다.
+# 값 하나를 기록하는 비용은 잠금과 bisect 한 번이라 요청 경로에 켜 두어도 수 µs 수준입니다.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_LABEL_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", '"': '\\"'})
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value).translate(_LABEL_ESCAPES)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class MetricCounter:
+    """레이블 조합별로 누적되는 카운터"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}" for labels, value in values]
+
+class MetricHistogram:
+    """레이블 조합별 히스토그램 (버킷은 le 상한, 마지막은 +Inf)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 레이블 -> [버킷별 개수(누적 아님)..., +Inf 개수, 합계]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        lines = []
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> MetricCounter:
+        return self._register(MetricCounter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> MetricHistogram:
+        return self._register(MetricHistogram, name, documentation, labelnames, buckets)
+
+    def _register(self, cls, name, *args):
+        """같은 이름이면 이미 등록된 메트릭을 돌려줍니다 (모듈을 다시 불러와도 중복되지 않도록)."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+GRAPH_REQUEST_SECONDS = METRICS.histogram(
+    "snaps_graph_request_duration_seconds", "Graph API HTTP request latency per attempt",
+    ("service", "endpoint", "status"))
+GRAPH_RATE_LIMIT_WAIT_SECONDS = METRICS.histogram(
+    "snaps_graph_rate_limit_wait_seconds", "Time spent waiting for the per-token Graph API budget",
+    ("service",), buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 120.0))
+GRAPH_RETRIES = METRICS.counter(
+    "snaps_graph_retries_total", "Graph API request retries", ("service", "reason"))
+LLM_CALL_SECONDS = METRICS.histogram(
+    "snaps_llm_call_duration_seconds", "LLM and embedding call latency including client retries",
+    ("operation", "model", "outcome"))
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = METRICS.histogram(
+    "snaps_llm_time_to_first_token_seconds", "Time to the first streamed LLM token", ("model",))
+LLM_TOKENS = METRICS.counter("snaps_llm_tokens_total", "LLM tokens used", ("model", "kind"))
+LLM_HTTP_SECONDS = METRICS.histogram(
+    "snaps_llm_http_response_seconds", "OpenAI API time to response headers per attempt", ("endpoint", "status"))
+LLM_RETRIES = METRICS.counter("snaps_llm_retries_total", "OpenAI API request retries", ("endpoint",))
+
+# 요청 하나가 외부 의존성(graph/llm/db)에서 쓴 시간. app_v1이 요청마다 DependencyTimings를 두고,
+# 각 호출 지점이 record_dependency_time으로 더합니다 (워커 스레드는 with_request_context로 전달).
+_dependency_timings = contextvars.ContextVar("dependency_timings", default=None)
+
+class DependencyTimings:
+    """의존성별 소요 시간 합계 (동시에 실행된 호출은 합산되어 요청 시간보다 클 수 있음)"""
+
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, dependency: str, seconds: float):
+        with self._lock:
+            self.totals[dependency] = self.totals.get(dependency, 0.0) + seconds
+
+@contextmanager
+def track_dependencies():
+    """with 블록 안(과 with_request_context로 넘긴 작업)의 의존성 시간을 모읍니다."""
+    timings = DependencyTimings()
+    token = _dependency_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _dependency_timings.reset(token)
+
+def record_dependency_time(dependency: str, seconds: float):
+    timings = _dependency_timings.get()
+    if timings is not None:
+        timings.add(dependency, seconds)
+
+# Graph API 전송 계층 설정
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "20"))
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", "3.05"))
+GRAPH_READ_TIMEOUT = float(os.getenv("GRAPH_READ_TIMEOUT", "15"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "3"))
+GRAPH_BACKOFF_FACTOR = float(os.getenv("GRAPH_BACKOFF_FACTOR", "0.5"))
+
+# Graph API 호출 예산(토큰별 rate limit) 설정
+GRAPH_RATE_LIMIT = os.getenv("GRAPH_RATE_LIMIT", "True") == "True"
+GRAPH_SINGLE_FLIGHT = os.getenv("GRAPH_SINGLE_FLIGHT", "True") == "True"  # 동일한 동시 GET 요청 합치기
+GRAPH_RATE_PER_SECOND = float(os.getenv("GRAPH_RATE_PER_SECOND", "5"))  # 토큰당 기본 호출 속도
+GRAPH_RATE_BURST = float(os.getenv("GRAPH_RATE_BURST", "50"))  # 토큰당 순간 최대 호출 수
+GRAPH_RATE_MAX_WAIT = float(os.getenv("GRAPH_RATE_MAX_WAIT", "10"))  # 사용자 요청이 예산을 기다릴 최대 시간(초)
+GRAPH_RATE_BACKGROUND_MAX_WAIT = float(os.getenv("GRAPH_RATE_BACKGROUND_MAX_WAIT", "120"))
+GRAPH_RATE_COOLDOWN = float(os.getenv("GRAPH_RATE_COOLDOWN", "60"))  # 한도 초과 응답 후 호출을 멈출 기본 시간(초)
+
+# 호출 우선순위: 사용자 요청(interactive)이 백그라운드 동기화/게시 작업보다 먼저 예산을 받음
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+_graph_priority = contextvars.ContextVar("graph_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def graph_priority(priority: int):
+    """with 블록 안의 Graph API 호출 우선순위를 지정합니다 (백그라운드 작업에서 PRIORITY_BACKGROUND)."""
+    token = _graph_priority.set(priority)
+    try:
+        yield
+    finally:
+        _graph_priority.reset(token)
+
+def with_request_context(fn):
+    """워커 스레드에서 실행되는 함수도 현재 호출 우선순위와 의존성 시간 집계를 따르도록 감쌉니다."""
+    priority = _graph_priority.get()
+    timings = _dependency_timings.get()
+
+    def run(*args, **kwargs):
+        token = _dependency_timings.set(timings)
+        try:
+            with graph_priority(priority):
+                return fn(*args, **kwargs)
+        finally:
+            _dependency_timings.reset(token)
+    return run
+
+class GraphRateLimitError(RequestException):
+    """호출 예산을 최대 대기 시간 안에 받지 못함"""
+
+class TokenBudget:
+    """액세스 토큰 하나의 호출 예산 (토큰 버킷)
+
+    응답의 사용량 헤더(0~100%)가 50%를 넘으면 채워지는 속도를 줄이고, 100%이거나 한도 초과
+    응답을 받으면 blocked_until까지 호출을 멈춥니다. 백그라운드 호출은 사용자 요청이 기다리는
+    동안이나 버킷이 BACKGROUND_RESERVE 아래일 때 예산을 가져가지 않습니다.
+    """
+
+    BACKGROUND_RESERVE = 0.2  # 사용자 요청용으로 남겨 두는 버킷 비율
+    MIN_RATE_FACTOR = 0.05
+
+    def __init__(self, rate: float = GRAPH_RATE_PER_SECOND, capacity: float = GRAPH_RATE_BURST):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.usage = None  # 마지막으로 본 사용량(%)
+        self.calls = 0
+        self.rate_limited = 0  # 한도 초과 응답 수
+        self._waiting = [0, 0]  # 우선순위별 대기 중인 호출 수
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> float:
+        """예산 하나를 가져오고 기다린 시간(초)을 반환합니다. timeout 안에 받지 못하면 GraphRateLimitError."""
+        if timeout is None:
+            timeout = GRAPH_RATE_BACKGROUND_MAX_WAIT if priority == PRIORITY_BACKGROUND else GRAPH_RATE_MAX_WAIT
+        start = time.monotonic()
+        deadline = start + timeout
+        reserve = self.capacity * self.BACKGROUND_RESERVE if priority == PRIORITY_BACKGROUND else 0.0
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ahead = any(self._waiting[p] for p in range(priority))
+                    if now >= self.blocked_until and not ahead and self.tokens >= 1 + reserve:
+                        self.tokens -= 1
+                        self.calls += 1
+                        return now - start
+                    if now >= deadline:
+                        raise GraphRateLimitError(f"Graph API budget exhausted (waited {now - start:.1f}s)")
+                    wait = max(self.blocked_until - now, (1 + reserve - self.tokens) / self.rate, 0.001)
+                    self._condition.wait(min(wait, deadline - now))
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+    def update(self, usage: Optional[float] = None, regain_seconds: float = 0.0, limited: bool = False):
+        """응답 헤더/오류로 예산을 조정합니다."""
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            if usage is not None:
+                self.usage = usage
+                self.rate = self.base_rate * max(self.MIN_RATE_FACTOR, min(1.0, (100 - usage) / 50))
+                if usage >= 100:
+                    limited = True
+            if limited:
+                self.rate_limited += 1
+                self.tokens = min(self.tokens, 0.0)
+                self.blocked_until = max(self.blocked_until, now + (regain_seconds or GRAPH_RATE_COOLDOWN))
+            self._condition.notify_all()
+
+    def state(self) -> Dict[str, Any]:
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "tokens": round(self.tokens, 2),
+                "capacity": self.capacity,
+                "rate_per_second": round(self.rate, 3),
+                "usage_percent": self.usage,
+                "blocked_for": round(max(0.0, self.blocked_until - now), 1),
+                "waiting": {"interactive": self._waiting[PRIORITY_INTERACTIVE],
+                            "background": self._waiting[PRIORITY_BACKGROUND]},
+                "calls": self.calls,
+                "rate_limited": self.rate_limited
+            }
+
+class GraphRateLimiter:
+    """액세스 토큰별 TokenBudget 모음 (LRU, 토큰 원문 대신 지문으로 상태 노출)"""
+
+    # Graph API 한도 초과 오류 코드 (앱/사용자/페이지/BUC 한도)
+    RATE_LIMIT_ERROR_CODES = frozenset({4, 17, 32, 613, 80001, 80002, 80006})
+
+    def __init__(self, rate: float = GRAPH_RATE_PER_SECOND, capacity: float = GRAPH_RATE_BURST,
+                 max_tokens: int = 4096):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_tokens = max_tokens
+        self._budgets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:12]
+
+    def budget(self, access_token: str) -> TokenBudget:
+        with self._lock:
+            budget = self._budgets.get(access_token)
+            if budget is None:
+                budget = self._budgets[access_token] = TokenBudget(self.rate, self.capacity)
+                while len(self._budgets) > self.max_tokens:
+                    self._budgets.popitem(last=False)
+            else:
+                self._budgets.move_to_end(access_token)
+            return budget
+
+    def observe(self, access_token: str, response: requests.Response) -> bool:
+        """응답의 사용량 헤더와 한도 초과 오류를 예산에 반영하고, 한도 초과 응답이면 True를 반환합니다."""
+        usage, regain_seconds = self.parse_usage(response.headers)
+        limited = response.status_code == 429 or self.is_rate_limit_error(response)
+        if limited and not regain_seconds:
+            try:
+                regain_seconds = float(response.headers.get("Retry-After", 0))
+            except ValueError:
+                regain_seconds = 0.0
+        if usage is not None or limited:
+            self.budget(access_token).update(usage, regain_seconds, limited)
+        return limited
+
+    @staticmethod
+    def parse_usage(headers) -> tuple:
+        """X-App-Usage / X-Business-Use-Case-Usage 헤더에서 (최대 사용량 %, 회복까지 남은 초)를 구합니다."""
+        usage = None
+        regain_minutes = 0
+        app_usage = headers.get("X-App-Usage")
+        buc_usage = headers.get("X-Business-Use-Case-Usage")
+        try:
+            if app_usage:
+                usage = max(float(value) for value in json.loads(app_usage).values())
+            if buc_usage:
+                for entries in json.loads(buc_usage).values():
+                    for entry in entries:
+                        values = [float(entry.get(key) or 0) for key in ("call_count", "total_cputime", "total_time")]
+                        usage = max([usage or 0.0] + values)
+                        regain_minutes = max(regain_minutes, float(entry.get("estimated_time_to_regain_access") or 0))
+        except (ValueError, TypeError, AttributeError):
+            logger.warning("Could not parse Graph API usage headers")
+        return usage, regain_minutes * 60
+
+    def is_rate_limit_error(self, response: requests.Response) -> bool:
+        if response.status_code < 400 or "json" not in response.headers.get("Content-Type", ""):
+            return False
+        try:
+            code = (response.json().get("error") or {}).get("code")
+        except ValueError:
+            return False
+        return code in self.RATE_LIMIT_ERROR_CODES
+
+    def state(self, access_token: Optional[str] = None) -> Dict[str, Any]:
+        """토큰 하나(또는 전체)의 현재 예산 상태"""
+        if access_token is not None:
+            return {"token": self.fingerprint(access_token), **self.budget(access_token).state()}
+        with self._lock:
+            budgets = list(self._budgets.items())
+        return {self.fingerprint(token): budget.state() for token, budget in budgets}
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 호출을 하나로 합쳐, 먼저 온 호출(leader)의 결과나 예외를 함께 받습니다.
+
+    lock_dir를 지정하면 leader가 키별 파일 잠금(fcntl)도 잡으므로 다른 워커 프로세스의 같은 호출은
+    잠금이 풀릴 때까지 기다린 뒤 실행됩니다. 결과를 프로세스 간에 넘기지는 않으므로, 호출하는
+    쪽에서 앞선 실행 결과를 재사용할 수 있어야 합니다 (예: 저장소 신선도 확인 후 바로 반환).
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.coalesced = 0  # leader의 결과를 공유받은 호출 수
+        self._flights = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            with self._process_lock(key):
+                flight.result = fn(*args, **kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    @contextmanager
+    def _process_lock(self, key):
+        if not self.lock_dir:
+            yield
+            return
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        with open(os.path.join(self.lock_dir, f"{digest}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+_GRAPH_VERSION_RE = re.compile(r"v\d+(\.\d+)?")
+
+def graph_metric_labels(url: str) -> Tuple[str, str]:
+    """메트릭 레이블용 (서비스, 경로 템플릿)"""
+    parts = urlsplit(url)
+    return _graph_metric_labels(parts.netloc, parts.path)
+
+@lru_cache(maxsize=1024)
+def _graph_metric_labels(netloc: str, path: str) -> Tuple[str, str]:
+    # 버전은 빼고 숫자가 들어간 조각(게시물/계정/컨테이너 ID)은 {id}로 바꿔 레이블 수가 늘지 않게 함
+    service = "instagram" if "instagram" in netloc else "threads" if "threads" in netloc else netloc
+    segments = ["{id}" if any(ch.isdigit() for ch in segment) else segment
+                for segment in path.split("/") if segment and not _GRAPH_VERSION_RE.fullmatch(segment)]
+    return service, "/" + "/".join(segments)
+
+def copy_response(response: requests.Response) -> requests.Response:
+    """본문을 읽어 둔 Response의 복사본 (헤더/쿠키는 복사하고 본문 bytes는 공유)
+
+    json()은 호출마다 새로 파싱하므로, 같은 응답을 받은 호출끼리 파싱 결과를 고쳐도 서로 영향이 없습니다.
+    """
+    copy = requests.Response()
+    copy.status_code = response.status_code
+    copy.reason = response.reason
+    copy.url = response.url
+    copy.encoding = response.encoding
+    copy.headers = CaseInsensitiveDict(response.headers)
+    copy.cookies = response.cookies.copy()
+    copy.elapsed = response.elapsed
+    copy.request = response.request
+    copy.history = list(response.history)
+    copy._content = response.content
+    copy._content_consumed = True
+    return copy
+
+class GraphTransport:
+    """InstagramAPI/ThreadAPI가 공유하는 HTTP 전송 계층
+
+    keep-alive 커넥션 풀(requests.Session), 연결/읽기 타임아웃, 5xx/429 응답에 대한
+    지터 백오프 재시도를 제공합니다. POST는 중복 게시를 막기 위해 429(또는 한도 초과 오류)일
+    때만 재시도합니다. rate_limiter가 있으면 요청마다 액세스 토큰별 예산을 먼저 받습니다.
+    single_flight가 있으면 URL과 파라미터(access_token 포함)가 같은 동시 GET 요청은 하나만 보내고,
+    본문을 미리 읽어 둔 응답을 호출마다 따로 복사해 돌려줍니다 (본문 bytes만 공유).
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "DELETE"})
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, pool_size: int = GRAPH_POOL_SIZE, connect_timeout: float = GRAPH_CONNECT_TIMEOUT,
+                 read_timeout: float = GRAPH_READ_TIMEOUT, max_retries: int = GRAPH_MAX_RETRIES,
+                 backoff_factor: float = GRAPH_BACKOFF_FACTOR,
+                 rate_limiter: Optional[GraphRateLimiter] = None,
+                 single_flight: Optional[SingleFlight] = None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter
+        self.single_flight = single_flight
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        method = method.upper()
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            if method == "GET" and self.single_flight is not None and set(kwargs) <= {"params", "timeout"}:
+                key = (url, json.dumps(kwargs.get("params"), sort_keys=True, default=str))
+                return copy_response(self.single_flight.do(key, self._send_buffered, method, url, **kwargs))
+            return self._send(method, url, **kwargs)
+        finally:
+            # 예산 대기, 재시도 백오프, 같은 요청을 합쳐 기다린 시간까지 요청의 Graph API 시간으로 집계
+            record_dependency_time("graph", time.perf_counter() - started)
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        idempotent = method in self.IDEMPOTENT_METHODS
+        access_token = self._access_token(url, kwargs) if self.rate_limiter is not None else None
+        service, endpoint = graph_metric_labels(url)
+        attempt = 0
+        while True:
+            if access_token:
+                waited = self.rate_limiter.budget(access_token).acquire(_graph_priority.get())
+                GRAPH_RATE_LIMIT_WAIT_SECONDS.observe(waited, service)
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                reason = "timeout" if isinstance(e, requests.Timeout) else "connection_error"
+                GRAPH_REQUEST_SECONDS.observe(time.perf_counter() - started, service, endpoint, reason)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                GRAPH_REQUEST_SECONDS.observe(time.perf_counter() - started, service, endpoint, response.status_code)
+                limited = access_token is not None and self.rate_limiter.observe(access_token, response)
+                retryable = limited or response.status_code in self.RETRY_STATUSES and (
+                    idempotent or response.status_code == 429
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                # 한도 초과면 다음 시도는 예산(acquire)이 회복될 때까지 대기
+                delay = 0.0 if limited else max(self._backoff(attempt), self._retry_after(response))
+                reason = "rate_limited" if limited else str(response.status_code)
+                response.close()
+            GRAPH_RETRIES.inc(service, reason)
+            attempt += 1
+            logger.warning(f"Retrying {method} {url.split('?')[0]} in {delay:.2f}s (attempt {attempt})")
+            time.sleep(delay)
+
+    def _send_buffered(self, method: str, url: str, **kwargs) -> requests.Response:
+        """본문을 모두 읽고 커넥션을 풀에 돌려준 응답 (합쳐진 호출들이 복사해 씀)"""
+        response = self._send(method, url, **kwargs)
+        response.content
+        response.close()
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def _backoff(self, attempt: int) -> float:
+        """full jitter 지수 백오프"""
+        return random.uniform(0, min(self.MAX_BACKOFF, self.backoff_factor * (2 ** attempt)))
+
+    @staticmethod
+    def _access_token(url: str, kwargs: Dict[str, Any]) -> Optional[str]:
+        """요청의 access_token (params, JSON/form 본문, paging.next URL 쿼리 순)"""
+        for key in ("params", "json", "data"):
+            value = kwargs.get(key)
+            if isinstance(value, dict) and value.get("access_token"):
+                return value["access_token"]
+        values = parse_qs(urlsplit(url).query).get("access_token")
+        return values[0] if values else None
+
+    def _retry_after(self, response: requests.Response) -> float:
+        try:
+            return min(self.MAX_BACKOFF, float(response.headers.get("Retry-After", 0)))
+        except ValueError:
+            return 0.0
+
+_graph_transport = None
+_graph_transport_lock = threading.Lock()
+
+def get_graph_transport() -> GraphTransport:
+    """프로세스 전역에서 공유하는 GraphTransport를 지연 생성하여 반환합니다."""
+    global _graph_transport
+    if _graph_transport is None:
+        with _graph_transport_lock:
+            if _graph_transport is None:
+                _graph_transport = GraphTransport(rate_limiter=GraphRateLimiter() if GRAPH_RATE_LIMIT else None,
+                                                  single_flight=SingleFlight() if GRAPH_SINGLE_FLIGHT else None)
+    return _graph_transport
+
+# 다음 페이지를 미리 가져오는 공유 워커 풀
+_prefetch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("GRAPH_PREFETCH_WORKERS", "4")),
+                                        thread_name_prefix="graph-prefetch")
+
+def _to_unix_time(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+def _day_start(day: date) -> int:
+    """날짜의 UTC 자정을 Unix 시각으로 변환합니다 (threads_insights since/until 파라미터용)."""
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+def iter_graph_pages(transport: GraphTransport, url: str, params: Dict[str, Any],
+                     since=None, until=None, max_items: Optional[int] = None,
+                     prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+    """Graph API 커서 페이지네이션(paging.next)을 따라가며 항목을 하나씩 yield 합니다.
+
+    호출자가 현재 페이지를 처리하는 동안 다음 페이지를 백그라운드에서 미리 가져옵니다.
+    항목은 최신순이라고 가정하고, since/until(unix time 또는 datetime)을 API 파라미터로
+    넘기는 동시에 timestamp로 한 번 더 걸러 since보다 오래된 항목을 만나면 멈춥니다.
+    """
+    since, until = _to_unix_time(since), _to_unix_time(until)
+    params = dict(params)
+    if since is not None:
+        params["since"] = since
+    if until is not None:
+        params["until"] = until
+
+    def fetch(page_url, page_params=None):
+        response = transport.get(page_url, params=page_params)
+        response.raise_for_status()
+        return response.json()
+
+    page = fetch(url, params)
+    yielded = 0
+    future = None
+    try:
+        while True:
+            items = page.get("data", [])
+            next_url = (page.get("paging") or {}).get("next")
+            remaining = None if max_items is None else max_items - yielded
+            future = None
+            if prefetch and next_url and items and (remaining is None or len(items) < remaining):
+                future = _prefetch_executor.submit(with_request_context(fetch), next_url)
+
+            for item in items:
+                timestamp = item.get("timestamp")
+                if timestamp and (since is not None or until is not None):
+                    created = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+                    if until is not None and created > until:
+                        continue
+                    if since is not None and created < since:
+                        return
+                yield item
+                yielded += 1
+                if max_items is not None and yielded >= max_items:
+                    return
+
+            if not next_url or not items:
+                return
+            page = future.result() if future is not None else fetch(next_url)
+    finally:
+        # 호출자가 중간에 멈추면(since 도달, max_items, 제너레이터 close) 미리 가져오던 다음 페이지는 필요 없음
+        # 아직 시작하지 않은 요청은 취소하고, 이미 보낸 요청은 결과를 버림
+        if future is not None:
+            future.cancel()
+
+class InstagramStatistics:
+    """Instagram 게시물 통계 집계기 (증분 업데이트)
+
+    게시물 묶음이 들어올 때마다 시간대별 분포와 참여 합계는 NumPy 배열 연산으로, 유형/해시태그
+    빈도는 Counter로 누적합니다 (문자열 빈도는 np.unique 정렬보다 Counter가 몇 배 빠름).
+    이미 집계한 게시물이 다시 들어오면 좋아요/댓글 수만 차이만큼 갱신하므로 summary()는 게시물 수와
+    무관하게 빠릅니다.
+    """
+
+    HASHTAG_PATTERN = re.compile(r"#(\w+)")
+
+    def __init__(self, utc_offset_hours: int = int(os.getenv("STATS_UTC_OFFSET_HOURS", "9"))):
+        self.utc_offset_hours = utc_offset_hours
+        self.total_posts = 0
+        self.total_likes = 0
+        self.total_comments = 0
+        self.newest_timestamp = None  # 가장 최근 게시물의 unix time
+        self.hour_counts = np.zeros(24, dtype=np.int64)
+        self.type_counts = Counter()
+        self.hashtag_counts = Counter()
+        self._engagement = {}  # 게시물 id -> (좋아요 수, 댓글 수)
+        self._lock = threading.Lock()
+
+    def add_posts(self, media_items: List[Dict[str, Any]]) -> int:
+        """새 게시물은 집계에 더하고 이미 본 게시물은 좋아요/댓글 수를 갱신합니다. 새 게시물 수를 반환합니다."""
+        with self._lock:
+            items = []
+            for item in media_items:
+                engagement = (item.get("like_count") or 0, item.get("comments_count") or 0)
+                previous = self._engagement.get(item.get("id"))
+                if previous is None:
+                    items.append(item)
+                else:
+                    self.total_likes += engagement[0] - previous[0]
+                    self.total_comments += engagement[1] - previous[1]
+                self._engagement[item.get("id")] = engagement
+            if not items:
+                return 0
+
+            # Graph API timestamp는 항상 UTC(+0000)이므로 앞 19자리만 datetime64로 변환
+            timestamps = np.array([item["timestamp"][:19] for item in items], dtype="datetime64[s]").astype(np.int64)
+            hours = ((timestamps // 3600) + self.utc_offset_hours) % 24
+            self.hour_counts += np.bincount(hours, minlength=24)
+            newest = int(timestamps.max())
+            self.newest_timestamp = newest if self.newest_timestamp is None else max(self.newest_timestamp, newest)
+
+            self.type_counts.update(item.get("media_type") or "UNKNOWN" for item in items)
+            captions = "\n".join(item.get("caption") or "" for item in items)
+            self.hashtag_counts.update(self.HASHTAG_PATTERN.findall(captions.lower()))
+
+            self.total_likes += int(np.fromiter((item.get("like_count") or 0 for item in items), dtype=np.int64).sum())
+            self.total_comments += int(np.fromiter((item.get("comments_count") or 0 for item in items),
+                                                   dtype=np.int64).sum())
+            self.total_posts += len(items)
+            return len(items)
+
+    def summary(self, top_n: int = 5) -> Dict[str, Any]:
+        with self._lock:
+            popular_hashtags = self.hashtag_counts.most_common(top_n)
+            active_hours = np.flatnonzero(self.hour_counts)
+            peak_hours = active_hours[np.argsort(-self.hour_counts[active_hours], kind="stable")[:top_n]]
+            peak_posting_hours = [(int(hour), int(self.hour_counts[hour])) for hour in np.sort(peak_hours)]
+
+            return {
+                "total_posts": self.total_posts,
+                "post_types": dict(self.type_counts),
+                "popular_hashtags": popular_hashtags,
+                "peak_posting_hours": peak_posting_hours,
+                "total_likes": self.total_likes,
+                "total_comments": self.total_comments,
+                "avg_likes": round(self.total_likes / self.total_posts, 2) if self.total_posts else 0,
+                "avg_comments": round(self.total_comments / self.total_posts, 2) if self.total_posts else 0
+            }
+
+# 게시(컨테이너 생성 -> 준비 대기 -> 게시) 설정, Instagram/Thread 공통
+THREAD_PUBLISH_TIMEOUT = float(os.getenv('THREAD_PUBLISH_TIMEOUT', '300'))  # 컨테이너 준비 대기 최대 시간(초)
+THREAD_PUBLISH_POLL_INITIAL = float(os.getenv('THREAD_PUBLISH_POLL_INITIAL', '1'))
+THREAD_PUBLISH_POLL_MAX = float(os.getenv('THREAD_PUBLISH_POLL_MAX', '30'))
+
+class MediaPublishError(Exception):
+    """컨테이너가 ERROR/EXPIRED 상태라 게시할 수 없음 (재시도해도 성공하지 않음)"""
+
+class ThreadPublishError(MediaPublishError):
+    pass
+
+def wait_for_media_container(fetch_status, container_id, timeout: float = THREAD_PUBLISH_TIMEOUT,
+                             on_poll=None, error_class=MediaPublishError) -> str:
+    """컨테이너가 게시 가능한 상태가 될 때까지 지수 백오프로 상태를 조회하고 최종 상태를 반환합니다.
+
+    fetch_status는 (상태, 오류 메시지)를 반환합니다. FINISHED/PUBLISHED면 반환하고, ERROR/EXPIRED면
+    error_class, 시간 초과면 TimeoutError를 발생시킵니다. on_poll은 조회할 때마다 호출됩니다 (작업 임대 연장 등).
+    """
+    deadline = time.monotonic() + timeout
+    delay = THREAD_PUBLISH_POLL_INITIAL
+    while True:
+        if on_poll is not None:
+            on_poll()
+        status, message = fetch_status()
+        if status in ('FINISHED', 'PUBLISHED'):
+            return status
+        if status in ('ERROR', 'EXPIRED'):
+            raise error_class(f"Container {container_id} {status}: {message or ''}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Container {container_id} not ready after {timeout:.0f}s")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, THREAD_PUBLISH_POLL_MAX)
+
 class InstagramAPI:
-    BASE_URL = "https://graph.instagram.com/v12.0"
+    BASE_URL = os.getenv("INSTAGRAM_GRAPH_URL", "https://graph.instagram.com/v12.0")
+
+    MEDIA_FIELDS = "id,caption,media_type,media_url,thumbnail_url,permalink,timestamp,like_count,comments_count"
 
-    def __init__(self, access_token=None):
+    def __init__(self, access_token=None, transport: Optional[GraphTransport] = None):
         self.access_token = access_token
+        self.transport = transport or get_graph_transport()
+        self.statistics = InstagramStatistics()
 
     def set_access_token(self, access_token):
         """액세스 토큰을 설정하는 메서드"""
@@ -39,18 +825,85 @@ class InstagramAPI:
             
         endpoint = f"{self.BASE_URL}/me/media"
         params = {
-            "fields": "id,caption,media_type,media_url,thumbnail_url,permalink,timestamp",
+            "fields": self.MEDIA_FIELDS,
             "access_token": self.access_token,
             "limit": limit
         }
         try:
-            response = requests.get(endpoint, params=params)
+            response = self.transport.get(endpoint, params=params)
             response.raise_for_status()
             return response.json().get("data", [])
         except requests.RequestException as e:
             print(f"Error fetching user media: {str(e)}")
             return []
 
+    def iter_media(self, since=None, until=None, max_items: Optional[int] = None,
+                   page_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """사용자의 전체 Instagram 미디어를 페이지 단위로 지연 조회합니다 (최신순)."""
+        if not self.access_token:
+            raise ValueError("Access token is not set")
+
+        params = {
+            "fields": self.MEDIA_FIELDS,
+            "access_token": self.access_token,
+            "limit": page_size
+        }
+        return iter_graph_pages(self.transport, f"{self.BASE_URL}/me/media", params,
+                                since=since, until=until, max_items=max_items)
+
+    def get_user_statistics(self, limit: int = 30) -> Dict[str, Any]:
+        """게시물 유형, 인기 해시태그, 주요 게시 시간대, 참여 합계를 계산합니다.
+
+        최근 limit개 게시물을 가져와 누적 통계에 반영합니다 (새 게시물은 추가, 이미 본 게시물은
+        좋아요/댓글 수 갱신). 통계는 이 클라이언트(워커 프로세스)에만 있으므로, 앱에서는 로컬 미디어
+        저장소의 게시물로 집계합니다.
+        """
+        self.statistics.add_posts(list(self.iter_media(max_items=limit)))
+        return self.statistics.summary()
+
+    def create_container(self, user_id, content, media_type='IMAGE', media_url=None) -> str:
+        """게시물 미디어 컨테이너를 만들고 컨테이너 ID(creation_id)를 반환합니다 (이미지 필수)."""
+        if not media_url:
+            raise MediaPublishError("Instagram posts require an image (media_url)")
+        endpoint = f"{self.BASE_URL}/{user_id}/media"
+        data = {
+            "image_url": media_url,
+            "caption": content,
+            "access_token": self.access_token
+        }
+        response = self.transport.post(endpoint, json=data)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def get_container_status(self, container_id) -> Dict[str, Any]:
+        """컨테이너 상태 조회 (status_code: IN_PROGRESS, FINISHED, PUBLISHED, ERROR, EXPIRED)"""
+        endpoint = f"{self.BASE_URL}/{container_id}"
+        params = {
+            "fields": "status_code,status",
+            "access_token": self.access_token
+        }
+        response = self.transport.get(endpoint, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def wait_for_container(self, container_id, timeout: float = THREAD_PUBLISH_TIMEOUT, on_poll=None) -> str:
+        """컨테이너가 게시 가능한 상태가 될 때까지 기다립니다 (wait_for_media_container 참고)."""
+        def fetch_status():
+            result = self.get_container_status(container_id)
+            return result.get("status_code"), result.get("status", "")
+        return wait_for_media_container(fetch_status, container_id, timeout, on_poll)
+
+    def publish_container(self, user_id, container_id) -> Dict[str, Any]:
+        """준비된 컨테이너를 게시합니다 (media_publish)."""
+        endpoint = f"{self.BASE_URL}/{user_id}/media_publish"
+        data = {
+            "creation_id": container_id,
+            "access_token": self.access_token
+        }
+        response = self.transport.post(endpoint, json=data)
+        response.raise_for_status()
+        return response.json()
+
     def format_posts(self, media_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """API 응답을 보기 좋게 포맷팅합니다."""
         formatted_posts = []
@@ -78,114 +931,235 @@ class InstagramAPI:
         }
         
         try:
-            response = requests.post(token_url, data=data)
+            response = self.transport.post(token_url, data=data)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
             raise Exception(f"Failed to authenticate: {str(e)}")
 
 class ThreadAPI:
-    def __init__(self):
-        self.base_url = "https://graph.threads.net/v1.0"
-        self.access_token = None
+    MEDIA_FIELDS = 'id,media_product_type,media_type,media_url,permalink,username,text,timestamp,shortcode,thumbnail_url,children,is_quote_post'
+    INSIGHT_METRICS = 'views,likes,replies,reposts,quotes,shares'
+    NESTED_INSIGHTS_FIELDS = f"{MEDIA_FIELDS},insights.metric({INSIGHT_METRICS})"
+    INSIGHTS_CONCURRENCY = int(os.getenv('THREAD_INSIGHTS_CONCURRENCY', '8'))
+    USER_INSIGHT_METRICS = 'views,likes,replies,reposts,quotes'
+
+    # 게시물 목록 요청에 insights 필드 확장(insights.metric(...))이 거부되면 이 클라이언트(토큰)로는
+    # NESTED_INSIGHTS_RETRY_AFTER초 동안 다시 시도하지 않음. 거부는 Graph 오류 코드 100 + insights 필드 메시지로 판단
+    NESTED_INSIGHTS_RETRY_AFTER = float(os.getenv('THREAD_NESTED_INSIGHTS_RETRY_AFTER', '3600'))
+    NESTED_INSIGHTS_ERROR_CODE = 100
+
+    def __init__(self, access_token=None, transport: Optional[GraphTransport] = None):
+        self.base_url = os.getenv('THREADS_GRAPH_URL', "https://graph.threads.net/v1.0")
+        self.access_token = access_token
+        self.transport = transport or get_graph_transport()
+        self._nested_insights_disabled_until = 0.0  # time.monotonic() 기준
 
     def get_user_media(self, user_id):
         """사용자의 모든 Thread 게시물 조회"""
         try:
-            endpoint = f"{self.base_url}/{user_id}/threads"
-            params = {
-                'fields': 'id,media_product_type,media_type,media_url,permalink,username,text,timestamp,shortcode,thumbnail_url,children,is_quote_post',
-                'access_token': self.access_token
-            }
-            response = requests.get(endpoint, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            # 각 게시물의 미디어 정보 처리
-            posts = data.get('data', [])
-            for post in posts:
-                if post.get('media_type') in ['IMAGE', 'VIDEO', 'CAROUSEL_ALBUM']:
-                    # 비디오인 경우 썸네일 URL 추가
-                    if post.get('media_type') == 'VIDEO' and post.get('thumbnail_url'):
-                        post['media_preview'] = post['thumbnail_url']
-                    
-                    # 캐러셀인 경우 모든 미디어 URL 수집
-                    if post.get('media_type') == 'CAROUSEL_ALBUM' and post.get('children'):
-                        post['carousel_media'] = [child.get('media_url') for child in post['children']['data']]
-
-            return data
+            return self._fetch_user_media(user_id, self.MEDIA_FIELDS)
         except Exception as e:
             logger.error(f"Error fetching Thread media: {str(e)}")
             return {'data': []}
 
+    def get_user_media_with_insights(self, user_id):
+        """게시물과 게시물별 인사이트(likes/replies/reposts)를 최소한의 요청으로 조회
+
+        게시물 목록 요청에 insights 필드를 확장해 한 번에 가져오고, 확장이 지원되지 않거나
+        인사이트가 빠진 게시물만 제한된 동시성으로 개별 조회합니다.
+        """
+        data = None
+        if self.nested_insights_enabled():
+            try:
+                data = self._fetch_user_media(user_id, self.NESTED_INSIGHTS_FIELDS)
+            except requests.RequestException as e:
+                if not self._check_nested_insights_error(e):
+                    logger.error(f"Error fetching Thread media with insights: {str(e)}")
+        if data is None:
+            data = self.get_user_media(user_id)
+
+        self.attach_insights(data.get('data', []))
+        return data
+
+    def list_media_with_insights(self, user_id, since=None, max_items: Optional[int] = None) -> List[Dict[str, Any]]:
+        """iter_media로 여러 페이지를 따라가며 게시물과 인사이트를 함께 조회합니다 (동기화용)."""
+        posts = None
+        if self.nested_insights_enabled():
+            try:
+                posts = list(self.iter_media(user_id, since=since, max_items=max_items,
+                                             fields=self.NESTED_INSIGHTS_FIELDS))
+            except requests.RequestException as e:
+                if not self._check_nested_insights_error(e):
+                    raise
+        if posts is None:
+            posts = list(self.iter_media(user_id, since=since, max_items=max_items))
+
+        self.attach_insights(posts)
+        return posts
+
+    def attach_insights(self, posts):
+        """인사이트가 없는 게시물만 개별 조회해 채우고, 지표를 게시물 필드(likes 등)로 펼칩니다."""
+        missing = [post for post in posts if 'insights' not in post]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.INSIGHTS_CONCURRENCY, len(missing))) as executor:
+                for post, insights in zip(missing, executor.map(with_request_context(self._safe_media_insights), missing)):
+                    post['insights'] = insights
+
+        for post in posts:
+            metrics = {
+                metric.get('name'): (metric.get('values') or [{}])[0].get('value', 0)
+                for metric in post.pop('insights', {}).get('data', [])
+            }
+            for name in self.INSIGHT_METRICS.split(','):
+                post[name] = metrics.get(name, 0)
+        return posts
+
+    def nested_insights_enabled(self) -> bool:
+        return time.monotonic() >= self._nested_insights_disabled_until
+
+    def _check_nested_insights_error(self, error) -> bool:
+        """insights 필드 확장이 거부된 오류면 이 클라이언트의 확장 시도를 잠시 끄고 True를 반환합니다.
+
+        토큰 만료(OAuthException 190) 등 다른 400 오류는 확장과 무관하므로 False를 반환합니다.
+        """
+        response = error.response
+        if response is None or response.status_code != 400:
+            return False
+        try:
+            graph_error = response.json().get('error') or {}
+        except ValueError:
+            return False
+        if graph_error.get('code') != self.NESTED_INSIGHTS_ERROR_CODE or \
+                'insights' not in (graph_error.get('message') or ''):
+            return False
+        logger.warning(f"Nested Thread insights not supported ({graph_error.get('message')}), "
+                       f"falling back to per-post requests for {self.NESTED_INSIGHTS_RETRY_AFTER:.0f}s")
+        self._nested_insights_disabled_until = time.monotonic() + self.NESTED_INSIGHTS_RETRY_AFTER
+        return True
+
+    def _fetch_user_media(self, user_id, fields):
+        endpoint = f"{self.base_url}/{user_id}/threads"
+        params = {
+            'fields': fields,
+            'access_token': self.access_token
+        }
+        response = self.transport.get(endpoint, params=params)
+        response.raise_for_status()
+        data = response.json()
+
+        for post in data.get('data', []):
+            self._process_post(post)
+        return data
+
+    def iter_media(self, user_id, since=None, until=None, max_items: Optional[int] = None,
+                   page_size: int = 100, fields: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """사용자의 전체 Thread 게시물을 페이지 단위로 지연 조회합니다 (최신순)."""
+        params = {
+            'fields': fields or self.MEDIA_FIELDS,
+            'limit': page_size,
+            'access_token': self.access_token
+        }
+        for post in iter_graph_pages(self.transport, f"{self.base_url}/{user_id}/threads", params,
+                                     since=since, until=until, max_items=max_items):
+            yield self._process_post(post)
+
+    @staticmethod
+    def _process_post(post):
+        """게시물의 미디어 정보 처리"""
+        if post.get('media_type') in ['IMAGE', 'VIDEO', 'CAROUSEL_ALBUM']:
+            # 비디오인 경우 썸네일 URL 추가
+            if post.get('media_type') == 'VIDEO' and post.get('thumbnail_url'):
+                post['media_preview'] = post['thumbnail_url']
+            
+            # 캐러셀인 경우 모든 미디어 URL 수집
+            if post.get('media_type') == 'CAROUSEL_ALBUM' and post.get('children'):
+                post['carousel_media'] = [child.get('media_url') for child in post['children']['data']]
+        return post
+
     def get_media_insights(self, media_id):
         """특정 Thread 게시물의 인사이트 조회"""
         endpoint = f"{self.base_url}/{media_id}/insights"
         params = {
-            'metric': 'views,likes,replies,reposts,quotes,shares',
+            'metric': self.INSIGHT_METRICS,
             'access_token': self.access_token
         }
-        response = requests.get(endpoint, params=params)
+        response = self.transport.get(endpoint, params=params)
         return response.json()
 
-    def get_user_insights(self, user_id):
-        """사용자의 Thread 계정 인사이트 조회"""
+    def _safe_media_insights(self, post):
         try:
-            endpoint = f"{self.base_url}/{user_id}/threads_insights"
-            params = {
-                'metric': 'views,likes,replies,reposts,quotes,followers_count',
-                'period': 'day',  # 일별 데이터 요청
-                'access_token': self.access_token
-            }
-            response = requests.get(endpoint, params=params)
-            response_data = response.json()
-            
-            # 기본 통계 데이터 구조 초기화
-            stats = {
-                'total_posts': 0,
-                'total_likes': 0,
-                'total_replies': 0,
-                'avg_likes': 0,
-                'avg_replies': 0,
-                'dates': [],
-                'likes_data': [],
-                'replies_data': []
-            }
+            return self.get_media_insights(post['id'])
+        except Exception as e:
+            logger.error(f"Error fetching Thread media insights: {str(e)}")
+            return {'data': []}
+
+    def _fetch_user_insights(self, user_id, metrics: str, since: date, until: date) -> List[Dict[str, Any]]:
+        endpoint = f"{self.base_url}/{user_id}/threads_insights"
+        params = {
+            'metric': metrics,
+            'since': _day_start(since),
+            'until': _day_start(until),
+            'access_token': self.access_token
+        }
+        response = self.transport.get(endpoint, params=params)
+        response.raise_for_status()
+        return response.json().get('data', [])
 
-            # 게시물 수 조회
-            posts_response = self.get_user_media(user_id)
-            stats['total_posts'] = len(posts_response.get('data', []))
-
-            # 최근 30일 데이터 생성
-            current_date = datetime.now()
-            for i in range(30):
-                date = (current_date - timedelta(days=i)).strftime('%Y-%m-%d')
-                stats['dates'].insert(0, date)
-                stats['likes_data'].insert(0, random.randint(10, 100))  # 임시 데이터
-                stats['replies_data'].insert(0, random.randint(5, 50))  # 임시 데이터
-
-            # 총계 및 평균 계산
-            stats['total_likes'] = sum(stats['likes_data'])
-            stats['total_replies'] = sum(stats['replies_data'])
-            stats['avg_likes'] = round(stats['total_likes'] / len(stats['likes_data']))
-            stats['avg_replies'] = round(stats['total_replies'] / len(stats['replies_data']))
-
-            return stats
+    def get_daily_insights(self, user_id, since: date, until: date) -> Dict[date, Dict[str, int]]:
+        """threads_insights의 [since, until) 구간 일별 지표를 {날짜: {지표: 값}} 형태로 조회합니다.
+
+        시계열(values)로 오는 지표는 한 번의 요청으로 펼치고, 구간 합계(total_value)만 제공되는
+        지표는 하루 단위 구간으로 나눠 제한된 동시성으로 조회합니다.
+        """
+        metric_names = self.USER_INSIGHT_METRICS.split(',')
+        days = [since + timedelta(days=i) for i in range((until - since).days)]
+        daily = {day: dict.fromkeys(metric_names, 0) for day in days}
+        if not days:
+            return daily
+
+        totals_only = []
+        for metric in self._fetch_user_insights(user_id, self.USER_INSIGHT_METRICS, since, until):
+            name = metric.get('name')
+            if name not in metric_names:
+                continue
+            if 'values' in metric:
+                for point in metric['values']:
+                    # end_time은 집계 구간의 끝이므로 하루를 빼야 해당 날짜가 됨
+                    day = (datetime.strptime(point['end_time'], '%Y-%m-%dT%H:%M:%S%z')
+                           .astimezone(timezone.utc) - timedelta(days=1)).date()
+                    if day in daily:
+                        daily[day][name] = point.get('value', 0)
+            elif len(days) == 1:
+                daily[since][name] = metric.get('total_value', {}).get('value', 0)
+            else:
+                totals_only.append(name)
+
+        if totals_only:
+            metrics = ','.join(totals_only)
+            with ThreadPoolExecutor(max_workers=min(self.INSIGHTS_CONCURRENCY, len(days))) as executor:
+                results = executor.map(with_request_context(
+                    lambda day: self._fetch_user_insights(user_id, metrics, day, day + timedelta(days=1))), days)
+                for day, data in zip(days, results):
+                    for metric in data:
+                        if metric.get('name') in totals_only:
+                            daily[day][metric['name']] = metric.get('total_value', {}).get('value', 0)
+        return daily
+
+    def get_user_insights(self, user_id, posts=None, days: int = 30):
+        """최근 days일간의 Thread 계정 인사이트 조회 (게시물 수는 넘겨받은 posts로 계산)"""
+        until = datetime.now(timezone.utc).date() + timedelta(days=1)
+        since = until - timedelta(days=days)
+        total_posts = len(posts) if posts is not None else 0
+        try:
+            daily = self.get_daily_insights(user_id, since, until)
         except Exception as e:
             logger.error(f"Error fetching Thread insights: {str(e)}")
-            return {
-                'total_posts': 0,
-                'total_likes': 0,
-                'total_replies': 0,
-                'avg_likes': 0,
-                'avg_replies': 0,
-                'dates': [],
-                'likes_data': [],
-                'replies_data': []
-            }
+            daily = {}
+        return summarize_daily_insights(sorted(daily.items()), since, until, total_posts=total_posts)
 
-    def post_thread(self, user_id, content, media_type='TEXT', media_url=None):
-        """Thread 게시물 작성"""
+    def create_container(self, user_id, content, media_type='TEXT', media_url=None) -> str:
+        """게시물 미디어 컨테이너를 만들고 컨테이너 ID(creation_id)를 반환합니다."""
         endpoint = f"{self.base_url}/{user_id}/threads"
         data = {
             'text': content,
@@ -196,55 +1170,379 @@ class ThreadAPI:
         if media_url:
             data['media_url'] = media_url
             
-        response = requests.post(endpoint, json=data)
+        response = self.transport.post(endpoint, json=data)
+        response.raise_for_status()
+        return response.json()['id']
+
+    def get_container_status(self, container_id) -> Dict[str, Any]:
+        """컨테이너 상태 조회 (IN_PROGRESS, FINISHED, PUBLISHED, ERROR, EXPIRED)"""
+        endpoint = f"{self.base_url}/{container_id}"
+        params = {
+            'fields': 'status,error_message',
+            'access_token': self.access_token
+        }
+        response = self.transport.get(endpoint, params=params)
+        response.raise_for_status()
         return response.json()
 
-def convert_post(caption: str, target_platform: str, has_image: bool) -> str:
-    converted_post = caption
-
-    if target_platform == "Twitter":
-        converted_post = f"Check out my latest Instagram post! 📸\n\n{caption[:200]}..." if len(caption) > 200 else caption
-        converted_post += "\n\n#Instagram #Social"
-    elif target_platform == "LinkedIn":
-        converted_post = f"I just shared a new post on Instagram! Here's a sneak peek:\n\n{caption}\n\nFollow me on Instagram for more updates!"
-        converted_post += "\n\n#SocialMedia #Professional #Instagram"
-    elif target_platform == "Facebook":
-        converted_post = f"New Instagram Post Alert! 🚨\n\n{caption}\n\nHead over to my Instagram profile to see the full post and more content!"
-    elif target_platform == "Thread":
-        converted_post = f"Continuing from my recent Instagram post...\n\n{caption[:100]}...\n\nThoughts?"
-    elif target_platform == "YouTube Community":
-        converted_post = f"📸 Instagram Update 📸\n\n{caption[:150]}...\n\nCheck out my Instagram for the full post and more behind-the-scenes content!"
-
-    if has_image:
-        converted_post += "\n\n[Image from Instagram]"
-
-    return converted_post
+    def wait_for_container(self, container_id, timeout: float = THREAD_PUBLISH_TIMEOUT,
+                           on_poll=None) -> str:
+        """컨테이너가 게시 가능한 상태가 될 때까지 기다립니다 (wait_for_media_container 참고)."""
+        def fetch_status():
+            result = self.get_container_status(container_id)
+            return result.get('status'), result.get('error_message', '')
+        return wait_for_media_container(fetch_status, container_id, timeout, on_poll, ThreadPublishError)
 
-class RAGConverter:
-    def __init__(self):
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise ValueError("OPENAI_API_KEY not found in .env file")
-        
-        self.llm = ChatOpenAI(
-            temperature=0.7,
-            model_name="gpt-4o-mini",
-            openai_api_key=openai_api_key
+    def publish_container(self, user_id, container_id) -> Dict[str, Any]:
+        """준비된 컨테이너를 게시합니다 (threads_publish)."""
+        endpoint = f"{self.base_url}/{user_id}/threads_publish"
+        data = {
+            'creation_id': container_id,
+            'access_token': self.access_token
+        }
+        response = self.transport.post(endpoint, json=data)
+        response.raise_for_status()
+        return response.json()
+
+    def post_thread(self, user_id, content, media_type='TEXT', media_url=None):
+        """Thread 게시물 작성 (컨테이너 생성 -> 준비 대기 -> 게시, 완료까지 블로킹)
+
+        웹 요청 안에서는 직접 호출하지 말고 게시 작업 큐(app_v1의 PublishJob)를 사용하세요.
+        """
+        container_id = self.create_container(user_id, content, media_type, media_url)
+        if self.wait_for_container(container_id) == 'PUBLISHED':
+            return {'id': None, 'creation_id': container_id}
+        result = self.publish_container(user_id, container_id)
+        result['creation_id'] = container_id
+        return result
+
+INSIGHT_GRANULARITIES = ('day', 'week', 'month')
+
+def insight_bucket(day: date, granularity: str) -> date:
+    """일별 날짜를 다운샘플링 구간의 시작일(주: 월요일, 월: 1일)로 내립니다."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def auto_granularity(since: date, until: date) -> str:
+    """차트에 표시할 점이 너무 많지 않도록 기간 길이에 따라 집계 단위를 고릅니다."""
+    days = (until - since).days
+    if days <= 92:
+        return 'day'
+    if days <= 730:
+        return 'week'
+    return 'month'
+
+def summarize_daily_insights(rows, since: date, until: date, total_posts: int = 0,
+                             granularity: str = 'day') -> Dict[str, Any]:
+    """(날짜, 지표 dict) 목록을 [since, until) 구간의 통계와 granularity 단위 시계열로 만듭니다.
+
+    데이터가 없는 날은 0으로 채우며, rows는 날짜순으로 정렬되어 있어야 합니다.
+    """
+    if granularity not in INSIGHT_GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    metric_names = ThreadAPI.USER_INSIGHT_METRICS.split(',')
+
+    buckets = OrderedDict()
+    day = since
+    while day < until:
+        buckets.setdefault(insight_bucket(day, granularity), dict.fromkeys(metric_names, 0))
+        day += timedelta(days=1)
+    for day, metrics in rows:
+        bucket = buckets.get(insight_bucket(day, granularity))
+        if bucket is not None and since <= day < until:
+            for name in metric_names:
+                bucket[name] += metrics.get(name) or 0
+
+    day_count = max((until - since).days, 1)
+    stats = {
+        'since': since.isoformat(),
+        'until': (until - timedelta(days=1)).isoformat(),
+        'granularity': granularity,
+        'total_posts': total_posts,
+        'dates': [bucket.isoformat() if granularity != 'month' else bucket.strftime('%Y-%m') for bucket in buckets]
+    }
+    for name in metric_names:
+        series = [bucket[name] for bucket in buckets.values()]
+        stats[f'{name}_data'] = series
+        stats[f'total_{name}'] = sum(series)
+    # 평균은 집계 단위와 무관하게 하루 기준
+    stats['avg_likes'] = round(stats['total_likes'] / day_count)
+    stats['avg_replies'] = round(stats['total_replies'] / day_count)
+    return stats
+
+class APIClientCache:
+    """액세스 토큰별 API 클라이언트 캐시 (LRU)
+
+    요청마다 전역 클라이언트의 토큰을 바꾸면 동시 요청끼리 토큰이 섞이므로, 토큰마다 별도
+    클라이언트를 만들어 재사용합니다. 모든 클라이언트는 같은 GraphTransport를 공유하며,
+    캐시된 클라이언트의 access_token은 변경하지 않아야 합니다.
+    """
+
+    def __init__(self, factory, max_size: int = 1024):
+        self.factory = factory
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, access_token: str):
+        with self._lock:
+            client = self._clients.get(access_token)
+            if client is not None:
+                self._clients.move_to_end(access_token)
+                return client
+            client = self.factory(access_token=access_token, transport=get_graph_transport())
+            self._clients[access_token] = client
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+            return client
+
+_instagram_clients = APIClientCache(InstagramAPI)
+_thread_clients = APIClientCache(ThreadAPI)
+
+def instagram_client(access_token: str) -> InstagramAPI:
+    """해당 토큰 전용 InstagramAPI 클라이언트를 반환합니다 (스레드 안전)."""
+    return _instagram_clients.get(access_token)
+
+def thread_client(access_token: str) -> ThreadAPI:
+    """해당 토큰 전용 ThreadAPI 클라이언트를 반환합니다 (스레드 안전)."""
+    return _thread_clients.get(access_token)
+
+# 규칙 기반 변환 설정 (LLM 없이 즉시 미리보기, LLM이 느리거나 실패할 때의 대체 결과)
+# 플랫폼마다 블록 템플릿 목록을 두고, 필드 값이 비어 있는 블록은 건너뛴 뒤 빈 줄로 이어 붙입니다.
+# max_length는 grapheme(사용자가 보는 글자) 기준이며, 넘으면 본문을 줄입니다.
+PLATFORM_CONVERSION_RULES = {
+    "Instagram": {
+        "blocks": ["{body}", "{hashtags}"],
+        "max_length": 2200, "min_hashtags": 5, "max_hashtags": 10,
+        "inline_hashtags": "keep", "max_emoji": None
+    },
+    "Facebook": {
+        "blocks": ["{body}", "여러분은 어떻게 생각하시나요? 댓글로 이야기 나눠요!", "{hashtags}"],
+        "max_length": 63206, "min_hashtags": 0, "max_hashtags": 3,
+        "inline_hashtags": "keep", "max_emoji": None
+    },
+    "Thread": {
+        "blocks": ["{body}", "여러분 생각은 어떠세요?", "{hashtags}"],
+        "max_length": 500, "min_hashtags": 2, "max_hashtags": 3,
+        "inline_hashtags": "plain", "max_emoji": None
+    },
+    "네이버 블로그": {
+        "blocks": ["{title}", "{image_note}", "{body}", "태그: {tags}"],
+        "max_length": None, "min_hashtags": 5, "max_hashtags": 10,
+        "inline_hashtags": "plain", "max_emoji": 0, "title_length": 40, "image_note": "[사진]"
+    },
+    "Twitter": {
+        "blocks": ["{body}", "{hashtags}"],
+        "max_length": 280, "min_hashtags": 0, "max_hashtags": 2,
+        "inline_hashtags": "keep", "max_emoji": None
+    },
+    "LinkedIn": {
+        "blocks": ["{body}", "{hashtags}"],
+        "max_length": 3000, "min_hashtags": 0, "max_hashtags": 3,
+        "inline_hashtags": "plain", "max_emoji": 3
+    },
+    "YouTube Community": {
+        "blocks": ["{body}", "{hashtags}"],
+        "max_length": 1500, "min_hashtags": 0, "max_hashtags": 3,
+        "inline_hashtags": "keep", "max_emoji": None
+    }
+}
+DEFAULT_CONVERSION_RULE = {
+    "blocks": ["{body}", "{hashtags}"], "max_length": None, "min_hashtags": 0, "max_hashtags": 30,
+    "inline_hashtags": "keep", "max_emoji": None
+}
+
+# 확장 grapheme cluster의 근사: 결합 문자, 한글 첫가끝 자모(중성/종성), 이체 선택자, 피부색 수식자,
+# 태그 문자는 앞 글자에 붙이고, ZWJ는 다음 글자까지 묶으며, 지역 표시자 두 개(국기)는 한 글자로 봅니다.
+_GRAPHEME_EXTEND = (
+    "̀-ͯ҃-҉֑-ֽؐ-ًؚ-ٟัิ-ฺ็-๎"
+    "ᅠ-ᇿ᪰-᫿᷀-᷿⃐-⃿〪-゙゚〯ힰ-퟿"
+    "︀-️︠-︯\U0001f3fb-\U0001f3ff\U000e0020-\U000e007f"
+)
+GRAPHEME_RE = re.compile(f"[\U0001f1e6-\U0001f1ff]{{2}}|\r\n|.(?:[{_GRAPHEME_EXTEND}]|‍.)*", re.S)
+GRAPHEME_JOINER_RE = re.compile(f"[{_GRAPHEME_EXTEND}‍\U0001f1e6-\U0001f1ff\r]")
+EMOJI_RE = re.compile("[\U0001f000-\U0001faff☀-➿⬅-⭕⌚⌛⏩-⏺]")
+EMOJI_CLUSTER_RE = re.compile(f"(?:[\U0001f1e6-\U0001f1ff]{{2}}|{EMOJI_RE.pattern})(?:[{_GRAPHEME_EXTEND}]|‍.)*", re.S)
+HASHTAG_RE = re.compile(r"(?<![\w&/#])#(\w*[^\W\d]\w*)")  # 숫자만 있는 태그(#1)는 제외
+HASHTAG_LINE_RE = re.compile(r"^(?:\s*#\w+)+\s*$")
+WORD_RE = re.compile(r"[^\W\d_]{2,}")
+TEMPLATE_FIELD_RE = re.compile(r"\{(\w+)\}")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+def graphemes(text: str) -> List[str]:
+    return GRAPHEME_RE.findall(text)
+
+def grapheme_len(text: str) -> int:
+    # 코드 포인트 수 이하이므로, 결합 문자가 없는 흔한 경우는 정규식 없이 바로 계산
+    if text.isascii() or not GRAPHEME_JOINER_RE.search(text):
+        return len(text)
+    return len(graphemes(text))
+
+@lru_cache(maxsize=64)
+def _grapheme_prefix_re(count: int):
+    """최대 count개의 grapheme과 맞는 정규식 (최근 쓴 길이만 캐시: limit은 호출자가 정하므로 상한을 둠)"""
+    return re.compile(f"(?:{GRAPHEME_RE.pattern}){{0,{count}}}", re.S)
+
+def truncate_graphemes(text: str, limit: int, ellipsis: str = "…") -> str:
+    """글자(grapheme)를 자르지 않고 limit 글자 이하로 줄입니다 (말줄임표 포함).
+
+    잘리는 위치 근처(뒤쪽 20%)에 공백이 있으면 단어 중간 대신 그 앞에서 자릅니다.
+    """
+    if len(text) <= limit or _grapheme_prefix_re(limit).match(text).end() == len(text):
+        return text
+    head = text[:_grapheme_prefix_re(max(0, limit - len(ellipsis))).match(text).end()]
+    cut = max(head.rfind(" "), head.rfind("\n"))
+    if cut >= len(head) * 0.8:
+        head = head[:cut]
+    return head.rstrip() + ellipsis
+
+class RuleConverter:
+    """템플릿 기반 규칙 변환기
+
+    캡션을 한 번 분석(본문/해시태그/자주 나온 단어)한 뒤 플랫폼별로 미리 컴파일한 템플릿에 채웁니다.
+    해시태그는 중복을 없애고 (출현 횟수, 본문 언급 여부, 앞쪽 위치) 순으로 다시 매겨 플랫폼 개수에 맞춥니다.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Dict[str, Any]]] = None,
+                 default_rule: Optional[Dict[str, Any]] = None):
+        self.rules = {platform: self._compile(rule)
+                      for platform, rule in (rules or PLATFORM_CONVERSION_RULES).items()}
+        self.default_rule = self._compile(default_rule or DEFAULT_CONVERSION_RULE)
+
+    @staticmethod
+    def _compile(rule: Dict[str, Any]) -> Dict[str, Any]:
+        """블록 템플릿을 (리터럴, 필드) 목록으로 미리 나눠 둡니다."""
+        blocks = []
+        for block in rule["blocks"]:
+            pieces = TEMPLATE_FIELD_RE.split(block)  # [리터럴, 필드, 리터럴, ...]
+            parts = [(pieces[i], pieces[i + 1] if i + 1 < len(pieces) else None) for i in range(0, len(pieces), 2)]
+            blocks.append((parts, tuple(field for _, field in parts if field)))
+        return dict(rule, compiled=blocks)
+
+    @staticmethod
+    def analyze(caption: str) -> Dict[str, Any]:
+        """플랫폼과 무관한 캡션 분석 결과 (배치 변환에서 캡션마다 한 번만 계산)"""
+        lines = caption.strip().splitlines()
+        while lines and (not lines[-1].strip() or HASHTAG_LINE_RE.match(lines[-1])):
+            lines.pop()  # 끝의 해시태그 묶음은 본문에서 빼고 다시 매겨 붙임
+        body = "\n".join(lines).strip()
+
+        tags = {}  # 소문자 -> [표기, 출현 횟수, 처음 위치]
+        for position, match in enumerate(HASHTAG_RE.finditer(caption)):
+            tag = match.group(1)
+            entry = tags.setdefault(tag.lower(), [tag, 0, position])
+            entry[1] += 1
+        plain_body = HASHTAG_RE.sub(" ", body).lower()
+        ranked = sorted(
+            tags.values(),
+            key=lambda entry: (-(entry[1] + (entry[0].lower() in plain_body)), entry[2])
         )
-        self.embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
-        self.text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-
-    def create_vector_store(self, text: str):
-        document = Document(page_content=text)
-        texts = self.text_splitter.split_documents([document])
-        return Chroma.from_documents(texts, self.embeddings)
-
-    def generate_enhanced_post(self, original_post: str, target_platform: str, has_image: bool) -> str:
-        prompt = PromptTemplate(
-            input_variables=["target_platform", "original_post", "has_image"],
-            template="""
-            당신은 소셜 미디어 마케팅 전문가입니다. 주어진 콘텐츠를 {target_platform}의 특성에 맞게 변환해주세요.
-            
+
+        words = Counter(word.lower() for word in WORD_RE.findall(plain_body))
+        extra = [word for word, count in words.most_common() if count >= 2 and word not in tags]
+        inline = {match.group(1).lower() for match in HASHTAG_RE.finditer(body)}
+        return {
+            "body": body,
+            "plain_body": HASHTAG_RE.sub(lambda match: match.group(1), body) if inline else body,
+            "hashtags": [entry[0] for entry in ranked],
+            "inline_hashtags": [entry[0].lower() for entry in ranked if entry[0].lower() in inline],
+            "keywords": extra,
+            "has_emoji": EMOJI_RE.search(caption) is not None
+        }
+
+    def convert(self, caption: str, target_platform: str, has_image: bool = False) -> str:
+        return self.render(self.analyze(caption), target_platform, has_image)
+
+    def convert_many(self, captions: List[str], platforms: List[str],
+                     has_image: bool = False) -> List[Dict[str, str]]:
+        """여러 캡션 × 여러 플랫폼을 한 번에 변환합니다. 캡션마다 {플랫폼: 결과}를 반환합니다."""
+        results = []
+        for caption in captions:
+            parsed = self.analyze(caption)
+            results.append({platform: self.render(parsed, platform, has_image) for platform in platforms})
+        return results
+
+    def render(self, parsed: Dict[str, Any], target_platform: str, has_image: bool = False) -> str:
+        rule = self.rules.get(target_platform, self.default_rule)
+        max_hashtags = rule["max_hashtags"]
+        inline = set()
+        if rule["inline_hashtags"] == "plain":
+            body = parsed["plain_body"]
+        elif len(parsed["inline_hashtags"]) > max_hashtags:
+            # 본문 해시태그가 한도를 넘으면 순위가 높은 것만 태그로 두고 나머지는 일반 단어로
+            inline = set(parsed["inline_hashtags"][:max_hashtags])
+            body = HASHTAG_RE.sub(
+                lambda match: match.group(0) if match.group(1).lower() in inline else match.group(1),
+                parsed["body"]
+            )
+        else:
+            inline = set(parsed["inline_hashtags"])
+            body = parsed["body"]
+        if parsed["has_emoji"] and rule["max_emoji"] is not None:
+            body = self._limit_emoji(body, rule["max_emoji"])
+
+        tags = [tag for tag in parsed["hashtags"] if tag.lower() not in inline]
+        if len(tags) < rule["min_hashtags"]:
+            tags += parsed["keywords"][:rule["min_hashtags"] - len(tags)]
+        tags = tags[:max(0, max_hashtags - len(inline))]
+
+        title = ""
+        if "title_length" in rule:
+            first, _, rest = body.partition("\n")
+            if rest.strip():  # 한 줄짜리 캡션은 제목 없이 본문만
+                title = truncate_graphemes(first.strip(), rule["title_length"])
+                body = rest.strip()
+
+        values = {
+            "body": body,
+            "title": title,
+            "hashtags": " ".join(f"#{tag}" for tag in tags),
+            "tags": ", ".join(tags),
+            "image_note": rule.get("image_note", "") if has_image else ""
+        }
+        if rule["max_length"]:
+            overhead = grapheme_len(self._fill(rule, dict(values, body="")))
+            values["body"] = truncate_graphemes(body, max(1, rule["max_length"] - overhead - 2))
+        return self._fill(rule, values)
+
+    @staticmethod
+    def _fill(rule, values):
+        blocks = []
+        for parts, fields in rule["compiled"]:
+            if any(not values[field] for field in fields):
+                continue  # 비어 있는 필드가 있는 블록은 생략
+            blocks.append("".join(literal + (values[field] if field else "") for literal, field in parts))
+        return BLANK_LINES_RE.sub("\n\n", "\n\n".join(blocks)).strip()
+
+    @staticmethod
+    def _limit_emoji(text: str, limit: int) -> str:
+        """이모지(ZWJ 시퀀스, 국기 등 grapheme 단위)를 앞에서부터 limit개만 남깁니다."""
+        if limit <= 0:
+            text = EMOJI_CLUSTER_RE.sub("", text)
+        else:
+            seen = [0]
+
+            def keep_first(match):
+                seen[0] += 1
+                return match.group() if seen[0] <= limit else ""
+            text = EMOJI_CLUSTER_RE.sub(keep_first, text)
+        return re.sub(r"[ \t]{2,}", " ", text)
+
+rule_converter = RuleConverter()
+
+def convert_post(caption: str, target_platform: str, has_image: bool) -> str:
+    """규칙 기반 변환 (LLM 호출 없음)"""
+    return rule_converter.convert(caption, target_platform, has_image)
+
+def convert_posts(captions: List[str], platforms: List[str], has_image: bool = False) -> List[Dict[str, str]]:
+    """여러 캡션 × 여러 플랫폼 규칙 기반 일괄 변환"""
+    return rule_converter.convert_many(captions, platforms, has_image)
+
+# RAGConverter 관련 설정
+PLATFORM_RULES = """\
             각 플랫폼별 특성과 변환 규칙:
             - Instagram: 
               * 감성적이고 시각적인 표현
@@ -271,21 +1569,1360 @@ class RAGConverter:
               * SEO를 위한 태그 활용
               * 목차형 구성 권장
             
-            Original post: {original_post}
+"""
+
+ENHANCED_POST_TEMPLATE = """
+            당신은 소셜 미디어 마케팅 전문가입니다. 주어진 콘텐츠를 {target_platform}의 특성에 맞게 변환해주세요.
+            
+""" + PLATFORM_RULES + """{style_examples}            Original post: {original_post}
             Has image: {has_image}
             Target platform: {target_platform}
             
             변환된 콘텐츠만 출력하세요.
             """
+
+BATCH_POST_TEMPLATE = """
+            당신은 소셜 미디어 마케팅 전문가입니다. 주어진 콘텐츠를 아래의 각 플랫폼 특성에 맞게 각각 변환해주세요.
+            
+""" + PLATFORM_RULES + """{style_examples}            Original post: {original_post}
+            Has image: {has_image}
+            Target platforms: {target_platforms}
+            
+            플랫폼 이름을 키로, 변환된 콘텐츠를 값으로 하는 JSON 객체만 출력하세요.
+            예: {{"Instagram": "...", "Thread": "..."}}
+            """
+
+RAG_MODEL_NAME = "gpt-4o-mini"
+RAG_PROMPT_VERSION = "2"  # 프롬프트/캐시 키 구성 변경 시 올려서 캐시를 무효화
+RAG_REQUEST_TIMEOUT = float(os.getenv("RAG_REQUEST_TIMEOUT", "30"))
+RAG_MAX_RETRIES = int(os.getenv("RAG_MAX_RETRIES", "2"))
+RAG_POOL_MAXSIZE = int(os.getenv("RAG_POOL_MAXSIZE", "20"))
+
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "rag_index")  # 빈 값이면 사용자별 인덱스 비활성화
+RAG_INDEX_MAX_ITEMS = int(os.getenv("RAG_INDEX_MAX_ITEMS", "2000"))  # 사용자당 최대 항목 수 (초과 시 오래된 항목부터 제거)
+RAG_INDEX_MAX_LOADED = int(os.getenv("RAG_INDEX_MAX_LOADED", "64"))  # 메모리에 올려 둘 사용자 인덱스 수
+RAG_VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "numpy")  # numpy 또는 chroma (chromadb 설치 필요)
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))  # 프롬프트에 넣을 과거 게시물 수
+RAG_EXAMPLE_MAX_CHARS = 300
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")  # 빈 값이면 메모리에만 캐시
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))  # 메모리 전용일 때 최대 항목 수
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 디스크 벡터 파일 총량
+
+CONVERSION_CACHE_PATH = os.getenv("CONVERSION_CACHE_PATH", "conversion_cache.db")
+CONVERSION_CACHE_SIZE = int(os.getenv("CONVERSION_CACHE_SIZE", "1024"))
+CONVERSION_CACHE_TTL = float(os.getenv("CONVERSION_CACHE_TTL", str(7 * 24 * 3600)))
+
+class ConversionCache:
+    """변환 결과 캐시 (메모리 LRU + SQLite 영구 저장, TTL 만료)"""
+
+    PRUNE_INTERVAL = 100  # 디스크 정리 주기 (쓰기 횟수)
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024,
+                 ttl: float = 7 * 24 * 3600, max_disk_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = None
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS conversion_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_conversion_cache_accessed "
+                    "ON conversion_cache (accessed_at)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Conversion cache disk tier disabled: {str(e)}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(caption: str, target_platform: str, has_image: bool,
+                 prompt_version: str, model: str, context: str = "") -> str:
+        """변환 입력의 내용 해시를 캐시 키로 사용합니다. context(사용자 키)가 없으면 사용자와 무관한 키입니다."""
+        fields = [caption, target_platform, bool(has_image), prompt_version, model]
+        if context:
+            fields.append(context)
+        payload = json.dumps(fields, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._disk_get(key, now)
+            if row is None:
+                self.misses += 1
+                return None
+            self._memory_put(key, row[1], row[0])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[1]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._memory_put(key, value, expires_at)
+            self._disk_set(key, value, expires_at, now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "memory_entries": len(self._memory)
+            }
+
+    def _memory_put(self, key, value, expires_at):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM conversion_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE conversion_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            return row
+        except sqlite3.Error as e:
+            logger.warning(f"Conversion cache read failed: {str(e)}")
+            return None
+
+    def _disk_set(self, key, value, expires_at, now):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversion_cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._disk_prune(now)
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Conversion cache write failed: {str(e)}")
+
+    def _disk_prune(self, now):
+        """만료된 항목을 지우고, 최대 개수를 넘으면 오래 사용되지 않은 항목부터 제거합니다."""
+        self._conn.execute("DELETE FROM conversion_cache WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM conversion_cache WHERE key IN ("
+            "SELECT key FROM conversion_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+class EmbeddingCache:
+    """텍스트 내용 해시 -> 임베딩 벡터 캐시
+
+    path를 지정하면 벡터는 세그먼트 파일(vectors-{세그먼트}-{dim}.f32)에 행 단위로 덧붙이고 메모리 매핑으로
+    읽으며, 키 -> (차원, 세그먼트, 행) 색인은 SQLite(index.db)에 둡니다. 쓰기는 파일 잠금(fcntl) 아래에서
+    벡터를 먼저 덧붙인 뒤 색인을 커밋하므로, 다른 워커가 색인에서 찾은 행은 항상 다 쓰인 상태입니다.
+    세그먼트가 max_disk_bytes / DISK_SEGMENTS를 넘으면 새 세그먼트를 열고, 전체가 max_disk_bytes를 넘으면
+    가장 오래된 세그먼트를 색인과 함께 통째로 지웁니다. 세그먼트 번호는 다시 쓰지 않으므로 다른 워커가 매핑해 둔
+    파일의 행이 바뀌는 일은 없습니다. path가 없으면 메모리 LRU(max_entries)로만 동작합니다.
+    """
+
+    DISK_SEGMENTS = 8
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 4096,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.embedded = 0  # 실제로 임베딩 API에 보낸 텍스트 수
+        self._memory = OrderedDict()  # path가 없을 때: key -> 벡터
+        self._maps = {}  # 세그먼트 -> np.memmap
+        self._inflight = {}  # 임베딩 중인 key -> threading.Event
+        self._lock = threading.RLock()
+        self._conn = None
+        if path:
+            try:
+                os.makedirs(path, exist_ok=True)
+                self._conn = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False, timeout=5)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embedding_rows ("
+                    "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, segment INTEGER NOT NULL, row INTEGER NOT NULL)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS embedding_rows_segment ON embedding_rows (segment)")
+                self._conn.commit()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Embedding cache disk tier disabled: {str(e)}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """캐시에 있는 키의 벡터만 반환합니다."""
+        with self._lock:
+            if self._conn is None:
+                found = {}
+                for key in keys:
+                    vector = self._memory.get(key)
+                    if vector is not None:
+                        self._memory.move_to_end(key)
+                        found[key] = vector
+                return found
+            return self._disk_get(keys)
+
+    def put_many(self, vectors: Dict[str, Any]):
+        with self._lock:
+            if self._conn is None:
+                for key, vector in vectors.items():
+                    self._memory[key] = np.asarray(vector, dtype=np.float32)
+                    self._memory.move_to_end(key)
+                while len(self._memory) > self.max_entries:
+                    self._memory.popitem(last=False)
+                return
+            self._disk_put(vectors)
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]],
+              model: str) -> np.ndarray:
+        """texts의 임베딩을 (len(texts), dim) 배열로 반환합니다.
+
+        캐시에 없는 텍스트만 중복을 제거해 embed_fn 한 번으로 임베딩합니다. 다른 스레드나 워커 프로세스가
+        이미 임베딩 중인 텍스트는 그 결과를 기다려 재사용합니다.
+        """
+        keys = [self.make_key(text, model) for text in texts]
+        texts_by_key = dict(zip(keys, texts))
+        found = self.get_many(list(texts_by_key))
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(texts_by_key) - len(found)
+
+        missing = [key for key in texts_by_key if key not in found]
+        while missing:
+            claimed, waiting = [], []
+            with self._lock:
+                for key in missing:
+                    event = self._inflight.get(key)
+                    if event is None:
+                        self._inflight[key] = threading.Event()
+                        claimed.append(key)
+                    else:
+                        waiting.append(event)
+            busy = []
+            if claimed:
+                try:
+                    with self._key_locks(claimed) as (owned, busy):
+                        # 잠금을 기다리는 사이 다른 워커가 저장했을 수 있으므로 다시 조회
+                        found.update(self.get_many(owned))
+                        owned = [key for key in owned if key not in found]
+                        if owned:
+                            results = dict(zip(owned, embed_fn([texts_by_key[key] for key in owned])))
+                            self.put_many(results)
+                            found.update(results)
+                            with self._lock:
+                                self.embedded += len(owned)
+                finally:
+                    with self._lock:
+                        for key in claimed:
+                            self._inflight.pop(key).set()
+            for event in waiting:
+                event.wait()
+            self._wait_key_locks(busy)
+            # 기다린 키를 다시 조회 (앞선 임베딩이 실패했으면 다음 반복에서 직접 임베딩)
+            found.update(self.get_many([key for key in missing if key not in found]))
+            missing = [key for key in missing if key not in found]
+
+        return np.asarray([found[key] for key in keys], dtype=np.float32).reshape(len(keys), -1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "embedded": self.embedded,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _vectors_path(self, segment, dim):
+        return os.path.join(self.path, f"vectors-{segment:06d}-{dim}.f32")
+
+    def _segments(self):
+        """디스크의 세그먼트 파일 {세그먼트: (차원, 크기)}"""
+        segments = {}
+        for name in os.listdir(self.path):
+            match = re.fullmatch(r"vectors-(\d+)-(\d+)\.f32", name)
+            if match:
+                try:
+                    size = os.path.getsize(os.path.join(self.path, name))
+                except OSError:
+                    continue
+                segments[int(match.group(1))] = (int(match.group(2)), size)
+        return segments
+
+    def _disk_get(self, keys):
+        found = {}
+        rows = {}  # (세그먼트, 차원) -> [(key, 행)]
+        try:
+            for start in range(0, len(keys), 500):  # SQLite 변수 개수 제한
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, dim, segment, row in self._conn.execute(
+                    f"SELECT key, dim, segment, row FROM embedding_rows WHERE key IN ({placeholders})", chunk
+                ):
+                    rows.setdefault((segment, dim), []).append((key, row))
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read failed: {str(e)}")
+            return found
+
+        for (segment, dim), entries in rows.items():
+            matrix = self._mapped(segment, dim, max(row for _, row in entries))
+            if matrix is None:
+                continue
+            for key, row in entries:
+                found[key] = np.array(matrix[row])
+        return found
+
+    def _mapped(self, segment, dim, row):
+        """세그먼트 파일의 메모리 매핑. 다른 워커가 덧붙여 row가 범위를 벗어나면 다시 매핑합니다.
+
+        새로 매핑할 때 지워진 세그먼트의 매핑을 놓아, 제거된 파일의 디스크 공간이 반환되게 합니다.
+        """
+        matrix = self._maps.get(segment)
+        if matrix is None or row >= len(matrix):
+            for mapped in [s for s in self._maps if not os.path.exists(self._vectors_path(s, self._maps[s].shape[1]))]:
+                del self._maps[mapped]
+            path = self._vectors_path(segment, dim)
+            try:
+                count = os.path.getsize(path) // (dim * 4)
+            except OSError:
+                return None  # 다른 워커가 제거한 세그먼트 (캐시 미스로 처리)
+            if row >= count:
+                return None
+            matrix = self._maps[segment] = np.memmap(path, dtype="<f4", mode="r", shape=(count, dim))
+        return matrix
+
+    def _disk_put(self, vectors):
+        by_dim = {}
+        for key, vector in vectors.items():
+            vector = np.asarray(vector, dtype="<f4").ravel()
+            by_dim.setdefault(vector.shape[0], []).append((key, vector))
+        segment_bytes = max(1, self.max_disk_bytes // self.DISK_SEGMENTS)
+        try:
+            with self._file_lock():
+                existing = set(self._disk_get(list(vectors)))
+                segments = self._segments()
+                for dim, entries in by_dim.items():
+                    entries = [(key, vector) for key, vector in entries if key not in existing]
+                    if not entries:
+                        continue
+                    current = max((s for s, (d, _) in segments.items() if d == dim), default=None)
+                    if current is None or segments[current][1] >= segment_bytes:
+                        current = max(segments, default=0) + 1
+                    with open(self._vectors_path(current, dim), "ab") as f:
+                        row_bytes = dim * 4
+                        size = os.fstat(f.fileno()).st_size
+                        if size % row_bytes:
+                            f.truncate(size - size % row_bytes)  # 중단된 쓰기의 불완전한 행 제거
+                        first_row = size // row_bytes
+                        f.write(np.stack([vector for _, vector in entries]).tobytes())
+                        f.flush()
+                        segments[current] = (dim, os.fstat(f.fileno()).st_size)
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO embedding_rows (key, dim, segment, row) VALUES (?, ?, ?, ?)",
+                        [(key, dim, current, first_row + offset) for offset, (key, _) in enumerate(entries)]
+                    )
+                self._conn.commit()
+                self._evict_segments(segments)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def _evict_segments(self, segments):
+        """전체 크기가 max_disk_bytes 이하가 될 때까지 가장 오래된 세그먼트를 지웁니다 (쓰기 잠금 안에서 호출).
+
+        색인을 먼저 지우고 커밋한 뒤 파일을 지우므로, 다른 워커는 지워진 행을 찾지 못하거나(미스)
+        이미 매핑해 둔 바뀌지 않는 데이터를 읽습니다.
+        """
+        total = sum(size for _, size in segments.values())
+        for segment in sorted(segments)[:-1]:  # 지금 쓰는 세그먼트는 남김
+            if total <= self.max_disk_bytes:
+                break
+            dim, size = segments.pop(segment)
+            self._conn.execute("DELETE FROM embedding_rows WHERE segment = ?", (segment,))
+            self._conn.commit()
+            self._maps.pop(segment, None)
+            os.remove(self._vectors_path(segment, dim))
+            total -= size
+
+    def _key_lock_path(self, key):
+        return os.path.join(self.path, "locks", f"{key[:2]}.lock")  # 키 앞 2자리로 256개 버킷
+
+    @contextmanager
+    def _key_locks(self, keys):
+        """키 버킷 잠금을 기다리지 않고 잡아 (잡은 키, 다른 워커가 임베딩 중인 키)를 돌려줍니다.
+
+        잠금을 쥔 채로 다른 잠금을 기다리지 않으므로 워커끼리 교착되지 않습니다.
+        """
+        if self._conn is None or fcntl is None:
+            yield keys, []
+            return
+        os.makedirs(os.path.join(self.path, "locks"), exist_ok=True)
+        handles = {}
+        owned, busy = [], []
+        try:
+            for key in keys:
+                path = self._key_lock_path(key)
+                if path not in handles:
+                    lock_file = open(path, "a")
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        handles[path] = lock_file
+                    except OSError:
+                        lock_file.close()
+                        handles[path] = None
+                (owned if handles[path] is not None else busy).append(key)
+            yield owned, busy
+        finally:
+            for lock_file in handles.values():
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def _wait_key_locks(self, keys):
+        """다른 워커가 쥔 키 버킷 잠금이 풀릴 때까지 기다립니다 (하나씩 잡았다가 바로 놓음)."""
+        for path in sorted({self._key_lock_path(key) for key in keys}):
+            with open(path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, "write.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class VectorStore(ABC):
+    """id별 벡터 저장소 인터페이스 (추가/삭제, 코사인 유사도 top-k 검색, 저장)
+
+    같은 id로 다시 추가하면 벡터를 교체합니다. 구현: NumpyVectorStore(기본), ChromaVectorStore(선택).
+    """
+
+    dim: Optional[int] = None
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def add(self, ids: List[str], vectors) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        ...
+
+    @abstractmethod
+    def ids(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def search(self, query_vector, k: int, exclude_ids=None) -> List[Tuple[str, float]]:
+        """(id, 코사인 유사도)를 유사도가 높은 순으로 최대 k개 반환합니다."""
+        ...
+
+    def clear(self) -> None:
+        self.delete(self.ids())
+
+    def save(self) -> None:
+        """변경 내용을 디스크에 씁니다 (바로 쓰는 백엔드는 아무것도 하지 않음)."""
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class NumpyVectorStore(VectorStore):
+    """정규화된 float32 행렬 하나로 된 벡터 저장소
+
+    검색은 행렬-벡터 곱(코사인 유사도)과 argpartition top-k이고, 추가는 여유 용량을 두고 늘려 상수 시간,
+    삭제는 마지막 행을 빈 자리로 옮겨 상수 시간입니다. path가 있으면 vectors.npy와 ids.json으로 저장합니다.
+    수천~수만 개 규모의 사용자별 인덱스에 맞춘 구현으로, 서버 프로세스나 별도 의존성이 필요 없습니다.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.dim = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)  # 앞쪽 len(self._ids)행만 유효
+        self._ids = []
+        self._rows = {}  # id -> 행 번호
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, ids, vectors):
+        if not ids:
+            return
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        if self.dim is not None and self._ids and matrix.shape[1] != self.dim:
+            raise ValueError(f"vector dimension {matrix.shape[1]} does not match store dimension {self.dim}")
+        self.dim = matrix.shape[1]
+        if self._matrix.shape[1] != self.dim:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+
+        positions = {item_id: index for index, item_id in enumerate(ids)}  # 같은 id는 마지막 벡터 사용
+        replaced = [(self._rows[item_id], index) for item_id, index in positions.items() if item_id in self._rows]
+        added = [(item_id, index) for item_id, index in positions.items() if item_id not in self._rows]
+        if replaced:
+            self._matrix[[row for row, _ in replaced]] = matrix[[index for _, index in replaced]]
+        if added:
+            start = len(self._ids)
+            end = start + len(added)
+            if end > len(self._matrix):
+                grown = np.zeros((max(16, end, len(self._matrix) * 2), self.dim), dtype=np.float32)
+                grown[:start] = self._matrix[:start]
+                self._matrix = grown
+            self._matrix[start:end] = matrix[[index for _, index in added]]
+            for row, (item_id, _) in enumerate(added, start):
+                self._ids.append(item_id)
+                self._rows[item_id] = row
+
+    def delete(self, ids):
+        for item_id in ids:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                continue
+            last = len(self._ids) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+
+    def get(self, item_id):
+        row = self._rows.get(item_id)
+        return None if row is None else self._matrix[row].copy()
+
+    def ids(self):
+        return list(self._ids)
+
+    def search(self, query_vector, k, exclude_ids=None):
+        count = len(self._ids)
+        if k <= 0 or not count:
+            return []
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+        if query.shape[0] != self.dim:
+            return []
+        scores = self._matrix[:count] @ query
+        for item_id in exclude_ids or ():
+            row = self._rows.get(item_id)
+            if row is not None:
+                scores[row] = -np.inf
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[row], float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+    def save(self):
+        """임시 파일에 쓴 뒤 교체합니다. 벡터를 먼저 쓰고, 개수가 어긋나면 로드 시 버립니다."""
+        if not self.path:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            vectors_path = os.path.join(self.path, "vectors.npy")
+            with open(vectors_path + ".tmp", "wb") as f:
+                np.save(f, self._matrix[:len(self._ids)])
+            os.replace(vectors_path + ".tmp", vectors_path)
+            ids_path = os.path.join(self.path, "ids.json")
+            with open(ids_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self._ids, f)
+            os.replace(ids_path + ".tmp", ids_path)
+        except OSError as e:
+            logger.warning(f"Vector store write failed: {str(e)}")
+
+    def _load(self):
+        ids_path = os.path.join(self.path, "ids.json")
+        if not os.path.exists(ids_path):
+            return
+        try:
+            with open(ids_path, encoding="utf-8") as f:
+                ids = json.load(f)
+            matrix = np.load(os.path.join(self.path, "vectors.npy")).astype(np.float32, copy=False)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Vector store at {self.path} is unreadable, starting empty: {str(e)}")
+            return
+        if matrix.ndim != 2 or len(matrix) != len(ids):
+            logger.warning(f"Vector store at {self.path} is inconsistent, starting empty")
+            return
+        self._matrix = np.ascontiguousarray(matrix)
+        self._ids = ids
+        self._rows = {item_id: row for row, item_id in enumerate(ids)}
+        self.dim = matrix.shape[1] if ids else None
+
+class ChromaVectorStore(VectorStore):
+    """Chroma 컬렉션을 쓰는 벡터 저장소 (선택 의존성: pip install chromadb)
+
+    path가 있으면 PersistentClient로 바로 디스크에 쓰고, 없으면 메모리(EphemeralClient)에만 둡니다.
+    EphemeralClient는 프로세스 안에서 공유되므로 메모리 저장소마다 컬렉션 이름을 따로 붙입니다.
+    """
+
+    def __init__(self, path: Optional[str] = None, collection: str = "posts"):
+        try:
+            import chromadb
+        except ImportError as e:
+            raise ImportError("ChromaVectorStore requires chromadb (pip install chromadb)") from e
+        self.path = path
+        client = chromadb.PersistentClient(path=path) if path else chromadb.EphemeralClient()
+        if not path:
+            collection = f"{collection}-{id(self):x}"
+        self._collection = client.get_or_create_collection(collection, metadata={"hnsw:space": "cosine"})
+        self.dim = None
+
+    def __len__(self):
+        return self._collection.count()
+
+    def add(self, ids, vectors):
+        if not ids:
+            return
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        self.dim = matrix.shape[1]
+        self._collection.upsert(ids=list(ids), embeddings=matrix.tolist())
+
+    def delete(self, ids):
+        if ids:
+            self._collection.delete(ids=list(ids))
+
+    def get(self, item_id):
+        result = self._collection.get(ids=[item_id], include=["embeddings"])
+        embeddings = result.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            return None
+        return np.asarray(embeddings[0], dtype=np.float32)
+
+    def ids(self):
+        return list(self._collection.get(include=[])["ids"])
+
+    def search(self, query_vector, k, exclude_ids=None):
+        exclude_ids = set(exclude_ids or ())
+        count = len(self)
+        if k <= 0 or not count:
+            return []
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+        result = self._collection.query(query_embeddings=[query.tolist()],
+                                        n_results=min(count, k + len(exclude_ids)),
+                                        include=["distances"])
+        # cosine 공간의 distance = 1 - 코사인 유사도
+        hits = [(item_id, 1.0 - float(distance))
+                for item_id, distance in zip(result["ids"][0], result["distances"][0])
+                if item_id not in exclude_ids]
+        return hits[:k]
+
+VECTOR_STORE_BACKENDS = {
+    "numpy": NumpyVectorStore,
+    "chroma": ChromaVectorStore
+}
+
+def create_vector_store(backend: str = "numpy", path: Optional[str] = None) -> VectorStore:
+    """이름으로 벡터 저장소 백엔드를 만듭니다 (RAG_VECTOR_BACKEND)."""
+    try:
+        store_class = VECTOR_STORE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown vector store backend: {backend}") from None
+    return store_class(path)
+
+class PostIndex:
+    """사용자 한 명의 과거 게시물 벡터 인덱스
+
+    디스크에는 추가 전용 파일 두 종류로 저장합니다: items.log(한 줄에 항목 추가 또는 삭제 기록 하나)와
+    <접두어>-<차원>.f32(행 단위 float32 벡터). 쓰기는 파일 잠금(fcntl) 아래에서 덧붙이기만 하므로 인덱스
+    크기와 무관하게 비용이 일정하고, 다른 워커가 덧붙인 기록은 refresh()가 읽은 위치부터 이어서 반영합니다.
+    삭제된 기록이 쌓이면 현재 항목만으로 새 파일을 쓰고 로그를 교체합니다(compaction).
+    항목은 마지막으로 갱신된 순서대로 유지하며, max_items를 넘으면 가장 오래된 항목부터 제거합니다.
+    """
+
+    COMPACT_MIN_RECORDS = 1000  # 로그 기록이 이 수와 항목 수의 2배를 모두 넘으면 compaction
+
+    def __init__(self, path: Optional[str] = None, max_items: int = 2000, backend: str = "numpy"):
+        self.path = path
+        self.max_items = max_items
+        self._lock = threading.RLock()
+        self._items = OrderedDict()  # id -> {"id", "hash", "text", "platform", "kind", "added_at"} (오래된 순)
+        self._hash_ids = {}  # 텍스트 해시 -> id (같은 텍스트의 임베딩 재사용)
+        self._rows = {}  # id -> (차원, 벡터 파일의 행)
+        self._vectors_prefix = None  # 로그 머리 기록의 벡터 파일 접두어 (compaction마다 바뀜)
+        self._log_id = None  # 읽은 로그 파일의 (장치, inode)
+        self._log_offset = 0  # 로그에서 읽은 마지막 완전한 줄의 끝
+        self._records = 0
+        self.store = create_vector_store(backend)  # 메모리 검색용 (디스크 저장은 로그가 담당)
+        if path:
+            self.refresh()
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def contains(self, item_id: str, text: str) -> bool:
+        """같은 id의 항목이 같은 텍스트로 이미 들어 있는지 확인합니다."""
+        with self._lock:
+            item = self._items.get(item_id)
+            return item is not None and item["hash"] == self.text_hash(text)
+
+    def vector_for(self, text: str) -> Optional[np.ndarray]:
+        """이미 인덱싱된 텍스트면 저장된 벡터를 반환합니다 (임베딩 API 호출 생략)."""
+        with self._lock:
+            item_id = self._hash_ids.get(self.text_hash(text))
+            return None if item_id is None else self.store.get(item_id)
+
+    def refresh(self) -> None:
+        """다른 워커가 로그에 덧붙인 기록을 반영합니다. 로그 파일이 그대로면 stat 한 번으로 끝납니다."""
+        if not self.path:
+            return
+        with self._lock:
+            try:
+                stat = os.stat(self._log_path())
+            except OSError:
+                return
+            if (stat.st_dev, stat.st_ino) == self._log_id and stat.st_size == self._log_offset:
+                return
+            with self._file_lock(shared=True):
+                self._read_log()
+
+    def upsert(self, items: List[Dict[str, Any]], vectors) -> None:
+        """항목을 추가하거나 갱신합니다. 갱신된 항목은 가장 최근 항목으로 이동합니다."""
+        if not items:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(items), -1)
+        dim = vectors.shape[1]
+        now = time.time()
+        latest = {}
+        for row, item in enumerate(items):
+            latest.pop(item["id"], None)  # 같은 id가 여러 번 오면 마지막 것만 사용
+            latest[item["id"]] = (row, {
+                "id": item["id"],
+                "hash": self.text_hash(item["text"]),
+                "text": item["text"],
+                "platform": item.get("platform"),
+                "kind": item.get("kind", "post"),
+                "added_at": now
+            })
+
+        with self._lock, self._file_lock():
+            self._read_log()  # 다른 워커의 기록을 먼저 반영해야 제거 순서가 워커끼리 같음
+            records = []
+            remaining = [item_id for item_id in self._items if item_id not in latest]
+            if self.store.dim is not None and len(self.store) and self.store.dim != dim:
+                logger.warning("Embedding dimension changed, rebuilding post index")
+                records.append({"op": "delete", "ids": list(self._items)})
+                remaining = []
+            new_vectors = vectors[[row for row, _ in latest.values()]]
+            first_row = self._append_vectors(dim, new_vectors)
+            for offset, (_, entry) in enumerate(latest.values()):
+                records.append({"op": "put", "item": entry, "dim": dim, "row": first_row + offset})
+            overflow = len(remaining) + len(latest) - self.max_items
+            if overflow > 0:
+                records.append({"op": "delete", "ids": (remaining + list(latest))[:overflow]})
+
+            self._append_log(records)
+            self._apply(records, dict(zip(latest, new_vectors)))
+            if self.path and self._records > max(self.COMPACT_MIN_RECORDS, 2 * len(self._items)):
+                self._compact()
+
+    def search(self, query_vector, k: int, exclude_text: Optional[str] = None,
+               kinds: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """코사인 유사도가 높은 순으로 최대 k개 항목을 반환합니다.
+
+        exclude_text와 같은 텍스트의 항목과, kinds가 있으면 그 종류가 아닌 항목은 제외합니다.
+        """
+        with self._lock:
+            exclude_ids = []
+            if kinds is not None:
+                exclude_ids = [item_id for item_id, item in self._items.items() if item.get("kind", "post") not in kinds]
+            if exclude_text is not None:
+                item_id = self._hash_ids.get(self.text_hash(exclude_text))
+                if item_id is not None:
+                    exclude_ids.append(item_id)
+            return [dict(self._items[item_id], score=score)
+                    for item_id, score in self.store.search(query_vector, k, exclude_ids)
+                    if item_id in self._items]
+
+    def _log_path(self):
+        return os.path.join(self.path, "items.log")
+
+    def _vectors_path(self, dim, prefix=None):
+        return os.path.join(self.path, f"{prefix or self._vectors_prefix}-{dim}.f32")
+
+    def _reset(self):
+        self._items.clear()
+        self._hash_ids = {}
+        self._rows = {}
+        self._vectors_prefix = None
+        self._log_id = None
+        self._log_offset = 0
+        self._records = 0
+        self.store.clear()
+
+    def _read_log(self):
+        """로그에서 아직 읽지 않은 기록을 적용합니다. compaction으로 교체된 로그는 처음부터 다시 읽습니다."""
+        if not self.path:
+            return
+        try:
+            with open(self._log_path(), "rb") as f:
+                stat = os.fstat(f.fileno())
+                if (stat.st_dev, stat.st_ino) != self._log_id or stat.st_size < self._log_offset:
+                    self._reset()
+                    self._log_id = (stat.st_dev, stat.st_ino)
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Post index at {self.path} is unreadable: {str(e)}")
+            return
+        end = data.rfind(b"\n") + 1  # 쓰는 중이거나 중단된 마지막 줄은 다음에 읽음
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping corrupt record in post index at {self.path}")
+        self._log_offset += end
+        self._apply(records)
+
+    def _apply(self, records, vectors=None):
+        """로그 기록을 메모리 인덱스에 적용합니다. vectors(id -> 벡터)가 없으면 벡터 파일에서 읽습니다."""
+        deleted, put = set(), {}
+        for record in records:
+            if record.get("op") == "header":
+                self._vectors_prefix = record["vectors"]
+            elif record.get("op") == "delete":
+                for item_id in record["ids"]:
+                    self._items.pop(item_id, None)
+                    self._rows.pop(item_id, None)
+                    put.pop(item_id, None)
+                    deleted.add(item_id)
+            elif record.get("op") == "put":
+                entry = record["item"]
+                self._items.pop(entry["id"], None)
+                self._items[entry["id"]] = entry
+                self._rows[entry["id"]] = (record["dim"], record["row"])
+                put[entry["id"]] = record["dim"]
+                deleted.discard(entry["id"])
+        self._records += len(records)
+
+        self.store.delete(list(deleted))
+        if put:
+            if vectors is None:
+                vectors = self._read_vectors(put)
+            lost = [item_id for item_id in put if item_id not in vectors]
+            for item_id in lost:  # 벡터가 없는 기록 (다음 인덱싱 때 다시 추가됨)
+                self._items.pop(item_id, None)
+                self._rows.pop(item_id, None)
+            ids = [item_id for item_id in put if item_id in vectors]
+            if ids:
+                self.store.add(ids, np.stack([vectors[item_id] for item_id in ids]))
+        self._hash_ids = {item["hash"]: item_id for item_id, item in self._items.items()}
+
+    def _read_vectors(self, ids_by_dim):
+        by_dim = {}
+        for item_id, dim in ids_by_dim.items():
+            by_dim.setdefault(dim, []).append(item_id)
+        found = {}
+        for dim, ids in by_dim.items():
+            path = self._vectors_path(dim)
+            try:
+                count = os.path.getsize(path) // (dim * 4)
+            except OSError:
+                continue
+            if not count:
+                continue
+            matrix = np.memmap(path, dtype="<f4", mode="r", shape=(count, dim))
+            for item_id in ids:
+                row = self._rows[item_id][1]
+                if row < count:
+                    found[item_id] = np.array(matrix[row])
+            del matrix
+        return found
+
+    def _append_vectors(self, dim, vectors) -> int:
+        """벡터를 차원별 파일 끝에 덧붙이고 첫 행 번호를 반환합니다 (쓰기 잠금 안에서 호출)."""
+        if not self.path:
+            return 0
+        os.makedirs(self.path, exist_ok=True)
+        if self._vectors_prefix is None:
+            self._vectors_prefix = f"vectors-{os.urandom(4).hex()}"
+            self._append_log([{"op": "header", "vectors": self._vectors_prefix}])
+            self._records += 1
+        with open(self._vectors_path(dim), "ab") as f:
+            row_bytes = dim * 4
+            size = os.fstat(f.fileno()).st_size
+            if size % row_bytes:
+                f.truncate(size - size % row_bytes)  # 중단된 쓰기의 불완전한 행 제거
+            f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        return size // row_bytes
+
+    def _append_log(self, records):
+        if not self.path or not records:
+            return
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        try:
+            with open(self._log_path(), "ab") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size > self._log_offset:
+                    f.truncate(self._log_offset)  # 중단된 쓰기의 불완전한 줄 제거
+                f.write(data)
+                self._log_id = (stat.st_dev, stat.st_ino)
+        except OSError as e:
+            logger.warning(f"Post index write failed: {str(e)}")
+            return
+        self._log_offset += len(data)
+
+    def _compact(self):
+        """현재 항목만으로 새 벡터 파일과 로그를 쓰고 로그를 교체합니다 (쓰기 잠금 안에서 호출).
+
+        로그 머리 기록이 새 벡터 파일을 가리키므로, 교체 전에 중단되어도 기존 로그와 벡터 파일은 그대로입니다.
+        """
+        prefix = f"vectors-{os.urandom(4).hex()}"
+        records = [{"op": "header", "vectors": prefix}]
+        by_dim = {}
+        for item_id, item in self._items.items():
+            vector = self.store.get(item_id)
+            rows = by_dim.setdefault(vector.shape[0], [])
+            records.append({"op": "put", "item": item, "dim": vector.shape[0], "row": len(rows)})
+            rows.append(vector)
+        log_path = self._log_path()
+        try:
+            for dim, rows in by_dim.items():
+                with open(self._vectors_path(dim, prefix), "wb") as f:
+                    f.write(np.asarray(rows, dtype="<f4").tobytes())
+            with open(log_path + ".tmp", "wb") as f:
+                f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8"))
+            os.replace(log_path + ".tmp", log_path)
+        except OSError as e:
+            logger.warning(f"Post index compaction failed: {str(e)}")
+            return
+        for name in os.listdir(self.path):
+            if name.startswith("vectors-") and name.endswith(".f32") and not name.startswith(prefix + "-"):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        stat = os.stat(log_path)
+        self._vectors_prefix = prefix
+        self._log_id = (stat.st_dev, stat.st_ino)
+        self._log_offset = stat.st_size
+        self._records = len(records)
+        self._rows = {record["item"]["id"]: (record["dim"], record["row"]) for record in records[1:]}
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """같은 인덱스를 쓰는 워커 프로세스 사이의 잠금 (읽기는 공유, 쓰기는 배타)"""
+        if not self.path or fcntl is None:
+            yield
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "index.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class PostIndexStore:
+    """사용자별 PostIndex를 root 아래 디렉터리에 보관하고, 최근 사용한 인덱스만 메모리에 유지합니다.
+
+    get()은 메모리에 있는 인덱스도 refresh()하므로 다른 워커가 추가한 게시물이 바로 보입니다.
+    """
+
+    def __init__(self, root: str, max_items: int = 2000, max_loaded: int = 64, backend: str = "numpy"):
+        self.root = root
+        self.max_items = max_items
+        self.max_loaded = max_loaded
+        self.backend = backend
+        self._indexes = OrderedDict()  # user_key -> PostIndex
+        self._lock = threading.Lock()
+
+    def get(self, user_key: str) -> PostIndex:
+        with self._lock:
+            index = self._indexes.get(user_key)
+            if index is None:
+                index = PostIndex(os.path.join(self.root, self._dirname(user_key)), self.max_items, self.backend)
+                self._indexes[user_key] = index
+            self._indexes.move_to_end(user_key)
+            while len(self._indexes) > self.max_loaded:
+                self._indexes.popitem(last=False)
+        index.refresh()
+        return index
+
+    @staticmethod
+    def _dirname(user_key: str) -> str:
+        if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", user_key):
+            return user_key
+        return hashlib.sha256(user_key.encode("utf-8")).hexdigest()[:32]
+
+def format_style_examples(examples: List[Dict[str, Any]]) -> str:
+    """검색된 과거 게시물을 프롬프트 블록으로 만듭니다. 예시가 없으면 빈 문자열(기존 프롬프트와 동일)."""
+    if not examples:
+        return ""
+    lines = ["            사용자의 과거 게시물 (문체와 톤을 참고하세요):"]
+    for example in examples:
+        text = " ".join(example["text"].split())
+        if len(text) > RAG_EXAMPLE_MAX_CHARS:
+            text = text[:RAG_EXAMPLE_MAX_CHARS] + "…"
+        lines.append(f"            - [{example.get('platform') or '-'}] {text}")
+    return "\n".join(lines) + "\n            \n"
+
+@contextmanager
+def llm_call(operation: str, model: str = RAG_MODEL_NAME):
+    """LLM/임베딩 호출 시간을 결과(ok/error)별로 기록하고 요청의 LLM 시간에 더합니다."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        LLM_CALL_SECONDS.observe(elapsed, operation, model, outcome)
+        record_dependency_time("llm", elapsed)
+
+def record_llm_usage(message):
+    """응답(또는 스트리밍 조각)의 usage_metadata에서 토큰 수를 기록합니다."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.inc(RAG_MODEL_NAME, "prompt", amount=usage.get("input_tokens", 0))
+        LLM_TOKENS.inc(RAG_MODEL_NAME, "completion", amount=usage.get("output_tokens", 0))
+
+def _llm_request_hook(request):
+    request.extensions["snaps_started"] = time.perf_counter()
+    if request.headers.get("x-stainless-retry-count", "0") != "0":
+        LLM_RETRIES.inc(request.url.path.rsplit("/", 1)[-1])
+
+def _llm_response_hook(response):
+    """시도마다 응답 헤더까지의 시간과 상태 코드 (스트리밍은 첫 바이트까지)"""
+    started = response.request.extensions.get("snaps_started")
+    if started is not None:
+        LLM_HTTP_SECONDS.observe(time.perf_counter() - started, response.request.url.path.rsplit("/", 1)[-1],
+                                 response.status_code)
+
+class RAGConverter:
+    def __init__(self, http_client: Optional["httpx.Client"] = None,
+                 cache: Optional[ConversionCache] = None,
+                 index_store: Optional[PostIndexStore] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None):
+        import httpx
+        from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+        from langchain.prompts import PromptTemplate
+
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY not found in .env file")
+
+        # LLM/임베딩 클라이언트가 하나의 커넥션 풀(keep-alive)을 공유
+        self.http_client = http_client or httpx.Client(
+            limits=httpx.Limits(
+                max_connections=RAG_POOL_MAXSIZE,
+                max_keepalive_connections=RAG_POOL_MAXSIZE
+            ),
+            timeout=RAG_REQUEST_TIMEOUT,
+            event_hooks={"request": [_llm_request_hook], "response": [_llm_response_hook]}
+        )
+        self.llm = ChatOpenAI(
+            temperature=0.7,
+            model_name=RAG_MODEL_NAME,
+            openai_api_key=openai_api_key,
+            request_timeout=RAG_REQUEST_TIMEOUT,
+            max_retries=RAG_MAX_RETRIES,
+            http_client=self.http_client,
+            stream_usage=True  # 스트리밍 응답도 마지막 조각에 토큰 사용량을 받음
+        )
+        # 게시물은 임베딩 입력 한도보다 훨씬 짧으므로 tiktoken 토큰 분할(인코딩 다운로드)을 생략
+        self.embeddings = OpenAIEmbeddings(
+            openai_api_key=openai_api_key,
+            http_client=self.http_client,
+            check_embedding_ctx_length=False
         )
+        self.prompt = PromptTemplate(
+            input_variables=["target_platform", "original_post", "has_image", "style_examples"],
+            template=ENHANCED_POST_TEMPLATE
+        )
+        self.batch_prompt = PromptTemplate(
+            input_variables=["target_platforms", "original_post", "has_image", "style_examples"],
+            template=BATCH_POST_TEMPLATE
+        )
+        self.batch_llm = self.llm.bind(response_format={"type": "json_object"})
+        self.cache = cache if cache is not None else ConversionCache(
+            path=CONVERSION_CACHE_PATH,
+            max_entries=CONVERSION_CACHE_SIZE,
+            ttl=CONVERSION_CACHE_TTL
+        )
+        if index_store is None and RAG_INDEX_DIR:
+            index_store = PostIndexStore(RAG_INDEX_DIR, RAG_INDEX_MAX_ITEMS, RAG_INDEX_MAX_LOADED, RAG_VECTOR_BACKEND)
+        self.index_store = index_store
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache(
+            path=EMBEDDING_CACHE_DIR or None,
+            max_entries=EMBEDDING_CACHE_SIZE,
+            max_disk_bytes=EMBEDDING_CACHE_MAX_BYTES
+        )
+
+    def warm_up(self) -> bool:
+        """OpenAI API와의 연결(TLS 핸드셰이크)을 미리 맺어 둡니다. 토큰은 소모하지 않습니다."""
+        try:
+            self.llm.root_client.models.list()
+            return True
+        except Exception as e:
+            logger.warning(f"RAGConverter warm-up failed: {str(e)}")
+            return False
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """텍스트 임베딩 (캐시에 없는 텍스트만 한 번의 배치 호출로 임베딩)"""
+        return self.embedding_cache.embed(texts, self._embed_documents, self.embeddings.model)
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with llm_call("embed", self.embeddings.model):
+            return self.embeddings.embed_documents(texts)
+
+    def index_posts(self, user_key: str, items: List[Dict[str, Any]]) -> int:
+        """사용자 인덱스에 게시물을 추가합니다 (items: id, text, platform, kind).
+
+        이미 같은 텍스트로 들어 있는 항목은 건너뛰고, 인덱스에 있는 텍스트는 저장된 벡터를 재사용합니다.
+        나머지는 embed_texts로 임베딩하며, 인덱스에 새로 벡터를 구한 항목 수를 반환합니다.
+        """
+        if self.index_store is None or not user_key:
+            return 0
+        index = self.index_store.get(user_key)
+        pending = [item for item in items
+                   if item.get("text") and item["text"].strip() and not index.contains(item["id"], item["text"])]
+        if not pending:
+            return 0
+
+        vectors = [index.vector_for(item["text"]) for item in pending]
+        missing = [row for row, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = self.embed_texts([pending[row]["text"] for row in missing])
+            for row, vector in zip(missing, embedded):
+                vectors[row] = vector
+        index.upsert(pending, np.asarray(vectors, dtype=np.float32))
+        return len(missing)
+
+    def indexed_count(self, user_key: str) -> int:
+        if self.index_store is None or not user_key:
+            return 0
+        return len(self.index_store.get(user_key))
+
+    def similar_posts(self, user_key: Optional[str], text: str, k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+        """사용자 인덱스에서 text와 비슷한 과거 게시물 최대 k개를 찾습니다. 실패하면 빈 목록을 반환합니다."""
+        if self.index_store is None or not user_key or k <= 0:
+            return []
+        try:
+            index = self.index_store.get(user_key)
+            if not len(index):
+                return []
+            vector = index.vector_for(text)
+            if vector is None:
+                vector = self.embed_texts([text])[0]
+            return index.search(vector, k, exclude_text=text, kinds=("post",))
+        except Exception as e:
+            logger.warning(f"Post index lookup failed for {user_key}: {str(e)}")
+            return []
+
+    def generate_enhanced_post(self, original_post: str, target_platform: str, has_image: bool,
+                               use_cache: bool = True, user_key: Optional[str] = None) -> str:
+        """플랫폼에 맞게 변환합니다. use_cache=False면 캐시를 무시하고 다시 생성합니다.
+
+        user_key가 있으면 사용자 인덱스에서 비슷한 과거 게시물을 찾아 프롬프트에 예시로 넣습니다.
+        캐시는 요청 입력(캡션, 플랫폼, 이미지 여부, 사용자)으로 찾으므로 캐시 적중 시에는 검색/임베딩을 하지 않습니다.
+        """
+        cache_key = self._cache_key(original_post, target_platform, has_image, user_key)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        style_examples = format_style_examples(self.similar_posts(user_key, original_post))
+        with llm_call("generate"):
+            result = self.llm.invoke(self.prompt.format(
+                target_platform=target_platform,
+                original_post=original_post,
+                has_image=has_image,
+                style_examples=style_examples
+            ))
+        record_llm_usage(result)
+
+        converted = result.content.strip()
+        if converted:  # 빈 응답은 캐시하지 않음 (다음 요청에서 다시 생성)
+            self.cache.set(cache_key, converted)
+        return converted
+
+    def stream_enhanced_post(self, original_post: str, target_platform: str, has_image: bool,
+                             use_cache: bool = True, user_key: Optional[str] = None) -> Iterator[str]:
+        """generate_enhanced_post의 스트리밍 버전. 생성되는 대로 텍스트 조각을 yield 합니다."""
+        cache_key = self._cache_key(original_post, target_platform, has_image, user_key)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        style_examples = format_style_examples(self.similar_posts(user_key, original_post))
+        chunks = []
+        with llm_call("stream"):
+            started = time.perf_counter()
+            for chunk in self.llm.stream(self.prompt.format(
+                target_platform=target_platform,
+                original_post=original_post,
+                has_image=has_image,
+                style_examples=style_examples
+            )):
+                record_llm_usage(chunk)
+                text = chunk.content
+                if not text:
+                    continue
+                # 앞쪽 공백은 generate_enhanced_post의 strip()과 맞추기 위해 건너뜀
+                if not chunks:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                    LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, RAG_MODEL_NAME)
+                chunks.append(text)
+                yield text
+
+        converted = "".join(chunks).strip()
+        if converted:  # 아무것도 생성되지 않은 스트림은 캐시하지 않음
+            self.cache.set(cache_key, converted)
+
+    def generate_enhanced_posts(self, original_post: str, target_platforms: List[str], has_image: bool,
+                                use_cache: bool = True, fallback: bool = True,
+                                user_key: Optional[str] = None) -> Dict[str, str]:
+        """여러 플랫폼 변환을 한 번의 LLM 호출(JSON 응답)로 생성합니다.
+
+        응답에서 빠졌거나 형식이 잘못된 플랫폼은 fallback=True면 플랫폼별 호출로 다시 생성하고,
+        fallback=False면 결과에서 제외합니다 (호출하는 쪽에서 처리).
+        """
+        conversions = {}
+        pending = []
+        for platform in target_platforms:
+            cache_key = self._cache_key(original_post, platform, has_image, user_key)
+            cached = self.cache.get(cache_key) if use_cache else None
+            if cached is not None:
+                conversions[platform] = cached
+            elif platform not in pending:
+                pending.append(platform)
+
+        if len(pending) == 1:
+            conversions[pending[0]] = self.generate_enhanced_post(
+                original_post, pending[0], has_image, use_cache=False, user_key=user_key
+            )
+        elif pending:
+            style_examples = format_style_examples(self.similar_posts(user_key, original_post))
+            with llm_call("batch"):
+                result = self.batch_llm.invoke(self.batch_prompt.format(
+                    target_platforms=", ".join(pending),
+                    original_post=original_post,
+                    has_image=has_image,
+                    style_examples=style_examples
+                ))
+            record_llm_usage(result)
+            parsed = self._parse_batch_response(result.content, pending)
+            if len(parsed) < len(pending):
+                logger.warning(f"Batch conversion incomplete: missing {set(pending) - set(parsed)}")
+            for platform, converted in parsed.items():
+                self.cache.set(self._cache_key(original_post, platform, has_image, user_key), converted)
+                conversions[platform] = converted
+
+            if fallback:
+                for platform in pending:
+                    if platform not in conversions:
+                        conversions[platform] = self.generate_enhanced_post(
+                            original_post, platform, has_image, use_cache=False, user_key=user_key
+                        )
+
+        return {platform: conversions[platform] for platform in target_platforms if platform in conversions}
+
+    def _cache_key(self, original_post: str, target_platform: str, has_image: bool,
+                   user_key: Optional[str] = None) -> str:
+        # 검색된 예시는 인덱스가 바뀔 때마다 달라지므로 키에 넣지 않음 (사용자별 결과만 구분)
+        return self.cache.make_key(original_post, target_platform, has_image,
+                                   RAG_PROMPT_VERSION, RAG_MODEL_NAME, user_key or "")
+
+    @staticmethod
+    def _parse_batch_response(content: str, platforms: List[str]) -> Dict[str, str]:
+        """배치 응답(JSON)에서 요청한 플랫폼의 유효한 변환 결과만 골라냅니다."""
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[len("json"):]
+        try:
+            data = json.loads(text)
+        except ValueError:
+            logger.warning("Batch conversion response is not valid JSON")
+            return {}
+        if not isinstance(data, dict):
+            return {}
+
+        parsed = {}
+        for platform in platforms:
+            value = data.get(platform)
+            if isinstance(value, str) and value.strip():
+                parsed[platform] = value.strip()
+        return parsed
 
-        result = self.llm.invoke(prompt.format(
-            target_platform=target_platform,
-            original_post=original_post,
-            has_image=has_image
-        ))
+_rag_converter = None
+_rag_converter_lock = threading.Lock()
 
-        return result.content.strip()
+def get_rag_converter() -> RAGConverter:
+    """프로세스 전역에서 공유하는 RAGConverter를 지연 생성하여 반환합니다."""
+    global _rag_converter
+    if _rag_converter is None:
+        with _rag_converter_lock:
+            if _rag_converter is None:
+                _rag_converter = RAGConverter()
+    return _rag_converter
 
 def main():
     try:
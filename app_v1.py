@@ -1,17 +1,35 @@
 from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, flash
+from flask import Response, stream_with_context, abort
 from flask_talisman import Talisman
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
 from flask import session
-from SnapsAI import InstagramAPI, convert_post, RAGConverter, ThreadAPI
+from flask.logging import default_handler
+from SnapsAI import InstagramAPI, InstagramStatistics, convert_post, convert_posts, get_rag_converter, get_graph_transport
+from SnapsAI import instagram_client, thread_client
+from SnapsAI import summarize_daily_insights, auto_granularity, MediaPublishError
+from SnapsAI import graph_priority, PRIORITY_BACKGROUND, SingleFlight
+from SnapsAI import RAG_INDEX_DIR, RAG_INDEX_MAX_ITEMS
+from SnapsAI import METRICS, METRICS_ENABLED, track_dependencies, record_dependency_time, with_request_context
 import os
 from dotenv import load_dotenv
 import logging
+import logging.handlers
+import atexit
+import random
 import hashlib
 import hmac
 import base64
 import json
+import queue
+import heapq
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, TimeoutError as FutureTimeoutError
+import time
 import requests
 
 load_dotenv()
@@ -19,6 +37,126 @@ load_dotenv()
 app = Flask(__name__, static_folder='static', static_url_path='/static')
 app.secret_key = os.getenv('SECRET_KEY')
 
+# 로그 설정: 요청 스레드는 레코드를 큐에 넣기만 하고, 포맷과 출력은 백그라운드 리스너 스레드가 맡습니다.
+# 큰 페이로드(요청 JSON, 변환 결과, 미디어 목록)는 log_event로 남기며, LOG_PAYLOAD_SAMPLE_RATE 비율만
+# 레코드에 붙여 리스너에서 직렬화하고 LOG_PAYLOAD_MAX_CHARS에서 자릅니다.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json(한 줄에 JSON 객체 하나) 또는 text
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # 가득 차면 기다리지 않고 레코드를 버림
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv('LOG_PAYLOAD_MAX_CHARS', '1000'))
+# HTTP/LLM 클라이언트 라이브러리 로거 레벨 (DEBUG에서는 프롬프트 전체, 즉 캡션 원문을 요청마다 남김)
+LOG_LIBRARY_LEVEL = os.getenv('LOG_LIBRARY_LEVEL', 'WARNING').upper()
+LIBRARY_LOGGERS = ('openai', 'httpx', 'httpcore', 'urllib3', 'langchain', 'langchain_core', 'langchain_openai')
+LOG_RECORDS_DROPPED = METRICS.counter('snaps_log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+class LogPayload:
+    """레코드에 붙는 페이로드. 직렬화와 자르기는 리스너 스레드에서 포맷할 때 합니다.
+
+    나중에 직렬화하므로 로그를 남긴 뒤 바꾸지 않는 값만 넘깁니다.
+    """
+
+    __slots__ = ('value', 'max_chars')
+
+    def __init__(self, value, max_chars=None):
+        self.value = value
+        self.max_chars = LOG_PAYLOAD_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self):
+        text = self.value if isinstance(self.value, str) else json.dumps(self.value, ensure_ascii=False, default=str)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}...(+{len(text) - self.max_chars} chars)"
+        return text
+
+class StructuredFormatter(logging.Formatter):
+    """json이면 시간/레벨/로거/메시지와 필드, 페이로드를 JSON 한 줄로, text면 기존 형식 뒤에 key=value로 씁니다."""
+
+    def __init__(self, json_output=True):
+        super().__init__('[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
+        self.json_output = json_output
+
+    @staticmethod
+    def extra_fields(record):
+        fields = dict(getattr(record, 'fields', None) or {})
+        payload = getattr(record, 'payload', None)
+        if payload is not None:
+            fields['payload'] = str(payload)
+        return fields
+
+    def formatMessage(self, record):
+        text = super().formatMessage(record)
+        fields = self.extra_fields(record)
+        if fields:
+            text += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+    def format(self, record):
+        if not self.json_output:
+            return super().format(record)
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(self.extra_fields(record))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """레코드를 큐에 넣기만 하는 핸들러. 큐가 가득 차면 요청을 세우지 않고 버립니다."""
+
+    def prepare(self, record):
+        # 같은 프로세스 안의 큐이므로 메시지/페이로드 포맷을 리스너 스레드로 미룸
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+class BackgroundLogListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # 큐가 가득 차 있어도 종료 신호는 버리지 않고, 리스너가 자리를 비울 때까지 기다림
+        self.queue.put(self._sentinel)
+
+def log_event(logger, level, message, payload=None, **fields):
+    """구조화된 로그 한 줄. payload는 LOG_PAYLOAD_SAMPLE_RATE 비율로만 붙습니다."""
+    if not logger.isEnabledFor(level):
+        return
+    extra = {'fields': fields}
+    if payload is not None and random.random() < LOG_PAYLOAD_SAMPLE_RATE:
+        extra['payload'] = LogPayload(payload)
+    logger.log(level, message, extra=extra)
+
+def configure_logging():
+    """루트 로거의 출력을 백그라운드 리스너로 옮깁니다.
+
+    이미 루트에 붙은 핸들러(gunicorn --log-config 등)가 있으면 리스너가 그 핸들러로 내보내고,
+    없으면 stderr로 씁니다. 이미 옮겼으면 None을 반환합니다.
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, NonBlockingQueueHandler) for handler in root.handlers):
+        return None
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    formatter = StructuredFormatter(json_output=LOG_FORMAT == 'json')
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = BackgroundLogListener(log_queue, *handlers, respect_handler_level=True)
+    root.handlers = [NonBlockingQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    for name in LIBRARY_LOGGERS:
+        logging.getLogger(name).setLevel(LOG_LIBRARY_LEVEL)
+    app.logger.removeHandler(default_handler)
+    listener.start()
+    atexit.register(listener.stop)  # 종료할 때 큐에 남은 레코드를 마저 씀
+    return listener
+
+LOG_LISTENER = configure_logging()
+
 # Define a custom CSP that allows inline styles and scripts
 csp = {
     'default-src': "'self'",
@@ -30,15 +168,77 @@ csp = {
 }
 
 
-Talisman(app, force_https=True, content_security_policy=csp)
+talisman = Talisman(app, force_https=True, content_security_policy=csp)
 
 
 
 # Database configuration for MariaDB
-app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}?charset=utf8mb4"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}?charset=utf8mb4"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# 요청/DB 메트릭 (Graph API, LLM 메트릭은 SnapsAI에서 기록)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # /metrics 스크레이프 토큰 (Authorization: Bearer <토큰>), 없으면 /metrics는 404
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    'snaps_http_request_duration_seconds', 'HTTP request latency to response headers', ('method', 'route', 'status'))
+HTTP_DEPENDENCY_SECONDS = METRICS.histogram(
+    'snaps_http_request_dependency_seconds', 'Time a request spent in each dependency (graph, llm, db)',
+    ('route', 'dependency'))
+DB_QUERY_SECONDS = METRICS.histogram(
+    'snaps_db_query_duration_seconds', 'Database query latency', ('operation',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+class RequestMetricsMiddleware:
+    """요청마다 처리 시간(응답 헤더까지)과 그동안 쓴 의존성 시간을 라우트 템플릿별로 기록합니다.
+
+    스트리밍 응답은 본문을 보내는 시간이 빠지므로, 그 동안의 LLM 시간은 LLM 메트릭에서 봅니다.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        status = []
+
+        def capture_status(status_line, headers, exc_info=None):
+            status.append(status_line[:3])
+            return start_response(status_line, headers, exc_info)
+
+        started = time.perf_counter()
+        with track_dependencies() as timings:
+            try:
+                return self.wsgi_app(environ, capture_status)
+            finally:
+                elapsed = time.perf_counter() - started
+                route = environ.get('snaps.route', '<unmatched>')
+                HTTP_REQUEST_SECONDS.observe(elapsed, environ.get('REQUEST_METHOD'), route,
+                                             status[-1] if status else '500')
+                for dependency, seconds in timings.totals.items():
+                    HTTP_DEPENDENCY_SECONDS.observe(seconds, route, dependency)
+
+def record_route_template(endpoint, values):
+    # URL 전처리기는 다른 before_request 훅(Talisman 리다이렉트 등)보다 먼저 실행됨
+    if request.url_rule is not None:
+        request.environ['snaps.route'] = request.url_rule.rule
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERY_SECONDS.observe(elapsed, statement.lstrip().split(None, 1)[0].upper())
+    record_dependency_time('db', elapsed)
+
+if METRICS_ENABLED:
+    app.wsgi_app = RequestMetricsMiddleware(app.wsgi_app)
+    app.url_value_preprocessor(record_route_template)
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
 # User model definition
 class User(db.Model):
     __tablename__ = 'users'  # 테이블 이름을 명시적으로 지정
@@ -59,8 +259,802 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-# InstagramAPI 인스턴스 생성 (전역 변수)
-instagram_api = InstagramAPI()
+# 로컬 미디어 저장소: 사용자별 Instagram/Thread 게시물 캐시
+class MediaPost(db.Model):
+    __tablename__ = 'media_posts'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'platform', 'media_id', name='uq_media_posts_user_platform_media'),
+        db.Index('ix_media_posts_user_platform_timestamp', 'user_id', 'platform', 'timestamp'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    platform = db.Column(db.String(20), nullable=False)  # 'instagram' 또는 'thread'
+    media_id = db.Column(db.String(120), nullable=False)
+    media_type = db.Column(db.String(40), nullable=True)
+    text = db.Column(db.Text, nullable=True)
+    media_url = db.Column(db.Text, nullable=True)
+    permalink = db.Column(db.String(500), nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    payload = db.Column(db.JSON, nullable=True)  # API 원본 항목 (플랫폼별 추가 필드)
+    views = db.Column(db.Integer, default=0)
+    likes = db.Column(db.Integer, default=0)
+    replies = db.Column(db.Integer, default=0)
+    reposts = db.Column(db.Integer, default=0)
+    quotes = db.Column(db.Integer, default=0)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        if self.platform == 'instagram':
+            # InstagramAPI.format_posts와 같은 형태
+            return {
+                "id": self.media_id,
+                "media_url": self.media_url,
+                "caption": self.text if self.text is not None else "No caption",
+                "media_type": self.media_type,
+                "permalink": self.permalink,
+                "timestamp": format_graph_timestamp(self.timestamp)
+            }
+        post = dict(self.payload or {})
+        post.update({
+            'views': self.views,
+            'likes': self.likes,
+            'replies': self.replies,
+            'reposts': self.reposts,
+            'quotes': self.quotes
+        })
+        return post
+
+    def statistics_item(self):
+        """InstagramStatistics 입력 형태 (Graph API 미디어 항목과 같은 필드)"""
+        return {
+            "id": self.media_id,
+            "caption": self.text,
+            "media_type": self.media_type,
+            "timestamp": format_graph_timestamp(self.timestamp),
+            "like_count": self.likes,
+            "comments_count": self.replies
+        }
+
+# 게시물별 인사이트 시점 기록
+class PostInsightSnapshot(db.Model):
+    __tablename__ = 'post_insight_snapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('media_posts.id'), nullable=False, index=True)
+    captured_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    views = db.Column(db.Integer, default=0)
+    likes = db.Column(db.Integer, default=0)
+    replies = db.Column(db.Integer, default=0)
+    reposts = db.Column(db.Integer, default=0)
+    quotes = db.Column(db.Integer, default=0)
+
+# 사용자/플랫폼별 동기화 상태
+class MediaSyncState(db.Model):
+    __tablename__ = 'media_sync_states'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    platform = db.Column(db.String(20), primary_key=True)
+    last_synced_at = db.Column(db.DateTime, nullable=True)
+    newest_timestamp = db.Column(db.DateTime, nullable=True)  # 가장 최근 게시물 시각
+    insights_synced_at = db.Column(db.DateTime, nullable=True)
+
+# Thread 계정 인사이트 일별 집계 (threads_insights 일별 값)
+class ThreadDailyInsight(db.Model):
+    __tablename__ = 'thread_daily_insights'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC 기준 날짜
+    views = db.Column(db.Integer, default=0)
+    likes = db.Column(db.Integer, default=0)
+    replies = db.Column(db.Integer, default=0)
+    reposts = db.Column(db.Integer, default=0)
+    quotes = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def metrics(self):
+        return {
+            'views': self.views,
+            'likes': self.likes,
+            'replies': self.replies,
+            'reposts': self.reposts,
+            'quotes': self.quotes
+        }
+
+# 비동기/예약 게시 작업 (웹 요청은 작업만 등록하고 게시 워커가 처리)
+class PublishJob(db.Model):
+    __tablename__ = 'publish_jobs'
+    __table_args__ = (
+        db.Index('ix_publish_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    platform = db.Column(db.String(20), nullable=False, default='thread')  # 'thread' 또는 'instagram'
+    content = db.Column(db.Text, nullable=False)
+    media_type = db.Column(db.String(40), nullable=False, default='TEXT')
+    media_url = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, published, failed, canceled
+    run_at = db.Column(db.DateTime, nullable=True)  # 예약 게시 시각 (UTC, 없으면 즉시)
+    container_id = db.Column(db.String(120), nullable=True)  # 생성된 컨테이너 (재시도 시 다시 만들지 않음)
+    published_id = db.Column(db.String(120), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # 실행 중인 워커의 임대 만료 시각
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'platform': self.platform,
+            'status': self.status,
+            'scheduled_at': format_graph_timestamp(self.run_at),
+            'content': self.content,
+            'media_url': self.media_url,
+            'thread_id': self.published_id,
+            'container_id': self.container_id,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': format_graph_timestamp(self.created_at),
+            'finished_at': format_graph_timestamp(self.finished_at)
+        }
+
+# 요청 플랫폼 키 -> RAGConverter 플랫폼 이름 매핑
+PLATFORM_MAPPING = {
+    'instagram': 'Instagram',
+    'facebook': 'Facebook',
+    'thread': 'Thread',
+    'blog': '네이버 블로그'
+}
+
+# 플랫폼별 변환을 병렬로 실행하기 위한 워커 풀 (워커 프로세스당 하나)
+CONVERT_MAX_WORKERS = int(os.getenv('CONVERT_MAX_WORKERS', '8'))
+CONVERT_PLATFORM_TIMEOUT = float(os.getenv('CONVERT_PLATFORM_TIMEOUT', '30'))
+CONVERT_BATCH_MODE = os.getenv('CONVERT_BATCH_MODE', 'True') == 'True'
+CONVERT_RULE_FALLBACK = os.getenv('CONVERT_RULE_FALLBACK', 'True') == 'True'  # LLM 실패/시간 초과 시 규칙 기반 결과로 대체
+CONVERT_PREVIEW_MAX_CAPTIONS = 100
+conversion_executor = ThreadPoolExecutor(max_workers=CONVERT_MAX_WORKERS,
+                                         thread_name_prefix='convert')
+
+# 워커 시작 시 공유 RAGConverter 생성 및 OpenAI 연결 예열 (백그라운드)
+if os.getenv('RAG_WARMUP') == 'True':
+    conversion_executor.submit(lambda: get_rag_converter().warm_up())
+
+# 로컬 미디어 저장소 동기화 설정
+MEDIA_SYNC_FRESHNESS = int(os.getenv('MEDIA_SYNC_FRESHNESS', '300'))  # 이 시간(초) 안에는 API 호출 없이 저장소에서 응답
+MEDIA_SYNC_MAX_ITEMS = int(os.getenv('MEDIA_SYNC_MAX_ITEMS', '500'))  # 한 번의 동기화에서 가져올 최대 게시물 수
+INSIGHTS_REFRESH_INTERVAL = int(os.getenv('INSIGHTS_REFRESH_INTERVAL', '3600'))
+INSIGHTS_REFRESH_DAYS = int(os.getenv('INSIGHTS_REFRESH_DAYS', '7'))  # 인사이트를 갱신할 최근 게시물 범위
+INSTAGRAM_STATS_POSTS = int(os.getenv('INSTAGRAM_STATS_POSTS', '30'))  # /fetch_instagram_stats 집계 대상 최근 게시물 수
+THREAD_ROLLUP_DEFAULT_DAYS = 30  # /thread_statistics 기본 조회 기간
+THREAD_ROLLUP_REFRESH_DAYS = 2  # 아직 값이 바뀔 수 있어 매번 다시 가져오는 최근 일수
+THREAD_ROLLUP_MAX_DAYS = int(os.getenv('THREAD_ROLLUP_MAX_DAYS', '730'))  # 과거로 채울 수 있는 최대 일수
+THREAD_INSIGHTS_MIN_DATE = datetime(2024, 4, 13).date()  # threads_insights가 제공하는 가장 이른 날짜
+THREAD_ROLLUP_CHUNK_DAYS = int(os.getenv('THREAD_ROLLUP_CHUNK_DAYS', '30'))  # 한 번에 가져와 커밋하는 일수
+THREAD_ROLLUP_SYNC_DAYS = int(os.getenv('THREAD_ROLLUP_SYNC_DAYS', '40'))  # 요청 안에서 가져올 최대 일수 (나머지는 백그라운드)
+# 과거 일별 집계 채우기 전용 워커 풀 (하루당 Graph API 호출 한 번이라 변환/게시 워커와 분리)
+rollup_executor = ThreadPoolExecutor(max_workers=int(os.getenv('THREAD_ROLLUP_WORKERS', '2')),
+                                     thread_name_prefix='rollup')
+# RAG 인덱싱 전용 워커 풀 (동기화 직후 임베딩이 몰려도 변환 요청의 워커를 차지하지 않도록)
+rag_index_executor = ThreadPoolExecutor(max_workers=int(os.getenv('RAG_INDEX_WORKERS', '1')),
+                                        thread_name_prefix='rag-index')
+
+def parse_graph_timestamp(value):
+    """Graph API timestamp('2024-01-01T00:00:00+0000')를 UTC naive datetime으로 변환"""
+    parsed = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+def format_graph_timestamp(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+0000') if value else None
+
+def get_sync_state(user_id, platform):
+    """동기화 상태를 가져오거나 만듭니다.
+
+    다른 워커가 같은 행을 먼저 만들었으면 (세이브포인트에서 IntegrityError) 그 행을 다시 읽습니다.
+    """
+    state = db.session.get(MediaSyncState, (user_id, platform))
+    if state is not None:
+        return state
+    try:
+        with db.session.begin_nested():
+            state = MediaSyncState(user_id=user_id, platform=platform)
+            db.session.add(state)
+    except IntegrityError:
+        state = db.session.get(MediaSyncState, (user_id, platform), populate_existing=True)
+    return state
+
+def is_fresh(state, now):
+    return bool(state.last_synced_at and now - state.last_synced_at < timedelta(seconds=MEDIA_SYNC_FRESHNESS))
+
+def upsert_media_posts(user_id, platform, items):
+    """API 항목을 저장소에 추가하거나 갱신하고, media_id -> MediaPost 매핑을 반환합니다."""
+    media_ids = [item['id'] for item in items]
+    now = datetime.utcnow()
+
+    def load_existing():
+        return {
+            post.media_id: post
+            for post in MediaPost.query.filter(
+                MediaPost.user_id == user_id,
+                MediaPost.platform == platform,
+                MediaPost.media_id.in_(media_ids)
+            ).populate_existing().all()
+        } if media_ids else {}
+
+    def apply(post, item):
+        post.media_type = item.get('media_type')
+        post.text = item.get('caption') if platform == 'instagram' else item.get('text')
+        post.media_url = item.get('media_url') or item.get('thumbnail_url')
+        post.permalink = item.get('permalink')
+        post.timestamp = parse_graph_timestamp(item['timestamp'])
+        post.payload = item
+        post.fetched_at = now
+
+    # 새 게시물은 세이브포인트 안에서 추가합니다. 다른 워커가 같은 게시물을 먼저 넣었으면
+    # (유니크 제약 위반) 세이브포인트만 되돌리고 다시 읽어 갱신합니다.
+    existing = load_existing()
+    for attempt in range(2):
+        try:
+            with db.session.begin_nested():
+                for item in items:
+                    if item['id'] not in existing:
+                        post = MediaPost(user_id=user_id, platform=platform, media_id=item['id'])
+                        apply(post, item)
+                        db.session.add(post)
+                        existing[item['id']] = post
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+            existing = load_existing()
+
+    for item in items:
+        apply(existing[item['id']], item)
+    return existing
+
+def sync_window(state, now):
+    """(조회 시작 시각, 인사이트 갱신 여부): 인사이트를 갱신할 때는 최근 INSIGHTS_REFRESH_DAYS일을 다시 가져옵니다."""
+    refresh_insights = (state.insights_synced_at is None or
+                        now - state.insights_synced_at >= timedelta(seconds=INSIGHTS_REFRESH_INTERVAL))
+    since = state.newest_timestamp
+    if since is not None and refresh_insights:
+        since = min(since, now - timedelta(days=INSIGHTS_REFRESH_DAYS))
+    return since, refresh_insights
+
+def record_post_insights(posts, metrics_by_id, captured_at):
+    """게시물의 현재 지표를 갱신하고 시점 스냅샷을 남깁니다 (media_id -> 지표)."""
+    db.session.flush()
+    for media_id, metrics in metrics_by_id.items():
+        post = posts[media_id]
+        for name, value in metrics.items():
+            setattr(post, name, value)
+        db.session.add(PostInsightSnapshot(post_id=post.id, captured_at=captured_at, **metrics))
+
+def sync_instagram_posts(user, force=False):
+    """새 Instagram 게시물을 가져오고, 주기적으로 최근 게시물의 좋아요/댓글 수 스냅샷을 갱신합니다."""
+    state = get_sync_state(user.id, 'instagram')
+    now = datetime.utcnow()
+    if not force and is_fresh(state, now):
+        return
+
+    since, refresh_insights = sync_window(state, now)
+    items = list(instagram_client(user.access_token).iter_media(
+        since=since.replace(tzinfo=timezone.utc) if since else None,
+        max_items=MEDIA_SYNC_MAX_ITEMS
+    ))
+    posts = upsert_media_posts(user.id, 'instagram', items)
+    # Instagram은 답글 대신 댓글 수를 replies 열에 저장
+    record_post_insights(posts, {
+        item['id']: {'likes': item.get('like_count') or 0, 'replies': item.get('comments_count') or 0}
+        for item in items
+    }, now)
+    index_items = post_index_items(posts[item['id']] for item in items)
+
+    if items:
+        newest = max(parse_graph_timestamp(item['timestamp']) for item in items)
+        state.newest_timestamp = max(newest, state.newest_timestamp or newest)
+    if refresh_insights:
+        state.insights_synced_at = now
+    state.last_synced_at = now
+    db.session.commit()
+    schedule_rag_indexing(user.id, index_items)
+
+def sync_thread_posts(user, force=False):
+    """새 Thread 게시물을 가져오고, 주기적으로 최근 게시물의 인사이트 스냅샷을 갱신합니다."""
+    state = get_sync_state(user.id, 'thread')
+    now = datetime.utcnow()
+    if not force and is_fresh(state, now):
+        return
+
+    since, refresh_insights = sync_window(state, now)
+    thread_api = thread_client(user.thread_access_token)
+    items = thread_api.list_media_with_insights(
+        user.thread_account_id,
+        since=since.replace(tzinfo=timezone.utc) if since else None,
+        max_items=MEDIA_SYNC_MAX_ITEMS
+    )
+    metric_names = ('views', 'likes', 'replies', 'reposts', 'quotes')
+    payloads = [{k: v for k, v in item.items() if k not in metric_names + ('shares',)} for item in items]
+    posts = upsert_media_posts(user.id, 'thread', payloads)
+    record_post_insights(posts, {item['id']: {name: item.get(name, 0) for name in metric_names} for item in items},
+                         now)
+
+    if items:
+        newest = max(parse_graph_timestamp(item['timestamp']) for item in items)
+        state.newest_timestamp = max(newest, state.newest_timestamp or newest)
+    if refresh_insights:
+        state.insights_synced_at = now
+    state.last_synced_at = now
+    index_items = post_index_items(posts[item['id']] for item in items)
+    db.session.commit()
+    schedule_rag_indexing(user.id, index_items)
+
+# 사용자별 RAG 인덱스 (변환 시 비슷한 과거 게시물을 프롬프트 예시로 사용)
+# 변환 결과는 인덱싱하지 않음: 생성한 글이 다시 예시로 들어가 문체가 자기 강화되지 않도록
+RAG_PLATFORM_NAMES = {'instagram': 'Instagram', 'thread': 'Thread'}
+
+def rag_user_key(user_id):
+    return f"user-{user_id}" if user_id else None
+
+def post_index_items(posts):
+    return [{
+        'id': f"{post.platform}:{post.media_id}",
+        'text': post.text,
+        'platform': RAG_PLATFORM_NAMES.get(post.platform, post.platform),
+        'kind': 'post'
+    } for post in posts if post.text]
+
+def schedule_rag_indexing(user_id, items):
+    """게시물을 사용자 RAG 인덱스에 백그라운드로 추가합니다.
+
+    인덱스가 아직 비어 있으면 저장소의 최근 게시물(최대 RAG_INDEX_MAX_ITEMS개)로 먼저 채웁니다.
+    """
+    if not RAG_INDEX_DIR or not user_id or not os.getenv('OPENAI_API_KEY'):
+        return
+
+    def run():
+        try:
+            converter = get_rag_converter()
+            user_key = rag_user_key(user_id)
+            pending = list(items)
+            if not converter.indexed_count(user_key):
+                with app.app_context():
+                    recent = MediaPost.query.filter(
+                        MediaPost.user_id == user_id,
+                        MediaPost.text.isnot(None)
+                    ).order_by(MediaPost.timestamp.desc()).limit(RAG_INDEX_MAX_ITEMS).all()
+                    pending = post_index_items(reversed(recent)) + pending
+            converter.index_posts(user_key, pending)
+        except Exception as e:
+            app.logger.warning(f"RAG indexing failed for user {user_id}: {str(e)}")
+
+    rag_index_executor.submit(run)
+
+def thread_rollup_chunks(user_id, since=None, force=False):
+    """채워야 할 일별 집계 구간을 처리할 순서대로 THREAD_ROLLUP_CHUNK_DAYS일 단위로 나눠 반환합니다.
+
+    저장된 날짜가 항상 이어지도록 최근 구간(마지막 날 -> 오늘)은 오래된 쪽부터, since까지의 과거
+    구간은 최근 쪽부터 채웁니다. 중간에 멈춰도 다음 호출은 남은 구간만 다시 계산합니다.
+    """
+    state = get_sync_state(user_id, 'thread_insights')
+    now = datetime.utcnow()
+    today = now.date()
+    oldest, latest = db.session.query(db.func.min(ThreadDailyInsight.day),
+                                      db.func.max(ThreadDailyInsight.day)) \
+        .filter(ThreadDailyInsight.user_id == user_id).one()
+    chunk = timedelta(days=THREAD_ROLLUP_CHUNK_DAYS)
+
+    chunks = []
+    if latest is None:
+        start = today - timedelta(days=THREAD_ROLLUP_DEFAULT_DAYS - 1)
+        chunks.append((start, today + timedelta(days=1)))
+        oldest = start
+    elif force or state.last_synced_at is None or \
+            now - state.last_synced_at >= timedelta(seconds=INSIGHTS_REFRESH_INTERVAL):
+        start = min(latest, today) - timedelta(days=THREAD_ROLLUP_REFRESH_DAYS - 1)
+        while start <= today:
+            chunks.append((start, min(start + chunk, today + timedelta(days=1))))
+            start += chunk
+    if since is not None:
+        since = max(since, THREAD_INSIGHTS_MIN_DATE, today - timedelta(days=THREAD_ROLLUP_MAX_DAYS))
+        end = oldest
+        while since < end:
+            chunks.append((max(since, end - chunk), end))
+            end -= chunk
+    return chunks
+
+def store_thread_rollups(user, start, end):
+    """[start, end) 구간의 threads_insights 일별 값을 가져와 저장하고 커밋합니다."""
+    now = datetime.utcnow()
+    daily = thread_client(user.thread_access_token).get_daily_insights(user.thread_account_id, start, end)
+
+    def load_existing():
+        return {
+            row.day: row for row in ThreadDailyInsight.query.filter(
+                ThreadDailyInsight.user_id == user.id,
+                ThreadDailyInsight.day >= start,
+                ThreadDailyInsight.day < end
+            ).populate_existing().all()
+        }
+
+    # 다른 워커가 같은 날짜를 먼저 넣었으면 세이브포인트만 되돌리고 다시 읽음 (upsert_media_posts와 같은 방식)
+    existing = load_existing()
+    for attempt in range(2):
+        try:
+            with db.session.begin_nested():
+                for day in daily:
+                    if day not in existing:
+                        existing[day] = ThreadDailyInsight(user_id=user.id, day=day)
+                        db.session.add(existing[day])
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+            existing = load_existing()
+
+    for day, metrics in daily.items():
+        row = existing[day]
+        for name, value in metrics.items():
+            setattr(row, name, value)
+        row.updated_at = now
+    if end > now.date():
+        get_sync_state(user.id, 'thread_insights').last_synced_at = now
+    db.session.commit()
+
+def sync_thread_rollups(user, since=None, force=False):
+    """threads_insights 일별 값을 thread_daily_insights에 반영합니다.
+
+    저장된 마지막 날 이후(최근 THREAD_ROLLUP_REFRESH_DAYS일 포함)와 since까지 비어 있는 과거 구간을
+    구간마다 커밋하며 채웁니다. 요청 안에서는 THREAD_ROLLUP_SYNC_DAYS일까지만 조회하고(기본 호출
+    예산의 burst 안), 나머지는 백그라운드 작업으로 넘겨 PRIORITY_BACKGROUND 예산으로 채웁니다.
+    남은 구간이 있으면 True를 반환합니다.
+    """
+    if thread_rollup_backfill_pending(user.id):
+        # 백그라운드 작업이 이 사용자의 구간을 채우는 중이면 목표 날짜만 넘김
+        schedule_rollup_backfill(user.id, since)
+        return True
+    chunks = thread_rollup_chunks(user.id, since=since, force=force)
+    budget = THREAD_ROLLUP_SYNC_DAYS
+    for start, end in chunks:
+        days = (end - start).days
+        if days > budget:
+            schedule_rollup_backfill(user.id, since)
+            return True
+        store_thread_rollups(user, start, end)
+        budget -= days
+    return False
+
+# 백그라운드 일별 집계 채우기: 사용자 id -> 채울 가장 이른 날짜 (None이면 최근 구간만)
+_rollup_backfills = {}
+_rollup_backfills_lock = threading.Lock()
+
+def schedule_rollup_backfill(user_id, since):
+    """사용자의 남은 일별 집계 구간을 rollup_executor에서 채웁니다 (사용자당 작업 하나).
+
+    작업이 이미 실행 중이면 목표 날짜만 더 이른 쪽으로 바꾸고, 작업이 끝날 때 다시 실행됩니다.
+    """
+    with _rollup_backfills_lock:
+        running = user_id in _rollup_backfills
+        current = _rollup_backfills.get(user_id)
+        _rollup_backfills[user_id] = min(since, current) if since and current else (since or current)
+    if not running:
+        rollup_executor.submit(run_rollup_backfill, user_id)
+
+def run_rollup_backfill(user_id):
+    with _rollup_backfills_lock:
+        since = _rollup_backfills[user_id]
+    failed = False
+    with app.app_context(), graph_priority(PRIORITY_BACKGROUND):
+        try:
+            # 다른 워커 프로세스의 같은 작업과는 sync_flight 잠금으로 차례로 실행 (나중 작업은 남은 구간만 채움)
+            sync_flight.do(('rollup_backfill', user_id, str(since)), backfill_thread_rollups, user_id, since)
+        except Exception as e:
+            failed = True
+            db.session.rollback()
+            app.logger.warning(f"Thread insights backfill failed for user {user_id}: {str(e)}")
+        finally:
+            db.session.remove()
+
+    with _rollup_backfills_lock:
+        # 실패하면 다음 /thread_statistics 요청이 남은 구간부터 다시 시작
+        if failed or _rollup_backfills.get(user_id) == since:
+            del _rollup_backfills[user_id]
+            return
+    rollup_executor.submit(run_rollup_backfill, user_id)
+
+def backfill_thread_rollups(user_id, since):
+    """남은 구간을 하나씩 채우고 커밋합니다 (구간마다 저장 상태를 다시 읽음)."""
+    while True:
+        db.session.commit()  # 다른 워커가 커밋한 구간도 보이도록 읽기 트랜잭션을 끝냄
+        user = db.session.get(User, user_id)
+        chunks = thread_rollup_chunks(user_id, since=since) if user and user.thread_access_token else []
+        if not chunks:
+            db.session.commit()
+            return
+        store_thread_rollups(user, *chunks[0])
+
+def thread_rollup_backfill_pending(user_id):
+    with _rollup_backfills_lock:
+        return user_id in _rollup_backfills
+
+def thread_statistics_payload(user, since, until, granularity='auto'):
+    """[since, until) 구간의 Thread 통계를 저장된 일별 집계와 게시물 저장소에서 만듭니다."""
+    if granularity == 'auto':
+        granularity = auto_granularity(since, until)
+    rows = ThreadDailyInsight.query.filter(
+        ThreadDailyInsight.user_id == user.id,
+        ThreadDailyInsight.day >= since,
+        ThreadDailyInsight.day < until
+    ).order_by(ThreadDailyInsight.day).all()
+    total_posts = MediaPost.query.filter(
+        MediaPost.user_id == user.id,
+        MediaPost.platform == 'thread',
+        MediaPost.timestamp >= datetime.combine(since, datetime.min.time()),
+        MediaPost.timestamp < datetime.combine(until, datetime.min.time())
+    ).count()
+    return summarize_daily_insights([(row.day, row.metrics()) for row in rows], since, until,
+                                    total_posts=total_posts, granularity=granularity)
+
+def statistics_range_args():
+    """?since=YYYY-MM-DD&until=YYYY-MM-DD(포함) 쿼리 파라미터를 [since, until) 날짜 구간으로 변환합니다."""
+    today = datetime.utcnow().date()
+    until = request.args.get('until')
+    until = datetime.strptime(until, '%Y-%m-%d').date() if until else today
+    since = request.args.get('since')
+    since = datetime.strptime(since, '%Y-%m-%d').date() if since else until - timedelta(days=THREAD_ROLLUP_DEFAULT_DAYS - 1)
+    if since > until:
+        raise ValueError('since must not be after until')
+    return since, until + timedelta(days=1)
+
+# 게시 작업 큐 설정
+PUBLISH_MAX_WORKERS = int(os.getenv('PUBLISH_MAX_WORKERS', '4'))
+PUBLISH_MAX_ATTEMPTS = int(os.getenv('PUBLISH_MAX_ATTEMPTS', '3'))
+PUBLISH_RETRY_DELAY = float(os.getenv('PUBLISH_RETRY_DELAY', '5'))
+PUBLISH_JOB_LEASE = int(os.getenv('PUBLISH_JOB_LEASE', '120'))  # 워커가 응답 없이 작업을 잡고 있을 수 있는 시간(초)
+publish_executor = ThreadPoolExecutor(max_workers=PUBLISH_MAX_WORKERS, thread_name_prefix='publish')
+
+def runnable_job_filter(now, due_by=None):
+    """실행할 수 있는 작업: 예약 시각(due_by, 기본 now)이 된 대기 작업 또는 임대가 만료된 실행 중 작업"""
+    due_by = due_by or now
+    return db.or_(
+        db.and_(PublishJob.status == 'queued', db.or_(PublishJob.run_at.is_(None), PublishJob.run_at <= due_by)),
+        db.and_(PublishJob.status == 'running', PublishJob.locked_until < now)
+    )
+
+def claim_publish_job(job_id):
+    """실행할 수 있는 작업을 원자적으로 가져옵니다 (여러 워커 프로세스 간 중복 게시 방지)."""
+    now = datetime.utcnow()
+    claimed = PublishJob.query.filter(
+        PublishJob.id == job_id,
+        runnable_job_filter(now)
+    ).update({'status': 'running', 'locked_until': now + timedelta(seconds=PUBLISH_JOB_LEASE)},
+             synchronize_session=False)
+    db.session.commit()
+    return db.session.get(PublishJob, job_id) if claimed else None
+
+def extend_publish_lease(job):
+    job.locked_until = datetime.utcnow() + timedelta(seconds=PUBLISH_JOB_LEASE)
+    db.session.commit()
+
+def is_retryable_publish_error(error):
+    if isinstance(error, (MediaPublishError, KeyError)):
+        return False
+    if isinstance(error, requests.RequestException) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return True
+
+def publish_error_message(error):
+    """작업에 저장할 오류 메시지 (요청 URL의 access_token이 남지 않도록 Graph 오류 본문만 사용)"""
+    if isinstance(error, requests.RequestException):
+        if error.response is None:
+            return f"Graph API connection error ({type(error).__name__})"
+        try:
+            message = error.response.json().get('error', {}).get('message', '')
+        except ValueError:
+            message = ''
+        return f"Graph API error (HTTP {error.response.status_code}) {message}".strip()
+    return str(error)
+
+def publish_client(job, user):
+    """작업 플랫폼의 API 클라이언트와 게시 계정 ID"""
+    if job.platform == 'instagram':
+        return instagram_client(user.access_token), user.instagram_id
+    return thread_client(user.thread_access_token), user.thread_account_id
+
+def run_publish_job(job_id):
+    """게시 워커: 컨테이너 생성 -> 준비 상태 폴링 -> 게시, 일시적 오류는 백오프 후 재시도"""
+    with app.app_context(), graph_priority(PRIORITY_BACKGROUND):
+        try:
+            job = claim_publish_job(job_id)
+            if job is None:
+                return
+            api, account_id = publish_client(job, db.session.get(User, job.user_id))
+            while True:
+                try:
+                    if not job.container_id:
+                        job.container_id = api.create_container(account_id, job.content, job.media_type,
+                                                                job.media_url)
+                        db.session.commit()
+                    status = api.wait_for_container(job.container_id, on_poll=lambda: extend_publish_lease(job))
+                    if status == 'FINISHED':
+                        job.published_id = api.publish_container(account_id, job.container_id).get('id')
+                    job.status = 'published'
+                    job.error = None
+                    break
+                except Exception as e:
+                    db.session.rollback()
+                    job.attempts += 1
+                    job.error = publish_error_message(e)
+                    app.logger.warning(f"Publish job {job.id} attempt {job.attempts} failed: {job.error}")
+                    if job.attempts >= PUBLISH_MAX_ATTEMPTS or not is_retryable_publish_error(e):
+                        job.status = 'failed'
+                        break
+                    extend_publish_lease(job)
+                    time.sleep(PUBLISH_RETRY_DELAY * 2 ** (job.attempts - 1))
+            job.finished_at = datetime.utcnow()
+            job.locked_until = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Publish job {job_id} error: {str(e)}", exc_info=True)
+        finally:
+            db.session.remove()
+
+class PublishScheduler:
+    """예약 게시 작업을 가장 이른 run_at 시각에 깨어나 게시 워커 풀에 넘기는 프로세스 내 스케줄러
+
+    (run_at, job_id) 힙과 Condition으로 다음 예약 시각까지 잠들어 있으므로 대기 중에는 CPU를
+    쓰지 않습니다. 다른 워커 프로세스에서 등록되었거나 재시작 전에 남은 작업은 resync_interval마다
+    DB에서 다음 구간(horizon)의 작업만 읽어 힙에 채웁니다. 같은 작업을 여러 프로세스가 넘겨받아도
+    claim_publish_job의 DB 임대로 한 번만 게시됩니다.
+
+    스레드는 import 시점이 아니라 프로세스에서 처음 필요할 때(첫 요청, 작업 등록) 시작합니다. fork된
+    워커(gunicorn --preload)는 물려받은 힙과 잠금을 버리고, 첫 요청에서 자기 스레드를 띄워 DB에서 다시 읽습니다.
+    """
+
+    def __init__(self, submit, resync_interval=60.0):
+        self.submit = submit
+        self.resync_interval = resync_interval
+        self._heap = []
+        self._pending = {}  # job_id -> run_at (힙에 남은 오래된 항목 무시용)
+        self._inflight = set()  # 워커 풀에 넘겼지만 아직 끝나지 않은 작업
+        self._condition = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None  # 스케줄러 스레드를 시작한 프로세스
+        self._next_resync = 0.0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # 부모의 스레드는 자식에 없고, fork 순간 다른 스레드가 잡고 있던 잠금은 풀리지 않으므로 새로 만듦
+        self._heap, self._pending, self._inflight = [], {}, set()
+        self._condition = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._next_resync = 0.0
+
+    def start(self):
+        """이 프로세스에서 아직 시작하지 않았으면 스케줄러 스레드를 시작합니다."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='publish-scheduler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def add(self, job_id, run_at):
+        """run_at(UTC naive)에 작업을 실행하도록 등록합니다. 더 이른 시각이면 스케줄러를 깨웁니다."""
+        self.start()
+        with self._condition:
+            if job_id in self._inflight or self._pending.get(job_id) == run_at:
+                return
+            self._pending[job_id] = run_at
+            heapq.heappush(self._heap, (run_at, job_id))
+            if self._heap[0] == (run_at, job_id):
+                self._condition.notify()
+
+    def resync(self):
+        """DB에서 다음 구간 안에 실행할 작업을 읽어 힙에 채웁니다."""
+        self.start()
+        now = datetime.utcnow()
+        horizon = now + timedelta(seconds=self.resync_interval * 2)
+        with app.app_context():
+            try:
+                rows = db.session.query(PublishJob.id, PublishJob.run_at).filter(
+                    runnable_job_filter(now, due_by=horizon)
+                ).all()
+            except Exception as e:
+                app.logger.warning(f"Could not load scheduled publish jobs: {str(e)}")
+                return
+            finally:
+                db.session.remove()
+        now = datetime.utcnow()
+        for job_id, run_at in rows:
+            self.add(job_id, max(run_at or now, now))
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            run_at, job_id = heapq.heappop(self._heap)
+            if self._pending.get(job_id) == run_at:
+                del self._pending[job_id]
+                due.append(job_id)
+        return due
+
+    def _run(self):
+        while True:
+            if time.monotonic() >= self._next_resync:
+                self._next_resync = time.monotonic() + self.resync_interval
+                self.resync()
+            with self._condition:
+                due = self._pop_due(datetime.utcnow())
+                if not due:
+                    timeout = self._next_resync - time.monotonic()
+                    if self._heap:
+                        timeout = min(timeout, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+                    self._condition.wait(max(timeout, 0))
+                    due = self._pop_due(datetime.utcnow())
+            for job_id in due:
+                self._dispatch(job_id)
+
+    def _dispatch(self, job_id):
+        with self._condition:
+            self._inflight.add(job_id)
+        future = self.submit(run_publish_job, job_id)
+        future.add_done_callback(lambda _: self._done(job_id))
+
+    def _done(self, job_id):
+        with self._condition:
+            self._inflight.discard(job_id)
+
+PUBLISH_SCHEDULER_RESYNC = float(os.getenv('PUBLISH_SCHEDULER_RESYNC', '60'))
+SCHEDULE_PAST_GRACE = 60  # /scheduled_posts가 받는 지난 예약 시각의 한도(초, 클라이언트 시계 차이)
+publish_scheduler = PublishScheduler(publish_executor.submit, resync_interval=PUBLISH_SCHEDULER_RESYNC)
+
+def enqueue_publish_job(user, content, media_type='TEXT', media_url=None, platform='thread', run_at=None):
+    """게시 작업을 등록합니다. run_at(UTC naive)이 없거나 지났으면 바로 실행됩니다."""
+    job = PublishJob(user_id=user.id, platform=platform, content=content,
+                     media_type=media_type, media_url=media_url, run_at=run_at)
+    db.session.add(job)
+    db.session.commit()
+    publish_scheduler.add(job.id, run_at or job.created_at)
+    return job
+
+def resume_publish_jobs():
+    """재시작 전에 끝나지 못한 작업과 곧 실행할 예약 작업을 스케줄러에 다시 넣습니다."""
+    publish_scheduler.resync()
+
+PUBLISH_RESUME_ON_START = os.getenv('PUBLISH_RESUME_ON_START', 'True') == 'True'
+
+@app.before_request
+def start_publish_scheduler():
+    """워커 프로세스의 첫 요청에서 게시 스케줄러를 시작합니다 (시작하면 남은 작업을 DB에서 다시 읽음)."""
+    if PUBLISH_RESUME_ON_START:
+        publish_scheduler.start()
+
+# 같은 사용자의 동시 동기화 합치기 (SINGLE_FLIGHT_LOCK_DIR을 공유하면 워커 프로세스 간에도)
+sync_flight = SingleFlight(lock_dir=os.getenv('SINGLE_FLIGHT_LOCK_DIR') or None)
+
+def coalesced_sync(sync, user, **kwargs):
+    """sync(user, **kwargs)를 실행하되, 같은 사용자/인자로 진행 중인 동기화가 있으면 그 결과를 기다립니다.
+
+    다른 요청이나 워커가 커밋한 동기화 결과가 보이도록 앞뒤로 읽기 트랜잭션을 끝냅니다. 다른
+    프로세스에서 잠금을 기다린 호출은 sync의 신선도 확인으로 Graph API 호출 없이 끝납니다.
+    """
+    key = (sync.__name__, user.id, json.dumps(kwargs, sort_keys=True, default=str))
+    db.session.commit()
+    result = sync_flight.do(key, sync, user, **kwargs)
+    db.session.commit()
+    return result
+
+def stored_posts(user_id, platform, limit):
+    return MediaPost.query.filter_by(user_id=user_id, platform=platform) \
+        .order_by(MediaPost.timestamp.desc()).limit(limit).all()
 
 @app.route('/')
 def index():
@@ -111,48 +1105,105 @@ def fetch_posts():
 
     app.logger.debug("Fetching posts...")
     try:
-        # 데이터베이스에 저장된 사용자의 액세스 토큰 사용
-        instagram_api.set_access_token(user.access_token)
-        media_items = instagram_api.get_user_media()
-        app.logger.debug(f"Media items fetched: {media_items}")
-        formatted_posts = instagram_api.format_posts(media_items)
-        app.logger.debug(f"Formatted posts: {formatted_posts}")
+        coalesced_sync(sync_instagram_posts, user)
+    except Exception as e:
+        # 동기화에 실패해도 저장소에 있는 게시물로 응답
+        db.session.rollback()
+        app.logger.error(f"Error syncing Instagram posts: {str(e)}")
+
+    try:
+        limit = int((request.get_json(silent=True) or {}).get('limit', 10))
+        formatted_posts = [post.to_dict() for post in stored_posts(user.id, 'instagram', limit)]
+        log_event(app.logger, logging.DEBUG, "Fetched posts", payload=formatted_posts,
+                  user_id=user.id, count=len(formatted_posts))
         return jsonify({"posts": formatted_posts})
     except Exception as e:
         app.logger.error(f"Error fetching posts: {str(e)}")
         return jsonify({"error": str(e)}), 400
 
+def ndjson_response(items):
+    """항목을 한 줄에 하나씩 JSON으로 스트리밍합니다 (전체 목록을 메모리에 올리지 않음)."""
+    def lines():
+        for item in items:
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+def history_range_args():
+    """since/until(unix time)과 max_items 쿼리 파라미터"""
+    return {
+        'since': request.args.get('since', type=int),
+        'until': request.args.get('until', type=int),
+        'max_items': request.args.get('max_items', type=int)
+    }
+
+@app.route('/fetch_posts/stream')
+def fetch_posts_stream():
+    """Instagram 게시물 전체 이력을 페이지를 따라가며 NDJSON으로 스트리밍"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Login required"}), 401
+
+    user = User.query.get(session['user_id'])
+    if not user or not user.access_token:
+        return jsonify({"error": "Instagram authentication required"}), 401
+
+    instagram_api = instagram_client(user.access_token)
+    media_items = instagram_api.iter_media(**history_range_args())
+    return ndjson_response(post for item in media_items for post in instagram_api.format_posts([item]))
+
+@app.route('/fetch_thread_posts/stream')
+def fetch_thread_posts_stream():
+    """Thread 게시물 전체 이력을 페이지를 따라가며 NDJSON으로 스트리밍"""
+    if 'user_id' not in session:
+        return jsonify({'error': '로그인이 필요합니다.'}), 401
+
+    user = User.query.get(session['user_id'])
+    if not user or not user.thread_account_id:
+        return jsonify({'error': 'Thread 계정이 연동되어 있지 않습니다.'}), 401
+
+    thread_api = thread_client(user.thread_access_token)
+    return ndjson_response(thread_api.iter_media(user.thread_account_id, **history_range_args()))
+
 @app.route('/convert', methods=['POST'])
 def convert():
     try:
         data = request.json
-        app.logger.info(f"Received data: {data}")
         if not data:
             return jsonify({"error": "No JSON data received"}), 400
 
-        # 플랫폼 매핑 추가
-        platform_mapping = {
-            'instagram': 'Instagram',
-            'facebook': 'Facebook',
-            'thread': 'Thread',
-            'blog': '네이버 블로그'
-        }
-
         caption = data.get('caption')
-        target_platform = platform_mapping.get(data.get('targetPlatform', '').lower(), 'Instagram')
+        target_platform = PLATFORM_MAPPING.get(data.get('targetPlatform', '').lower(), 'Instagram')
         has_image = data.get('hasImage', False)
+        force_regenerate = data.get('forceRegenerate', False)
 
         if not caption:
             return jsonify({"error": "Missing required fields"}), 400
 
         # 기본 변환
         basic_converted_post = convert_post(caption, target_platform, has_image)
-        app.logger.info(f"Basic converted post: {basic_converted_post}")
 
-        # RAG 변환
-        rag_converter = RAGConverter()
-        rag_converted_post = rag_converter.generate_enhanced_post(caption, target_platform, has_image)
-        app.logger.info(f"RAG converted post: {rag_converted_post}")
+        # RAG 변환 (로그인 사용자는 과거 게시물을 예시로 사용)
+        user_id = session.get('user_id')
+        try:
+            rag_converted_post = get_rag_converter().generate_enhanced_post(
+                caption, target_platform, has_image, use_cache=not force_regenerate,
+                user_key=rag_user_key(user_id)
+            )
+        except Exception as e:
+            if not CONVERT_RULE_FALLBACK:
+                raise
+            app.logger.warning(f"RAG conversion failed, using rule-based result: {str(e)}")
+            log_event(app.logger, logging.INFO, "Converted post",
+                      payload={'request': data, 'basic': basic_converted_post},
+                      platform=target_platform, caption_chars=len(caption), fallback=True)
+            return jsonify({
+                "basicConvertedPost": basic_converted_post,
+                "ragConvertedPost": basic_converted_post,
+                "fallback": True
+            })
+        # 요청, 기본 변환, RAG 변환을 한 레코드로 (캡션 원문이 레코드마다 반복되지 않도록)
+        log_event(app.logger, logging.INFO, "Converted post",
+                  payload={'request': data, 'basic': basic_converted_post, 'rag': rag_converted_post},
+                  platform=target_platform, caption_chars=len(caption), fallback=False)
 
         return jsonify({
             "basicConvertedPost": basic_converted_post,
@@ -162,16 +1213,168 @@ def convert():
         app.logger.error(f"Error in /convert route: {str(e)}", exc_info=True)
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+def sse_event(event, data):
+    """Server-Sent Events 형식의 메시지 한 건을 만듭니다."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def fallback_events(caption, platform, has_image):
+    """LLM 스트림이 실패했을 때 규칙 기반 결과를 chunk/done 이벤트로 보냅니다."""
+    yield sse_event('chunk', {'platform': platform, 'text': convert_post(caption, platform, has_image)})
+    yield sse_event('done', {'platform': platform, 'fallback': True})
+
+def sse_response(events):
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 프록시(nginx) 버퍼링 비활성화
+    })
+
+@app.route('/convert/stream', methods=['POST'])
+def convert_stream():
+    """/convert의 스트리밍 버전 (SSE). chunk 이벤트로 생성 중인 텍스트를 보냅니다."""
+    data = request.json
+    if not data or not data.get('caption'):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    caption = data.get('caption')
+    target_platform = PLATFORM_MAPPING.get(data.get('targetPlatform', '').lower(), 'Instagram')
+    has_image = data.get('hasImage', False)
+    force_regenerate = data.get('forceRegenerate', False)
+    user_id = session.get('user_id')
+
+    def events():
+        chunks = []
+        try:
+            yield sse_event('start', {'platform': target_platform})
+            for text in get_rag_converter().stream_enhanced_post(
+                caption, target_platform, has_image, use_cache=not force_regenerate,
+                user_key=rag_user_key(user_id)
+            ):
+                chunks.append(text)
+                yield sse_event('chunk', {'platform': target_platform, 'text': text})
+            yield sse_event('done', {'platform': target_platform})
+        except Exception as e:
+            app.logger.error(f"Error in /convert/stream route: {str(e)}", exc_info=True)
+            if CONVERT_RULE_FALLBACK and not chunks:
+                yield from fallback_events(caption, target_platform, has_image)
+            else:
+                yield sse_event('error', {'platform': target_platform, 'error': 'An unexpected error occurred'})
+        yield sse_event('end', {})
+
+    return sse_response(events())
+
+@app.route('/convert_all/stream', methods=['POST'])
+def convert_all_stream():
+    """/convert_all의 스트리밍 버전 (SSE). 플랫폼별 스트림을 동시에 실행하고 이벤트마다 platform을 붙입니다."""
+    data = request.json or {}
+    caption = data.get('caption')
+    platforms = data.get('platforms', [])
+    force_regenerate = data.get('forceRegenerate', False)
+
+    if not caption or not platforms:
+        return jsonify({"error": "Caption and platforms are required"}), 400
+
+    mapped_platforms = []
+    for platform in platforms:
+        mapped_platform = PLATFORM_MAPPING.get(platform.lower())
+        if mapped_platform and mapped_platform not in mapped_platforms:
+            mapped_platforms.append(mapped_platform)
+
+    user_id = session.get('user_id')
+    rag_converter = get_rag_converter()
+    events_queue = queue.Queue()
+    stop = threading.Event()  # 응답이 끝나면(완료, 연결 끊김) 모든 플랫폼의 생성을 멈춤
+    timed_out = set()  # 시간이 초과되어 결과를 더 받지 않는 플랫폼
+    started_at = {}  # 플랫폼 -> 워커에서 생성을 시작한 시각
+
+    def produce(platform):
+        started_at[platform] = time.monotonic()
+        chunks = []
+        stream = rag_converter.stream_enhanced_post(
+            caption, platform, True, use_cache=not force_regenerate,
+            user_key=rag_user_key(user_id)
+        )
+        try:
+            for text in stream:
+                if stop.is_set() or platform in timed_out:
+                    return  # 읽는 쪽이 없으므로 남은 토큰을 받지 않고 워커를 돌려줌
+                chunks.append(text)
+                events_queue.put(('chunk', {'platform': platform, 'text': text}))
+            events_queue.put(('done', {'platform': platform}))
+        except Exception as e:
+            app.logger.error(f"Streaming conversion error for {platform}: {str(e)}")
+            if CONVERT_RULE_FALLBACK and not chunks:
+                events_queue.put(('fallback', {'platform': platform}))
+            else:
+                events_queue.put(('error', {'platform': platform, 'error': str(e)}))
+        finally:
+            stream.close()  # LLM 스트림 연결을 닫음 (중간에 멈춘 결과는 캐시되지 않음)
+
+    # 다른 변환 라우트처럼 워커 스레드도 요청의 호출 우선순위와 의존성 시간 집계를 따름
+    produce = with_request_context(produce)
+    for platform in mapped_platforms:
+        conversion_executor.submit(produce, platform)
+
+    def events():
+        # 플랫폼마다 생성을 시작한 때부터 CONVERT_PLATFORM_TIMEOUT초 (워커를 기다리는 동안은 요청 시작부터)
+        requested_at = time.monotonic()
+        remaining = set(mapped_platforms)
+        started = set()  # chunk를 보내기 시작한 플랫폼 (중간에 규칙 기반 결과로 바꾸지 않음)
+        try:
+            yield sse_event('start', {'platforms': mapped_platforms})
+            while remaining:
+                deadlines = {platform: started_at.get(platform, requested_at) + CONVERT_PLATFORM_TIMEOUT
+                             for platform in remaining}
+                try:
+                    event, payload = events_queue.get(timeout=max(0.0, min(deadlines.values()) - time.monotonic()))
+                except queue.Empty:
+                    now = time.monotonic()
+                    for platform in sorted(remaining):
+                        if started_at.get(platform, requested_at) + CONVERT_PLATFORM_TIMEOUT > now:
+                            continue  # 기다리는 사이 워커에서 시작됨
+                        timed_out.add(platform)
+                        remaining.discard(platform)
+                        if CONVERT_RULE_FALLBACK and platform not in started:
+                            yield from fallback_events(caption, platform, True)
+                        else:
+                            yield sse_event('error', {'platform': platform, 'error': '변환 시간이 초과되었습니다.'})
+                    continue
+                if payload['platform'] not in remaining:
+                    continue  # 시간 초과로 이미 끝낸 플랫폼
+                if event != 'chunk':
+                    remaining.discard(payload['platform'])
+                else:
+                    started.add(payload['platform'])
+                if event == 'fallback':
+                    yield from fallback_events(caption, payload['platform'], True)
+                    continue
+                yield sse_event(event, payload)
+            yield sse_event('end', {})
+        finally:
+            stop.set()  # 연결이 끊겨 제너레이터가 닫힌 경우(GeneratorExit)도 포함
+
+    return sse_response(events())
+
 @app.route('/fetch_instagram_stats', methods=['GET'])
 def fetch_instagram_stats():
-    if 'instagram_access_token' not in session:
+    user = User.query.get(session['user_id']) if 'user_id' in session else None
+    if not (user and user.access_token) and 'instagram_access_token' not in session:
         return jsonify({"error": "Instagram authentication required"}), 401
-        
+
+    limit = request.args.get('limit', INSTAGRAM_STATS_POSTS, type=int)
     try:
-        # 세션의 액세스 토큰으로 API 인스턴스 업데이트
-        instagram_api.set_access_token(session['instagram_access_token'])
-        stats = instagram_api.get_user_statistics(limit=30)  # 최근 30개 게시물 기준
-        return jsonify(stats)
+        if not (user and user.access_token):
+            # 로그인 없이 연동한 세션: 세션 토큰 전용 클라이언트로 최근 게시물 집계
+            return jsonify(instagram_client(session['instagram_access_token']).get_user_statistics(limit=limit))
+
+        # 저장소의 최근 게시물로 집계 (동기화 때 좋아요/댓글 수도 주기적으로 갱신됨, 워커 간 공유)
+        try:
+            coalesced_sync(sync_instagram_posts, user)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error syncing Instagram posts: {str(e)}")
+        statistics = InstagramStatistics()
+        statistics.add_posts([post.statistics_item() for post in stored_posts(user.id, 'instagram', limit)])
+        return jsonify(statistics.summary())
     except Exception as e:
         app.logger.error(f"Error fetching Instagram stats: {str(e)}")
         return jsonify({"error": "통계를 가져오는 데 실패했습니다. 잠시 후 다시 시도해주세요."}), 500
@@ -391,44 +1594,147 @@ def unlink_thread_account():
         app.logger.error(f"Thread account unlinking error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def convert_platforms_concurrently(rag_converter, caption, platforms, use_cache=True, timeout=None,
+                                   user_key=None):
+    """플랫폼별 변환을 동시에 실행합니다 (응답 시간 = 가장 느린 플랫폼).
+
+    실패하거나 시간 초과된 플랫폼은 errors에 담고 나머지는 부분 결과로 반환합니다.
+    시간 초과된 변환 중 이미 실행 중인 것은 멈추지 않고 끝까지 실행되며, 결과는 변환 캐시에 남습니다.
+    """
+    futures = {}
+    for platform in platforms:
+        future = conversion_executor.submit(
+            with_request_context(rag_converter.generate_enhanced_post),
+            caption,
+            platform,
+            True,  # has_image 기본값
+            use_cache=use_cache,
+            user_key=user_key
+        )
+        futures[future] = platform
+
+    _, not_done = wait(futures, timeout=timeout)
+
+    conversions = {}
+    errors = {}
+    for future, platform in futures.items():
+        if future in not_done:
+            # 아직 워커를 기다리는 변환만 빠짐 (실행 중인 LLM 호출은 끝까지 실행되어 캐시에 저장됨)
+            future.cancel()
+            app.logger.warning(f"Conversion timed out for {platform}")
+            errors[platform] = '변환 시간이 초과되었습니다.'
+            continue
+        try:
+            conversions[platform] = future.result()
+        except Exception as e:
+            app.logger.error(f"Conversion error for {platform}: {str(e)}")
+            errors[platform] = str(e)
+    return conversions, errors
+
 @app.route('/convert_all', methods=['POST'])
 def convert_all():
     try:
         data = request.json
         caption = data.get('caption')
         platforms = data.get('platforms', [])
+        force_regenerate = data.get('forceRegenerate', False)
 
         if not caption or not platforms:
             return jsonify({"error": "Caption and platforms are required"}), 400
 
-        platform_mapping = {
-            'instagram': 'Instagram',
-            'facebook': 'Facebook',
-            'thread': 'Thread',
-            'blog': '네이버 블로그'
-        }
-
-        rag_converter = RAGConverter()
-        conversions = {}
-        
+        mapped_platforms = []
         for platform in platforms:
-            mapped_platform = platform_mapping.get(platform.lower())
-            if mapped_platform:
-                converted = rag_converter.generate_enhanced_post(
-                    caption, 
-                    mapped_platform,
-                    has_image=True  # 기본값으로 설정
-                )
-                conversions[mapped_platform] = converted
+            mapped_platform = PLATFORM_MAPPING.get(platform.lower())
+            if mapped_platform and mapped_platform not in mapped_platforms:
+                mapped_platforms.append(mapped_platform)
+
+        user_id = session.get('user_id')
+        user_key = rag_user_key(user_id)
+        rag_converter = get_rag_converter()
+        deadline = time.monotonic() + CONVERT_PLATFORM_TIMEOUT
+        conversions = {}
+        errors = {}
+
+        # 여러 플랫폼은 한 번의 LLM 호출로 일괄 변환
+        if CONVERT_BATCH_MODE and len(mapped_platforms) > 1:
+            future = conversion_executor.submit(
+                with_request_context(rag_converter.generate_enhanced_posts),
+                caption,
+                mapped_platforms,
+                True,  # has_image 기본값
+                use_cache=not force_regenerate,
+                fallback=False,
+                user_key=user_key
+            )
+            try:
+                conversions.update(future.result(timeout=CONVERT_PLATFORM_TIMEOUT))
+            except FutureTimeoutError:
+                app.logger.warning("Batch conversion timed out")
+                errors = {platform: '변환 시간이 초과되었습니다.' for platform in mapped_platforms}
+            except Exception as e:
+                app.logger.warning(f"Batch conversion failed, falling back per platform: {str(e)}")
+
+        # 일괄 변환에서 빠진 플랫폼은 플랫폼별로 동시에 변환
+        missing = [p for p in mapped_platforms if p not in conversions and p not in errors]
+        if missing:
+            fallback_conversions, fallback_errors = convert_platforms_concurrently(
+                rag_converter, caption, missing,
+                use_cache=not force_regenerate,
+                timeout=max(0.0, deadline - time.monotonic()),
+                user_key=user_key
+            )
+            conversions.update(fallback_conversions)
+            errors.update(fallback_errors)
+
+        # 실패하거나 시간 초과된 플랫폼은 규칙 기반 결과로 대체
+        fallbacks = {}
+        if CONVERT_RULE_FALLBACK and errors:
+            fallbacks = errors
+            errors = {}
+            conversions.update(convert_posts([caption], list(fallbacks), True)[0])
+        conversions = {p: conversions[p] for p in mapped_platforms if p in conversions}
+
+        if errors and not conversions:
+            return jsonify({
+                "success": False,
+                "error": "모든 플랫폼 변환에 실패했습니다.",
+                "errors": errors
+            }), 500
 
         return jsonify({
             "success": True,
-            "conversions": conversions
+            "conversions": conversions,
+            "errors": errors,
+            "fallbacks": fallbacks
         })
     except Exception as e:
         app.logger.error(f"Conversion error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/convert/preview', methods=['POST'])
+def convert_preview():
+    """LLM 없이 규칙 기반으로 즉시 변환합니다. caption 하나 또는 captions 목록(일괄)을 받습니다."""
+    data = request.json or {}
+    captions = data.get('captions') or ([data['caption']] if data.get('caption') else [])
+    platforms = data.get('platforms') or [data.get('targetPlatform', 'instagram')]
+    if not captions or not all(isinstance(caption, str) for caption in captions):
+        return jsonify({"error": "Caption is required"}), 400
+    if len(captions) > CONVERT_PREVIEW_MAX_CAPTIONS:
+        return jsonify({"error": f"한 번에 최대 {CONVERT_PREVIEW_MAX_CAPTIONS}개까지 변환할 수 있습니다."}), 400
+
+    mapped_platforms = []
+    for platform in platforms:
+        mapped_platform = PLATFORM_MAPPING.get(str(platform).lower())
+        if mapped_platform and mapped_platform not in mapped_platforms:
+            mapped_platforms.append(mapped_platform)
+    if not mapped_platforms:
+        return jsonify({"error": "Unsupported platforms"}), 400
+
+    previews = convert_posts(captions, mapped_platforms, data.get('hasImage', False))
+    if 'captions' in data:
+        return jsonify({"success": True, "previews": previews})
+    return jsonify({"success": True, "previews": previews[0]})
+
 # 데이터베이스 초기화 함수
 def init_db():
     with app.app_context():
@@ -453,30 +1759,131 @@ def upload_to_thread():
         if not content:
             return jsonify({'success': False, 'error': '내용이 필요합니다.'}), 400
 
-        thread_api = ThreadAPI()
-        thread_api.access_token = user.thread_access_token
-        
-        # 디버그 로깅 추가
-        app.logger.debug(f"Attempting to post to Thread with user_id: {user.thread_account_id}")
-        app.logger.debug(f"Content: {content}")
-        
-        result = thread_api.post_thread(
-            user_id=user.thread_account_id,
-            content=content,
-            media_type=media_type
-        )
-        
-        app.logger.debug(f"Thread post result: {result}")
+        # 게시는 워커가 처리하고 요청은 작업 ID만 바로 반환
+        job = enqueue_publish_job(user, content, media_type, data.get('media_url'))
+        log_event(app.logger, logging.DEBUG, "Queued Thread publish job", payload=content,
+                  job_id=job.id, thread_account_id=user.thread_account_id, media_type=media_type,
+                  content_chars=len(content))
         
         return jsonify({
             'success': True,
-            'thread_id': result.get('id')
-        })
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('publish_job_status', job_id=job.id)
+        }), 202
 
     except Exception as e:
         app.logger.error(f"Thread upload error: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/publish_jobs/<int:job_id>')
+def publish_job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': '로그인이 필요합니다.'}), 401
+
+    job = db.session.get(PublishJob, job_id)
+    if job is None or job.user_id != session['user_id']:
+        return jsonify({'success': False, 'error': '게시 작업을 찾을 수 없습니다.'}), 404
+    return jsonify({'success': True, **job.to_dict()})
+
+@app.route('/scheduled_posts', methods=['GET', 'POST'])
+def scheduled_posts():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': '로그인이 필요합니다.'}), 401
+
+    user = User.query.get(session['user_id'])
+    if not user:
+        return jsonify({'success': False, 'error': '사용자를 찾을 수 없습니다.'}), 401
+
+    if request.method == 'GET':
+        jobs = PublishJob.query.filter(PublishJob.user_id == user.id, PublishJob.run_at.isnot(None)) \
+            .order_by(PublishJob.run_at.desc()).limit(request.args.get('limit', 50, type=int)).all()
+        return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs]})
+
+    data = request.get_json(silent=True) or {}
+    platform = data.get('platform', 'thread')
+    content = data.get('content')
+    media_url = data.get('media_url')
+    if not content:
+        return jsonify({'success': False, 'error': '내용이 필요합니다.'}), 400
+    if platform not in ('thread', 'instagram'):
+        return jsonify({'success': False, 'error': '지원하지 않는 플랫폼입니다.'}), 400
+    if platform == 'thread' and not (user.thread_account_id and user.thread_access_token):
+        return jsonify({'success': False, 'error': 'Thread 계정이 연동되어 있지 않습니다.'}), 401
+    if platform == 'instagram':
+        if not (user.instagram_id and user.access_token):
+            return jsonify({'success': False, 'error': 'Instagram 계정이 연동되어 있지 않습니다.'}), 401
+        if not media_url:
+            return jsonify({'success': False, 'error': 'Instagram 게시에는 이미지가 필요합니다.'}), 400
+
+    scheduled_at = data.get('scheduled_at')
+    try:
+        # ISO 8601 시각 (시간대가 없으면 UTC로 간주)
+        if not isinstance(scheduled_at, str):
+            raise ValueError(scheduled_at)
+        run_at = datetime.fromisoformat(scheduled_at.replace('Z', '+00:00'))
+    except ValueError:
+        return jsonify({'success': False, 'error': '예약 시각 형식이 올바르지 않습니다.'}), 400
+    if run_at.tzinfo is not None:
+        run_at = run_at.astimezone(timezone.utc).replace(tzinfo=None)
+    # 시계 차이 정도(SCHEDULE_PAST_GRACE초)만 지난 시각은 받아서 바로 게시하고, 그보다 지난 시각은 거부
+    if run_at < datetime.utcnow() - timedelta(seconds=SCHEDULE_PAST_GRACE):
+        return jsonify({'success': False, 'error': '예약 시각이 이미 지났습니다.'}), 400
+
+    media_type = data.get('media_type') or ('IMAGE' if platform == 'instagram' else 'TEXT')
+    job = enqueue_publish_job(user, content, media_type, media_url, platform=platform, run_at=run_at)
+    return jsonify({
+        'success': True,
+        **job.to_dict(),
+        'status_url': url_for('publish_job_status', job_id=job.id)
+    }), 201
+
+@app.route('/scheduled_posts/<int:job_id>', methods=['DELETE'])
+def cancel_scheduled_post(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': '로그인이 필요합니다.'}), 401
+
+    # 아직 실행되지 않은 작업만 취소 (워커가 이미 가져간 작업은 그대로 게시됨)
+    canceled = PublishJob.query.filter(
+        PublishJob.id == job_id,
+        PublishJob.user_id == session['user_id'],
+        PublishJob.status == 'queued'
+    ).update({'status': 'canceled', 'finished_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    if not canceled:
+        return jsonify({'success': False, 'error': '취소할 수 있는 예약 게시물이 없습니다.'}), 404
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'canceled'})
+
+@app.route('/api_budget')
+def api_budget():
+    """현재 사용자 토큰들의 Graph API 호출 예산 상태"""
+    if 'user_id' not in session:
+        return jsonify({'error': '로그인이 필요합니다.'}), 401
+
+    user = User.query.get(session['user_id'])
+    limiter = get_graph_transport().rate_limiter
+    if not user or limiter is None:
+        return jsonify({'enabled': limiter is not None, 'budgets': {}})
+
+    tokens = {'instagram': user.access_token, 'thread': user.thread_access_token}
+    return jsonify({
+        'enabled': True,
+        'budgets': {platform: limiter.state(token) for platform, token in tokens.items() if token}
+    })
+
+@app.route('/metrics')
+@talisman(force_https=False)  # 스크레이퍼는 보통 프록시를 거치지 않고 http로 직접 수집
+def metrics():
+    """Prometheus 텍스트 형식 메트릭 (워커 프로세스마다 따로 집계)
+
+    METRICS_TOKEN이 없으면 공개하지 않고 없는 경로처럼 404로 응답합니다.
+    """
+    if not METRICS_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}"):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
 # Thread 인증 관련 라우트 추가
 @app.route('/auth/thread')
 def thread_auth():
@@ -518,7 +1925,7 @@ def thread_callback():
             'code': code
         }
         
-        response = requests.post(token_url, data=token_data)
+        response = get_graph_transport().post(token_url, data=token_data)
         token_info = response.json()
         
         if 'error' in token_info:
@@ -548,12 +1955,26 @@ def thread_statistics():
         if not user or not user.thread_account_id:
             return jsonify({'error': 'Thread 계정이 연동되어 있지 않습니다.'}), 401
 
-        # Thread API를 통해 통계 데이터 가져오기
-        thread_api = ThreadAPI()
-        thread_api.access_token = user.thread_access_token
-        
-        stats = thread_api.get_user_insights(user.thread_account_id)
-        return jsonify(stats)
+        try:
+            since, until = statistics_range_args()
+            granularity = request.args.get('granularity', 'auto')
+            if granularity not in ('auto', 'day', 'week', 'month'):
+                raise ValueError(f"Unsupported granularity: {granularity}")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            backfill_pending = bool(coalesced_sync(sync_thread_rollups, user, since=since))
+        except Exception as e:
+            # 동기화에 실패해도 저장된 집계로 응답 (커밋된 구간은 유지됨)
+            db.session.rollback()
+            backfill_pending = thread_rollup_backfill_pending(user.id)
+            app.logger.error(f"Error syncing Thread insights: {str(e)}")
+
+        # 저장된 일별 집계에서 통계 조회 (backfill_pending이면 빈 날짜는 백그라운드에서 채우는 중)
+        payload = thread_statistics_payload(user, since, until, granularity)
+        payload['backfill_pending'] = backfill_pending
+        return jsonify(payload)
     except Exception as e:
         app.logger.error(f"Thread statistics error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -568,27 +1989,23 @@ def fetch_thread_posts():
         if not user or not user.thread_account_id:
             return jsonify({'error': 'Thread 계정이 연동되어 있지 않습니다.'}), 401
 
-        thread_api = ThreadAPI()
-        thread_api.access_token = user.thread_access_token
-        
-        # Thread 게시물 조회
-        posts = thread_api.get_user_media(user.thread_account_id)
-        
-        # 각 게시물의 인사이트 조회
-        for post in posts.get('data', []):
-            insights = thread_api.get_media_insights(post['id'])
-            post['likes'] = next((metric['values'][0]['value'] for metric in insights['data'] 
-                                if metric['name'] == 'likes'), 0)
-            post['replies'] = next((metric['values'][0]['value'] for metric in insights['data'] 
-                                  if metric['name'] == 'replies'), 0)
-            post['reposts'] = next((metric['values'][0]['value'] for metric in insights['data'] 
-                                  if metric['name'] == 'reposts'), 0)
+        try:
+            coalesced_sync(sync_thread_posts, user)
+        except Exception as e:
+            # 동기화에 실패해도 저장소에 있는 게시물로 응답
+            db.session.rollback()
+            app.logger.error(f"Error syncing Thread posts: {str(e)}")
+
+        # 저장소에서 게시물과 최신 인사이트 조회
+        posts = [post.to_dict() for post in stored_posts(user.id, 'thread', request.args.get('limit', 25, type=int))]
         
-        # 전체 통계 조회
-        stats = thread_api.get_user_insights(user.thread_account_id)
+        # 최근 통계는 저장된 일별 집계에서 조회 (집계 갱신은 /thread_statistics에서)
+        today = datetime.utcnow().date()
+        stats = thread_statistics_payload(user, today - timedelta(days=THREAD_ROLLUP_DEFAULT_DAYS - 1),
+                                          today + timedelta(days=1), 'day')
         
         return jsonify({
-            'posts': posts.get('data', []),
+            'posts': posts,
             'stats': stats
         })
         
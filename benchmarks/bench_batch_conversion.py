@@ -0,0 +1,68 @@
+"""다중 플랫폼 변환: 플랫폼별 호출 vs 일괄(단일 호출) 모드 비교 벤치마크
+
+스텁 LLM은 요청당 고정 지연(--latency)과 생성 토큰당 지연(--token-latency)을 흉내냅니다.
+입력/출력 토큰은 스텁이 대략적으로 계산한 값입니다.
+
+사용법: python -m benchmarks.bench_batch_conversion [--rounds 5]
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from testing.stubs import start_openai_stub
+
+PLATFORMS = ['Instagram', 'Facebook', 'Thread', '네이버 블로그']
+CAPTION = "오늘 카페에서 찍은 라떼아트 ☕️ 주말 아침의 여유 #cafe #latte #주말"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.3, help='요청당 고정 지연(초)')
+    parser.add_argument('--token-latency', type=float, default=0.001, help='출력 토큰당 지연(초)')
+    args = parser.parse_args()
+
+    server = start_openai_stub(latency=args.latency, token_latency=args.token_latency)
+    os.environ['OPENAI_API_KEY'] = 'sk-bench'
+    os.environ['OPENAI_API_BASE'] = f"{server.url}/v1"
+    os.environ['CONVERSION_CACHE_PATH'] = ''
+
+    import SnapsAI
+
+    converter = SnapsAI.RAGConverter()
+    executor = ThreadPoolExecutor(max_workers=len(PLATFORMS))
+
+    def sequential():
+        for platform in PLATFORMS:
+            converter.generate_enhanced_post(CAPTION, platform, True, use_cache=False)
+
+    def concurrent():
+        futures = [executor.submit(converter.generate_enhanced_post, CAPTION, platform, True, use_cache=False)
+                   for platform in PLATFORMS]
+        for future in futures:
+            future.result()
+
+    def batched():
+        results = converter.generate_enhanced_posts(CAPTION, PLATFORMS, True, use_cache=False)
+        assert set(results) == set(PLATFORMS), results
+
+    print(f"{'mode':<12}{'requests':>9}{'in tok':>9}{'out tok':>9}{'mean ms':>10}{'min ms':>10}")
+    for name, func in (('sequential', sequential), ('concurrent', concurrent), ('batched', batched)):
+        server.reset_counters()
+        timings = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<12}{server.request_count // args.rounds:>9}"
+              f"{server.prompt_tokens // args.rounds:>9}{server.completion_tokens // args.rounds:>9}"
+              f"{statistics.mean(timings):>10.1f}{min(timings):>10.1f}")
+
+    executor.shutdown()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""InstagramStatistics 집계 벤치마크 (합성 데이터)
+
+전체 이력 최초 집계, 새 게시물 증분 추가, summary() 시간을 잽니다.
+
+사용법: python -m benchmarks.bench_instagram_statistics [--posts 50000] [--new 100]
+"""
+import argparse
+import random
+import time
+
+from SnapsAI import InstagramStatistics
+
+TAGS = ['daily', 'cafe', 'latte', 'travel', 'ootd', '맛집', '여행', '일상', 'photo', 'seoul']
+TYPES = ['IMAGE', 'VIDEO', 'CAROUSEL_ALBUM']
+
+
+def synthetic_posts(count, start_index=0, seed=0):
+    rng = random.Random(seed)
+    posts = []
+    for index in range(start_index, start_index + count):
+        created = 1700000000 - index * 1800
+        tags = ' '.join(f"#{rng.choice(TAGS)}{rng.randint(0, 300)}" for _ in range(rng.randint(0, 6)))
+        posts.append({
+            'id': f"media_{index}",
+            'caption': f"게시물 {index} {tags}",
+            'media_type': rng.choice(TYPES),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime(created)),
+            'like_count': rng.randint(0, 500),
+            'comments_count': rng.randint(0, 50)
+        })
+    return posts
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--new', type=int, default=100)
+    args = parser.parse_args()
+
+    history = synthetic_posts(args.posts, start_index=args.new)
+    new_posts = synthetic_posts(args.new, seed=1)
+
+    stats = InstagramStatistics()
+    _, initial_ms = timed(lambda: stats.add_posts(history))
+    summary, summary_ms = timed(stats.summary)
+    added, incremental_ms = timed(lambda: stats.add_posts(new_posts + history[:args.new]))
+    _, summary_after_ms = timed(stats.summary)
+
+    print(f"posts={args.posts} hashtags={len(stats.hashtag_counts)}")
+    print(f"initial add_posts:       {initial_ms:8.1f} ms")
+    print(f"summary:                 {summary_ms:8.1f} ms")
+    print(f"incremental add ({added:>4}):  {incremental_ms:8.1f} ms")
+    print(f"summary after increment: {summary_after_ms:8.1f} ms")
+    print(f"top hashtags: {summary['popular_hashtags']}")
+    print(f"peak hours:   {summary['peak_posting_hours']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""요청 경로 계측 비용 벤치마크 (메트릭 미들웨어, DB 쿼리 훅, Graph API 훅, 로그 호출)
+
+빈 WSGI 앱을 RequestMetricsMiddleware로 감싼 것과 그대로 부른 것의 차이, DB 쿼리 훅 한 쌍,
+Graph API 메트릭 기록, 페이로드를 붙인 로그 호출(큐에 넣기만 함)의 호출당 비용을 잽니다.
+
+사용법: python -m benchmarks.bench_instrumentation [--calls 20000] [--queries-per-request 5]
+"""
+import argparse
+import logging
+import os
+import queue
+import tempfile
+import time
+
+
+def per_call_us(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=20000, help='항목별 반복 수')
+    parser.add_argument('--queries-per-request', type=int, default=5, help='요청 하나가 실행한다고 보는 DB 쿼리 수')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ['PUBLISH_RESUME_ON_START'] = 'False'
+    os.environ.setdefault('SECRET_KEY', 'bench')
+
+    import SnapsAI
+    import app_v1
+
+    def empty_app(environ, start_response):
+        start_response('200 OK', [])
+        return [b'']
+
+    environ = {'REQUEST_METHOD': 'POST', 'snaps.route': '/convert_all'}
+    wrapped = app_v1.RequestMetricsMiddleware(empty_app)
+    start_response = lambda status, headers, exc_info=None: None  # noqa: E731
+    bare_us = per_call_us(lambda: empty_app(environ, start_response), args.calls)
+    middleware_us = per_call_us(lambda: wrapped(environ, start_response), args.calls) - bare_us
+
+    class Context:
+        pass
+
+    context = Context()
+
+    def query_hooks():
+        app_v1.before_cursor_execute(None, None, 'SELECT 1', (), context, False)
+        app_v1.after_cursor_execute(None, None, 'SELECT 1', (), context, False)
+
+    query_us = per_call_us(query_hooks, args.calls)
+    graph_us = per_call_us(lambda: (SnapsAI.graph_metric_labels('https://graph.threads.net/v1.0/123/threads'),
+                                    SnapsAI.GRAPH_REQUEST_SECONDS.observe(0.1, 'threads', '/{id}/threads', 200)),
+                           args.calls)
+
+    caption = '오늘 성수동 카페에서 라떼아트가 정말 예뻤어요 ☕️ ' * 40
+    logger = logging.getLogger('bench.instrumentation')
+    logger.handlers = [app_v1.NonBlockingQueueHandler(queue.Queue())]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    log_us = per_call_us(lambda: app_v1.log_event(logger, logging.INFO, "Converted post",
+                                                  payload={'caption': caption}, platform='Thread'), args.calls)
+
+    print(f"{'item':<34}{'us/call':>10}")
+    for name, value in (('request middleware', middleware_us),
+                        ('DB query hooks', query_us),
+                        ('Graph API metric', graph_us),
+                        ('log call with payload (queued)', log_us),
+                        (f"per request ({args.queries_per_request} queries)",
+                         middleware_us + query_us * args.queries_per_request)):
+        print(f"{name:<34}{value:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
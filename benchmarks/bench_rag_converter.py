@@ -0,0 +1,66 @@
+"""RAGConverter 콜드/웜 호출 비교 벤치마크
+
+콜드: 요청마다 RAGConverter()를 새로 생성 (기존 라우트 동작)
+웜: get_rag_converter()로 공유 인스턴스 재사용
+
+사용법: python -m benchmarks.bench_rag_converter [--calls 50] [--latency 0.02]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from testing.stubs import start_openai_stub
+
+
+def _measure(func, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help='스텁 LLM 응답 지연(초)')
+    args = parser.parse_args()
+
+    server = start_openai_stub(latency=args.latency)
+    os.environ['OPENAI_API_KEY'] = 'sk-bench'
+    os.environ['OPENAI_API_BASE'] = f"{server.url}/v1"
+    os.environ['CONVERSION_CACHE_PATH'] = ''
+
+    import SnapsAI
+
+    caption = "오늘 카페에서 찍은 라떼아트 ☕️ #cafe #latte"
+
+    def cold_call():
+        SnapsAI.RAGConverter().generate_enhanced_post(caption, 'Thread', True, use_cache=False)
+
+    def warm_call():
+        SnapsAI.get_rag_converter().generate_enhanced_post(caption, 'Thread', True, use_cache=False)
+
+    results = {}
+    for name, func in (('cold', cold_call), ('warm', warm_call)):
+        server.reset_counters()
+        if name == 'warm':
+            SnapsAI.get_rag_converter().warm_up()
+            server.reset_counters()
+        timings = _measure(func, args.calls)
+        results[name] = (timings, server.connection_count)
+
+    print(f"{'mode':<6}{'calls':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'conns':>7}")
+    for name, (timings, connections) in results.items():
+        ordered = sorted(timings)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        print(f"{name:<6}{len(timings):>7}{statistics.mean(timings):>10.2f}"
+              f"{statistics.median(timings):>10.2f}{p95:>10.2f}{connections:>7}")
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""규칙 기반 변환기(RuleConverter) 처리량과 규칙 확인
+
+1) 처리량: 다양한 캡션(이모지 ZWJ 시퀀스, 국기, 한글, 긴 글, 해시태그 묶음) × 플랫폼 변환을
+   convert(하나씩)와 convert_many(일괄)로 초당 몇 건 처리하는지
+2) 규칙: 결과가 플랫폼 최대 길이(grapheme)와 해시태그 개수를 넘지 않고, 글자(grapheme) 중간에서
+   잘리지 않는지
+3) 앱: LLM이 응답하지 않을 때 /convert, /convert_all, /convert/stream이 규칙 기반 결과로 대체하고
+   /convert/preview가 일괄 변환을 돌려주는지
+
+하나라도 실패하면 0이 아닌 코드로 종료합니다.
+
+사용법: python -m benchmarks.bench_rule_converter [--captions 2000] [--min-rate 10000]
+"""
+import argparse
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+
+
+def check(failures, ok, message):
+    print(f"{'ok  ' if ok else 'FAIL'} {message}")
+    if not ok:
+        failures.append(message)
+
+
+def make_captions(count):
+    rng = random.Random(0)
+    pieces = ['오늘 성수동 카페에서', '라떼아트가 정말 예뻤어요', 'weekend vibes', '👩‍👩‍👧‍👦', '🇰🇷', '👍🏽',
+              '☕️', 'é', '각', '커피 향이 좋았고 분위기도 최고', '#카페', '#cafe', '#라떼', '#여행',
+              '\n', '!!', '친구들과 함께']
+    tags = ['#카페', '#cafe', '#coffee', '#성수', '#데일리', '#일상', '#travel', '#맛집', '#주말', '#1']
+    captions = []
+    for index in range(count):
+        words = [rng.choice(pieces) for _ in range(rng.choice((5, 20, 120, 400)))]
+        caption = ' '.join(words)
+        if index % 2:
+            caption += '\n\n' + ' '.join(rng.sample(tags, rng.randint(1, len(tags))))
+        captions.append(caption)
+    return captions
+
+
+def closed_port_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--captions', type=int, default=2000)
+    parser.add_argument('--min-rate', type=float, default=10000, help='허용하는 최소 처리량 (변환/초)')
+    args = parser.parse_args()
+
+    # LLM은 닫힌 포트를 가리키게 하여 즉시 실패시킴
+    os.environ['OPENAI_API_KEY'] = 'sk-bench'
+    os.environ['OPENAI_API_BASE'] = closed_port_url()
+    os.environ['RAG_MAX_RETRIES'] = '0'
+    os.environ['CONVERSION_CACHE_PATH'] = ''
+    os.environ['RAG_INDEX_DIR'] = ''
+    os.environ['EMBEDDING_CACHE_DIR'] = ''
+    os.environ['PUBLISH_RESUME_ON_START'] = 'False'
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    import SnapsAI
+
+    failures = []
+    captions = make_captions(args.captions)
+    platforms = ['Instagram', 'Facebook', 'Thread', '네이버 블로그']
+    converter = SnapsAI.RuleConverter()
+
+    # 1) 처리량
+    start = time.perf_counter()
+    single = [{platform: converter.convert(caption, platform, True) for platform in platforms} for caption in captions]
+    single_rate = len(captions) * len(platforms) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    batch = converter.convert_many(captions, platforms, True)
+    batch_rate = len(captions) * len(platforms) / (time.perf_counter() - start)
+    short = [caption for caption in captions if len(caption) < 300]
+    start = time.perf_counter()
+    converter.convert_many(short, platforms, True)
+    short_rate = len(short) * len(platforms) / (time.perf_counter() - start)
+    print(f"convert: {single_rate:,.0f}/s  convert_many: {batch_rate:,.0f}/s  "
+          f"convert_many (captions < 300 chars): {short_rate:,.0f}/s")
+    check(failures, batch == single, "convert_many matches convert")
+    check(failures, short_rate >= args.min_rate, f"short-caption throughput >= {args.min_rate:,.0f}/s")
+
+    # 2) 규칙
+    over_length, over_tags, broken = 0, 0, 0
+    for results in batch:
+        for platform, text in results.items():
+            rule = SnapsAI.PLATFORM_CONVERSION_RULES[platform]
+            if rule['max_length'] and SnapsAI.grapheme_len(text) > rule['max_length']:
+                over_length += 1
+            tags = SnapsAI.HASHTAG_RE.findall(text) if platform != '네이버 블로그' else \
+                [tag for line in text.splitlines() if line.startswith('태그: ') for tag in line[4:].split(', ')]
+            if len({tag.lower() for tag in tags}) > rule['max_hashtags']:
+                over_tags += 1
+            # 잘린 결과에 앞 글자 없이 남은 결합 문자/수식자/ZWJ가 있으면 grapheme 중간에서 잘린 것
+            if any(SnapsAI.GRAPHEME_JOINER_RE.match(cluster) and not cluster.startswith(('\r', '\U0001f1e6'))
+                   and len(cluster) == 1 for cluster in SnapsAI.graphemes(text)):
+                broken += 1
+    check(failures, over_length == 0, f"no result exceeds the platform length ({over_length})")
+    check(failures, over_tags == 0, f"no result exceeds the hashtag limit ({over_tags})")
+    check(failures, broken == 0, f"no grapheme split by truncation ({broken})")
+
+    # 3) 앱 대체 경로
+    from app_v1 import app
+    client = app.test_client()
+    caption = captions[1]
+    response = client.post('/convert', json={'caption': caption, 'targetPlatform': 'thread'},
+                           base_url='https://localhost')
+    data = response.get_json()
+    check(failures, response.status_code == 200 and data.get('fallback') and
+          data['ragConvertedPost'] == SnapsAI.convert_post(caption, 'Thread', False),
+          f"/convert falls back when the LLM is down ({response.status_code})")
+
+    response = client.post('/convert_all', json={'caption': caption, 'platforms': ['instagram', 'thread']},
+                           base_url='https://localhost')
+    data = response.get_json()
+    check(failures, response.status_code == 200 and data.get('success') and
+          set(data['conversions']) == {'Instagram', 'Thread'} and set(data['fallbacks']) == {'Instagram', 'Thread'},
+          f"/convert_all falls back per platform ({response.status_code})")
+
+    response = client.post('/convert/stream', json={'caption': caption, 'targetPlatform': 'blog'},
+                           base_url='https://localhost')
+    body = response.get_data(as_text=True)
+    check(failures, 'event: chunk' in body and '"fallback": true' in body and 'event: error' not in body,
+          "/convert/stream sends the rule-based result")
+
+    start = time.perf_counter()
+    response = client.post('/convert/preview', json={'captions': captions[:100], 'platforms': ['instagram', 'blog']},
+                           base_url='https://localhost')
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    previews = response.get_json().get('previews', [])
+    check(failures, response.status_code == 200 and len(previews) == 100 and
+          previews[0] == {p: SnapsAI.convert_post(captions[0], p, False) for p in ('Instagram', '네이버 블로그')},
+          f"/convert/preview batch of 100 captions in {elapsed_ms:.1f}ms")
+
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""스트리밍 변환의 첫 토큰까지 시간(TTFT) vs 전체 응답 대기 시간 비교 벤치마크
+
+사용법: python -m benchmarks.bench_streaming [--rounds 5]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from testing.stubs import start_openai_stub
+
+CAPTION = "오늘 카페에서 찍은 라떼아트 ☕️ 주말 아침의 여유 #cafe #latte"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.3, help='요청당 고정 지연(초)')
+    parser.add_argument('--token-latency', type=float, default=0.01, help='출력 토큰당 지연(초)')
+    args = parser.parse_args()
+
+    server = start_openai_stub(latency=args.latency, token_latency=args.token_latency)
+    os.environ['OPENAI_API_KEY'] = 'sk-bench'
+    os.environ['OPENAI_API_BASE'] = f"{server.url}/v1"
+    os.environ['CONVERSION_CACHE_PATH'] = ''
+
+    import SnapsAI
+
+    converter = SnapsAI.RAGConverter()
+    converter.warm_up()
+
+    blocking, first_chunk, streamed_total = [], [], []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        converter.generate_enhanced_post(CAPTION, 'Thread', True, use_cache=False)
+        blocking.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        for index, _ in enumerate(converter.stream_enhanced_post(CAPTION, 'Thread', True, use_cache=False)):
+            if index == 0:
+                first_chunk.append((time.perf_counter() - start) * 1000)
+        streamed_total.append((time.perf_counter() - start) * 1000)
+
+    print(f"{'metric':<28}{'mean ms':>10}{'min ms':>10}")
+    for name, timings in (('invoke (full response)', blocking),
+                          ('stream first chunk (TTFT)', first_chunk),
+                          ('stream full response', streamed_total)):
+        print(f"{name:<28}{statistics.mean(timings):>10.1f}{min(timings):>10.1f}")
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
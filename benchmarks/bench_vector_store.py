@@ -0,0 +1,122 @@
+"""벡터 저장소 백엔드 비교 벤치마크 (NumpyVectorStore vs ChromaVectorStore)
+
+크기(기본 1k/10k/100k)와 백엔드마다 별도 프로세스에서 저장소를 만들고 다음을 잽니다.
+- build: 벡터 추가 시간 (5000개씩 배치)
+- rss: 저장소를 만들기 전후의 프로세스 RSS 차이 (백엔드 import 비용 포함)
+- query p50/p95: top-k 검색 지연
+- save/load: 디스크에 쓰고 새 인스턴스로 다시 읽는 시간 (numpy; chroma는 쓰기 시점에 저장)
+
+chromadb가 설치되어 있지 않으면 chroma는 건너뜁니다.
+
+사용법: python -m benchmarks.bench_vector_store [--sizes 1000,10000,100000] [--dim 1536] [--queries 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # 최대 RSS (Linux 외)
+
+
+def percentile(ordered, fraction):
+    return ordered[max(0, int(len(ordered) * fraction) - 1)]
+
+
+def child(args):
+    """--child 모드: 한 백엔드/크기 조합을 측정하고 결과를 JSON 한 줄로 출력"""
+    from SnapsAI import create_vector_store
+
+    rng = np.random.default_rng(0)
+    path = tempfile.mkdtemp(prefix=f"bench_{args.backend}_")
+    baseline = rss_mb()
+    start = time.perf_counter()
+    store = create_vector_store(args.backend, path)
+    build_s = time.perf_counter() - start
+    for offset in range(0, args.size, 5000):
+        count = min(5000, args.size - offset)
+        ids = [f"v{offset + i}" for i in range(count)]
+        vectors = rng.standard_normal((count, args.dim), dtype=np.float32)  # 생성 시간은 제외
+        start = time.perf_counter()
+        store.add(ids, vectors)
+        build_s += time.perf_counter() - start
+    del ids, vectors
+    rss = rss_mb() - baseline
+
+    timings = []
+    for _ in range(args.queries):
+        query = rng.standard_normal(args.dim, dtype=np.float32)
+        start = time.perf_counter()
+        store.search(query, args.k)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    start = time.perf_counter()
+    store.save()
+    save_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    reloaded = create_vector_store(args.backend, path)
+    load_ms = (time.perf_counter() - start) * 1000
+    assert len(reloaded) == args.size
+
+    print(json.dumps({
+        'build_s': build_s, 'rss_mb': rss,
+        'p50_ms': percentile(timings, 0.5), 'p95_ms': percentile(timings, 0.95),
+        'save_ms': save_ms, 'load_ms': load_ms
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--backends', default='numpy,chroma')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f"{'backend':<8}{'vectors':>9}{'build s':>9}{'rss MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'save ms':>9}{'load ms':>9}")
+    for backend in args.backends.split(','):
+        if backend == 'chroma':
+            try:
+                import chromadb  # noqa: F401
+            except ImportError:
+                print(f"{backend:<8} skipped (chromadb not installed)")
+                continue
+        for size in (int(value) for value in args.sizes.split(',')):
+            proc = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_vector_store', '--child', '--backend', backend,
+                 '--size', str(size), '--dim', str(args.dim), '--queries', str(args.queries), '--k', str(args.k)],
+                capture_output=True, text=True, env={**os.environ, 'RAG_WARMUP': 'False'}
+            )
+            if proc.returncode != 0:
+                print(f"{backend:<8}{size:>9} failed: {proc.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{backend:<8}{size:>9}{result['build_s']:>9.2f}{result['rss_mb']:>9.1f}"
+                  f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['save_ms']:>9.1f}{result['load_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+"""app_v1 부하 테스트 하네스 (로컬 Graph/OpenAI 스텁 사용)
+
+실제 Instagram/Threads/OpenAI 대신 testing.stubs의 스텁 서버(별도 프로세스)를 띄우고, 앱을
+워커 구성(프로세스 x 스레드)마다 실제 WSGI 서버로 실행한 뒤 가상 사용자들이 다음 시나리오를
+반복합니다.
+
+    login -> fetch_posts -> convert_all -> upload_to_thread
+
+스텁에는 응답 지연과 흔들림(--*-latency, --*-jitter), 500 응답 비율(--*-error-rate), 429 응답
+비율(--*-throttle-rate, Retry-After는 --retry-after)을 주입할 수 있습니다. 구성마다 라우트별
+처리량(req/s), 오류 수, p50/p95/p99 지연과 스텁이 받은 요청 수를 출력하고, --output으로 JSON을
+저장합니다.
+
+앱 서버는 gunicorn이 설치되어 있으면 gunicorn(gthread)으로, 없으면 werkzeug 서버 여러 개가 한
+리스닝 소켓을 나눠 쓰는 방식으로 실행합니다 (--server). 앱 로그는 구성마다 임시 디렉터리의
+app.log에 남습니다. 부하 발생기는 한 프로세스의 스레드이므로 가상 사용자는 수백 명 이하로
+쓰세요.
+
+사용법: python -m benchmarks.load_test [--configs 1x8,2x8] [--users 16] [--duration 30]
+       [--llm-latency 0.8] [--llm-throttle-rate 0.05] [--graph-error-rate 0.01] [--output load.json]
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROUTES = ('login', 'fetch_posts', 'convert_all', 'upload_to_thread', 'scenario')
+EXPECTED_STATUS = {'login': 302, 'fetch_posts': 200, 'convert_all': 200, 'upload_to_thread': 202}
+PASSWORD = 'load-test'
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(len(ordered) * fraction) - 1))]
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+# ---------------------------------------------------------------------------
+# 자식 프로세스 모드
+
+def run_stubs(args):
+    """--child stubs: 스텁 서버를 띄우고 URL을 출력한 뒤, 표준 입력 한 줄마다 통계를 출력하고 초기화"""
+    from testing.stubs import start_graph_stub, start_openai_stub
+
+    llm = start_openai_stub(latency=args.llm_latency, token_latency=args.llm_token_latency)
+    graph = start_graph_stub(latency=args.graph_latency, post_count=args.posts)
+    for server, prefix in ((llm, 'llm'), (graph, 'graph')):
+        server.latency_jitter = getattr(args, f"{prefix}_jitter")
+        server.error_rate = getattr(args, f"{prefix}_error_rate")
+        server.throttle_rate = getattr(args, f"{prefix}_throttle_rate")
+        server.retry_after = args.retry_after
+    print(json.dumps({'llm': llm.url, 'graph': graph.url}), flush=True)
+
+    for _ in sys.stdin:
+        stats = {}
+        for server, prefix in ((llm, 'llm'), (graph, 'graph')):
+            with server._lock:
+                stats[prefix] = {'requests': server.request_count, 'connections': server.connection_count,
+                                 'injected_errors': server.injected_errors,
+                                 'injected_throttles': server.injected_throttles}
+            server.reset_counters()
+        print(json.dumps(stats), flush=True)
+    llm.stop()
+    graph.stop()
+
+
+def run_setup(args):
+    """--child setup: 테이블을 만들고 부하 테스트용 계정을 추가"""
+    from app_v1 import app, db, User
+
+    with app.app_context():
+        db.create_all()
+        for index in range(args.accounts):
+            user = User(username=f"load{index}", email=f"load{index}@example.com",
+                        access_token=f"ig-token-{index}", thread_account_id=f"thread{index}",
+                        thread_access_token=f"thread-token-{index}")
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+
+
+def limit_concurrency(wsgi_app, threads):
+    """gunicorn gthread처럼 프로세스 하나가 동시에 처리하는 요청을 threads개로 제한합니다.
+
+    (응답 본문을 내보내는 동안에는 자리를 차지하지 않으므로 스트리밍 라우트에는 근사치입니다.)
+    """
+    slots = threading.BoundedSemaphore(threads)
+
+    def app(environ, start_response):
+        with slots:
+            return wsgi_app(environ, start_response)
+    return app
+
+
+def run_worker(args):
+    """--child worker: 부모가 넘긴 리스닝 소켓(--fd)으로 werkzeug 서버 실행"""
+    import logging
+    from werkzeug.serving import make_server
+    from app_v1 import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # 요청마다 남는 접근 로그 제외
+    server = make_server('127.0.0.1', args.port, limit_concurrency(app, args.threads), threaded=True, fd=args.fd)
+    server.serve_forever()
+
+
+# ---------------------------------------------------------------------------
+# 앱 서버
+
+def start_app(server, processes, threads, env, log):
+    """앱 서버를 띄우고 (프로세스 목록, URL)을 반환합니다."""
+    if server == 'gunicorn':
+        port = free_port()
+        proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(processes),
+                                 '--threads', str(threads), '--bind', f"127.0.0.1:{port}",
+                                 '--timeout', '120', '--log-level', 'warning', 'app_v1:app'],
+                                env=env, stdout=log, stderr=log)
+        return [proc], f"http://127.0.0.1:{port}"
+
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1024)
+    port = sock.getsockname()[1]
+    procs = [subprocess.Popen([sys.executable, '-m', 'benchmarks.load_test', '--child', 'worker',
+                               '--fd', str(sock.fileno()), '--port', str(port), '--threads', str(threads)],
+                              env=env, stdout=log, stderr=log, pass_fds=(sock.fileno(),))
+             for _ in range(processes)]
+    sock.close()  # 워커들이 소켓을 물려받았으므로 부모 쪽은 닫음
+    return procs, f"http://127.0.0.1:{port}"
+
+
+def wait_ready(url, procs, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if any(proc.poll() is not None for proc in procs):
+            raise RuntimeError('app server exited during startup')
+        try:
+            if requests.get(f"{url}/login", headers={'X-Forwarded-Proto': 'https'}, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"app server did not become ready in {timeout}s")
+
+
+def stop_app(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+# ---------------------------------------------------------------------------
+# 가상 사용자
+
+class Recorder:
+    def __init__(self):
+        self.samples = {route: [] for route in ROUTES}
+        self.errors = {route: {} for route in ROUTES}
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, error=None):
+        with self._lock:
+            self.samples[route].append(seconds)
+            if error is not None:
+                self.errors[route][error] = self.errors[route].get(error, 0) + 1
+
+
+def virtual_user(index, url, args, captions, recorder, start_at, stop_at):
+    rng = random.Random(index)
+    account = index % args.accounts
+    session = requests.Session()
+    session.headers['X-Forwarded-Proto'] = 'https'  # Talisman force_https: TLS 종료 프록시 뒤에서처럼
+    platforms = args.platforms.split(',')
+    time.sleep(max(0.0, start_at - time.monotonic()))
+
+    def step(route, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, f"{url}{path}", timeout=args.timeout, allow_redirects=False, **kwargs)
+        except requests.RequestException as e:
+            recorder.record(route, time.perf_counter() - start, type(e).__name__)
+            return None
+        elapsed = time.perf_counter() - start
+        ok = response.status_code == EXPECTED_STATUS[route]
+        recorder.record(route, elapsed, None if ok else str(response.status_code))
+        return response if ok else None
+
+    while time.monotonic() < stop_at:
+        scenario_start = time.perf_counter()
+        session.cookies.clear()
+        response = step('login', 'POST', '/login', data={'email': f"load{account}@example.com", 'password': PASSWORD})
+        # Talisman이 세션 쿠키에 Secure를 붙이므로 http 연결에서도 보내도록 직접 넘김
+        cookies = {'session': response.cookies.get('session')} if response is not None else None
+        ok = cookies is not None
+        if ok:
+            ok = step('fetch_posts', 'POST', '/fetch_posts', json={'limit': 10}, cookies=cookies) is not None
+        if ok:
+            caption = rng.choice(captions)
+            response = step('convert_all', 'POST', '/convert_all',
+                            json={'caption': caption, 'platforms': platforms}, cookies=cookies)
+            ok = response is not None
+        if ok:
+            content = response.json().get('conversions', {}).get('Thread') or caption
+            ok = step('upload_to_thread', 'POST', '/upload_to_thread',
+                      json={'content': content}, cookies=cookies) is not None
+        recorder.record('scenario', time.perf_counter() - scenario_start, None if ok else 'failed')
+        if args.think_time:
+            time.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+def run_load(url, args, captions):
+    recorder = Recorder()
+    start = time.monotonic()
+    stop_at = start + args.ramp_up + args.duration
+    threads = [threading.Thread(target=virtual_user, daemon=True,
+                                args=(index, url, args, captions, recorder,
+                                      start + args.ramp_up * index / max(1, args.users), stop_at))
+               for index in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.monotonic() - start
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for route in ROUTES:
+        ordered = sorted(recorder.samples[route])
+        if not ordered:
+            continue
+        routes[route] = {
+            'requests': len(ordered),
+            'errors': sum(recorder.errors[route].values()),
+            'error_kinds': recorder.errors[route],
+            'rps': round(len(ordered) / elapsed, 2),
+            'p50_ms': round(percentile(ordered, 0.5) * 1000, 1),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 1),
+            'max_ms': round(ordered[-1] * 1000, 1)
+        }
+    return routes
+
+
+def print_report(config, result):
+    print(f"\n[{config}] {result['elapsed_s']:.1f}s, {result['users']} users, server {result['server']}")
+    print(f"{'route':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'max ms':>10}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<18}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.2f}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+        if stats['error_kinds']:
+            print(f"{'':<18}errors: {stats['error_kinds']}")
+    for name, stats in result['stubs'].items():
+        print(f"stub {name}: {stats['requests']} requests, {stats['connections']} connections, "
+              f"{stats['injected_errors']} injected 500s, {stats['injected_throttles']} injected 429s")
+    print(f"app log: {result['log']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', default='1x8,2x8', help='워커 구성 목록 (프로세스x스레드, 쉼표로 구분)')
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'werkzeug'), default='auto')
+    parser.add_argument('--users', type=int, default=16, help='동시 가상 사용자 수')
+    parser.add_argument('--duration', type=float, default=30, help='구성마다 부하를 거는 시간(초, 램프업 제외)')
+    parser.add_argument('--ramp-up', type=float, default=2, help='가상 사용자를 나눠 시작하는 시간(초)')
+    parser.add_argument('--think-time', type=float, default=0.0, help='시나리오 사이 평균 대기(초)')
+    parser.add_argument('--accounts', type=int, default=8, help='가상 사용자가 나눠 쓰는 계정 수')
+    parser.add_argument('--captions', type=int, default=50, help='변환할 서로 다른 캡션 수 (적을수록 캐시 적중)')
+    parser.add_argument('--platforms', default='instagram,thread,blog')
+    parser.add_argument('--posts', type=int, default=50, help='스텁 계정의 게시물 수')
+    parser.add_argument('--timeout', type=float, default=60, help='요청 하나의 제한 시간(초)')
+    parser.add_argument('--database-url', help='기본값: 구성마다 새 sqlite 파일')
+    for prefix, service, latency, jitter in (('llm', 'LLM', 0.8, 0.4), ('graph', 'Graph API', 0.15, 0.1)):
+        parser.add_argument(f"--{prefix}-latency", type=float, default=latency, help=f"스텁 {service} 응답 지연(초)")
+        parser.add_argument(f"--{prefix}-jitter", type=float, default=jitter, help='지연에 더하는 무작위 최대값(초)')
+        parser.add_argument(f"--{prefix}-error-rate", type=float, default=0.0, help='500으로 응답할 비율')
+        parser.add_argument(f"--{prefix}-throttle-rate", type=float, default=0.0, help='429로 응답할 비율')
+    parser.add_argument('--llm-token-latency', type=float, default=0.0, help='생성 토큰당 추가 지연(초)')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 응답의 Retry-After (초)')
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    parser.add_argument('--child', choices=('stubs', 'setup', 'worker'), help=argparse.SUPPRESS)
+    parser.add_argument('--fd', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--threads', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        {'stubs': run_stubs, 'setup': run_setup, 'worker': run_worker}[args.child](args)
+        return
+
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'werkzeug'
+    configs = []
+    for config in args.configs.split(','):
+        processes, _, threads = config.partition('x')
+        configs.append((config, int(processes), int(threads or 1)))
+
+    from benchmarks.bench_rule_converter import make_captions
+    captions = [caption for caption in make_captions(args.captions * 10) if len(caption) < 300]
+    captions = list(dict.fromkeys(captions))[:args.captions]
+
+    stubs = subprocess.Popen([sys.executable, '-m', 'benchmarks.load_test', '--child', 'stubs', *sys.argv[1:]],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    urls = json.loads(stubs.stdout.readline())
+
+    results = []
+    failed = False
+    try:
+        for config, processes, threads in configs:
+            root = tempfile.mkdtemp(prefix=f"load_{config}_")
+            env = {
+                **os.environ,
+                'OPENAI_API_KEY': 'sk-load',
+                'OPENAI_API_BASE': f"{urls['llm']}/v1",
+                'THREADS_GRAPH_URL': f"{urls['graph']}/v1.0",
+                'INSTAGRAM_GRAPH_URL': f"{urls['graph']}/v12.0",
+                'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(root, 'load.db')}",
+                'CONVERSION_CACHE_PATH': os.path.join(root, 'conversion_cache.db'),
+                'RAG_INDEX_DIR': os.path.join(root, 'rag_index'),
+                'EMBEDDING_CACHE_DIR': os.path.join(root, 'embedding_cache'),
+                'SECRET_KEY': os.environ.get('SECRET_KEY', 'load-test'),
+            }
+            subprocess.run([sys.executable, '-m', 'benchmarks.load_test', '--child', 'setup',
+                            '--accounts', str(args.accounts)],
+                           env={**env, 'PUBLISH_RESUME_ON_START': 'False'}, check=True)
+
+            log_path = os.path.join(root, 'app.log')
+            with open(log_path, 'w') as log:
+                procs, url = start_app(server, processes, threads, env, log)
+                try:
+                    wait_ready(url, procs)
+                    stubs.stdin.write('\n')  # 준비 과정의 스텁 호출은 집계에서 제외
+                    stubs.stdin.flush()
+                    stubs.stdout.readline()
+                    recorder, elapsed = run_load(url, args, captions)
+                except RuntimeError as e:
+                    print(f"\n[{config}] failed: {e} (see {log_path})")
+                    failed = True
+                    continue
+                finally:
+                    stop_app(procs)
+            stubs.stdin.write('\n')
+            stubs.stdin.flush()
+            result = {'config': config, 'processes': processes, 'threads': threads, 'server': server,
+                      'users': args.users, 'elapsed_s': round(elapsed, 2), 'routes': summarize(recorder, elapsed),
+                      'stubs': json.loads(stubs.stdout.readline()), 'log': log_path}
+            results.append(result)
+            print_report(config, result)
+    finally:
+        stubs.stdin.close()
+        stubs.wait(timeout=10)
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items()
+                    if key not in ('output', 'child', 'fd', 'port', 'threads')}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': results}, f, ensure_ascii=False, indent=2)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
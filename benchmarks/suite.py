@@ -0,0 +1,359 @@
+"""핫 패스 마이크로 벤치마크 모음 (기준값 비교)
+
+변환(convert_post, RAGConverter.generate_enhanced_post), API 클라이언트(InstagramAPI.format_posts,
+ThreadAPI.get_user_media/get_user_insights), Flask 라우트(테스트 클라이언트)를 로컬 스텁 서버
+(LLM, Graph API) 상대로 반복 측정합니다. 항목마다 한 번의 측정이 --min-time초 이상 걸리도록 호출
+횟수를 정하고, 이를 --repeat 번 재어 호출당 시간의 중앙값/최솟값/최댓값을 구합니다.
+
+결과는 JSON으로 저장하고(--output), 기준값 파일(--baseline)과 항목별 최솟값(다른 프로세스의
+간섭에 덜 흔들림)을 비교해 --tolerance 배보다 느려진 항목이 있으면 0이 아닌 코드로 종료합니다.
+기준값은 측정한 기계와 스텁 지연 설정에 따라 달라지므로, 다른 기계에서는 --update-baseline으로
+기준값을 먼저 만든 뒤 비교하세요 (--filter와 함께 쓰면 해당 항목만 갱신).
+
+사용법: python -m benchmarks.suite [--filter thread] [--repeat 5] [--llm-latency 0.01]
+       [--output results.json] [--baseline benchmarks/baseline.json] [--tolerance 1.5] [--update-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from testing.stubs import start_graph_stub, start_openai_stub
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """setup(ctx)가 측정할 함수(인자 없음)를 반환하는 벤치마크를 등록합니다."""
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def measure(func, repeat, min_time):
+    """호출당 시간(초) 목록과 측정 한 번의 호출 횟수를 반환합니다."""
+    func()  # 워밍업 (캐시, 연결 풀, 지연 import 채우기)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return timings, number
+
+
+def summarize(timings, number):
+    median = statistics.median(timings)
+    return {
+        'median_us': round(median * 1e6, 2),
+        'min_us': round(min(timings) * 1e6, 2),
+        'max_us': round(max(timings) * 1e6, 2),
+        'ops_per_sec': round(1 / median, 1) if median else None,
+        'number': number,
+        'repeat': len(timings)
+    }
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'system': platform.system(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+# ---------------------------------------------------------------------------
+# 변환
+
+SHORT_CAPTION = "오늘 성수동 카페에서 찍은 라떼아트 ☕️ 분위기 최고 #카페 #cafe #latte"
+
+
+@benchmark('convert_post.instagram_short')
+def bench_convert_short(ctx):
+    return lambda: ctx.SnapsAI.convert_post(SHORT_CAPTION, 'Instagram', True)
+
+
+@benchmark('convert_post.blog_long')
+def bench_convert_long(ctx):
+    from benchmarks.bench_rule_converter import make_captions
+    caption = max(make_captions(200), key=len)
+    return lambda: ctx.SnapsAI.convert_post(caption, '네이버 블로그', True)
+
+
+@benchmark('convert_posts.100x4')
+def bench_convert_batch(ctx):
+    from benchmarks.bench_rule_converter import make_captions
+    captions = [caption for caption in make_captions(400) if len(caption) < 300][:100]
+    platforms = ['Instagram', 'Facebook', 'Thread', '네이버 블로그']
+    return lambda: ctx.SnapsAI.convert_posts(captions, platforms, True)
+
+
+@benchmark('rag.generate_enhanced_post.uncached')
+def bench_rag_uncached(ctx):
+    converter = ctx.SnapsAI.get_rag_converter()
+    return lambda: converter.generate_enhanced_post(SHORT_CAPTION, 'Thread', True, use_cache=False)
+
+
+@benchmark('rag.generate_enhanced_post.cached')
+def bench_rag_cached(ctx):
+    converter = ctx.SnapsAI.get_rag_converter()
+    return lambda: converter.generate_enhanced_post(SHORT_CAPTION, 'Thread', True)
+
+
+@benchmark('rag.generate_enhanced_post.cached_with_examples')
+def bench_rag_examples(ctx):
+    converter = ctx.SnapsAI.get_rag_converter()
+    user_key = 'bench-rag'
+    if not converter.indexed_count(user_key):
+        converter.index_posts(user_key, [{'id': f"post-{i}", 'text': f"지난 카페 기록 {i} ☕️ #cafe",
+                                          'platform': 'Instagram', 'kind': 'post'} for i in range(200)])
+    return lambda: converter.generate_enhanced_post(SHORT_CAPTION, 'Thread', True, user_key=user_key)
+
+
+# ---------------------------------------------------------------------------
+# API 클라이언트
+
+@benchmark('instagram.format_posts.100')
+def bench_format_posts(ctx):
+    api = ctx.SnapsAI.InstagramAPI('bench-token')
+    items = [{
+        'id': str(17900000000000000 + i),
+        'caption': f"게시물 {i} {SHORT_CAPTION}",
+        'media_type': 'VIDEO' if i % 5 == 0 else 'IMAGE',
+        'media_url': None if i % 5 == 0 else f"https://example.com/{i}.jpg",
+        'thumbnail_url': f"https://example.com/{i}_thumb.jpg",
+        'permalink': f"https://www.instagram.com/p/{i}/",
+        'timestamp': '2024-01-01T00:00:00+0000'
+    } for i in range(100)]
+    return lambda: api.format_posts(items)
+
+
+@benchmark('instagram.get_user_media.25')
+def bench_instagram_media(ctx):
+    api = ctx.SnapsAI.instagram_client('bench-instagram')
+    return lambda: api.get_user_media(limit=25)
+
+
+@benchmark('thread.get_user_media.250')
+def bench_thread_media(ctx):
+    api = ctx.SnapsAI.thread_client('bench-thread')
+    return lambda: api.get_user_media('bench')
+
+
+@benchmark('thread.get_user_insights.30d')
+def bench_thread_insights(ctx):
+    api = ctx.SnapsAI.thread_client('bench-thread')
+    return lambda: api.get_user_insights('bench', days=30)
+
+
+# ---------------------------------------------------------------------------
+# Flask 라우트 (테스트 클라이언트)
+
+def route(ctx, method, path, **kwargs):
+    def call():
+        response = ctx.client.open(path, method=method, base_url='https://localhost', **kwargs)
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {path}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return call
+
+
+@benchmark('route.convert_preview.10x4')
+def bench_route_preview(ctx):
+    from benchmarks.bench_rule_converter import make_captions
+    captions = [caption for caption in make_captions(100) if len(caption) < 300][:10]
+    return route(ctx, 'POST', '/convert/preview',
+                 json={'captions': captions, 'platforms': ['instagram', 'facebook', 'thread', 'blog']})
+
+
+@benchmark('route.convert.cached')
+def bench_route_convert(ctx):
+    return route(ctx, 'POST', '/convert', json={'caption': SHORT_CAPTION, 'targetPlatform': 'thread'})
+
+
+@benchmark('route.fetch_posts.stored')
+def bench_route_fetch_posts(ctx):
+    return route(ctx, 'POST', '/fetch_posts', json={'limit': 25})
+
+
+@benchmark('route.fetch_thread_posts.stored')
+def bench_route_thread_posts(ctx):
+    return route(ctx, 'GET', '/fetch_thread_posts')
+
+
+@benchmark('route.thread_statistics.rollup')
+def bench_route_thread_statistics(ctx):
+    return route(ctx, 'GET', '/thread_statistics')
+
+
+# ---------------------------------------------------------------------------
+
+class Context:
+    """벤치마크가 공유하는 스텁 서버, 모듈, 테스트 클라이언트"""
+
+    def __init__(self, args):
+        self.llm = start_openai_stub(latency=args.llm_latency)
+        self.graph = start_graph_stub(latency=args.graph_latency, post_count=250)
+        root = tempfile.mkdtemp(prefix='bench_suite_')
+        os.environ['OPENAI_API_KEY'] = 'sk-bench'
+        os.environ['OPENAI_API_BASE'] = f"{self.llm.url}/v1"
+        os.environ['THREADS_GRAPH_URL'] = f"{self.graph.url}/v1.0"
+        os.environ['INSTAGRAM_GRAPH_URL'] = f"{self.graph.url}/v12.0"
+        os.environ['GRAPH_RATE_PER_SECOND'] = '100000'  # 호출 예산 대기가 아니라 처리 비용을 측정
+        os.environ['GRAPH_RATE_BURST'] = '100000'
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(root, 'bench.db')}"
+        os.environ['CONVERSION_CACHE_PATH'] = ''
+        os.environ['RAG_INDEX_DIR'] = os.path.join(root, 'rag_index')
+        os.environ['EMBEDDING_CACHE_DIR'] = os.path.join(root, 'embedding_cache')
+        os.environ['PUBLISH_RESUME_ON_START'] = 'False'
+        os.environ['LOG_LEVEL'] = 'WARNING'  # 라우트 벤치마크가 요청마다 남기는 INFO 로그 제외
+        os.environ.setdefault('SECRET_KEY', 'bench')
+
+        import SnapsAI
+        self.SnapsAI = SnapsAI
+        self._app = None
+        self._client = None
+
+    @property
+    def client(self):
+        """Flask 앱은 라우트 벤치마크를 실행할 때만 import 합니다."""
+        if self._client is None:
+            import logging
+            from app_v1 import app, db, User
+            app.logger.setLevel(logging.WARNING)  # 요청마다 남기는 info 로그가 측정을 흐리지 않도록
+            with app.app_context():
+                db.create_all()
+                user = User(username='bench', email='bench@example.com', access_token='bench-instagram',
+                            thread_account_id='bench', thread_access_token='bench-thread')
+                user.set_password('bench')
+                db.session.add(user)
+                db.session.commit()
+                user_id = user.id
+            self._client = app.test_client()
+            with self._client.session_transaction() as sess:
+                sess['user_id'] = user_id
+        return self._client
+
+    def stop(self):
+        self.llm.stop()
+        self.graph.stop()
+
+
+def compare(results, baseline, tolerance):
+    """기준값보다 tolerance 배 넘게 느려진 항목 이름 목록을 반환합니다."""
+    regressions = []
+    print(f"\n{'benchmark':<48}{'baseline min us':>16}{'current min us':>16}{'ratio':>8}  status")
+    for name, result in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None:
+            print(f"{name:<48}{'-':>16}{result['min_us']:>16.1f}{'-':>8}  new")
+            continue
+        ratio = result['min_us'] / base['min_us'] if base['min_us'] else 1.0
+        if ratio > tolerance:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 / tolerance:
+            status = 'faster'
+        else:
+            status = 'ok'
+        print(f"{name:<48}{base['min_us']:>16.1f}{result['min_us']:>16.1f}{ratio:>8.2f}  {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help='이름에 이 문자열이 들어간 벤치마크만 실행 (쉼표로 여러 개)')
+    parser.add_argument('--list', action='store_true', help='벤치마크 이름만 출력')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='측정 한 번의 최소 시간(초)')
+    parser.add_argument('--llm-latency', type=float, default=0.01, help='스텁 LLM 응답 지연(초)')
+    parser.add_argument('--graph-latency', type=float, default=0.0, help='스텁 Graph API 응답 지연(초)')
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=1.5, help='허용하는 최솟값 배율 (기준값 대비)')
+    parser.add_argument('--update-baseline', action='store_true', help='결과를 기준값 파일에 저장')
+    args = parser.parse_args()
+
+    patterns = [pattern for pattern in args.filter.split(',') if pattern]
+    selected = [(name, setup) for name, setup in BENCHMARKS
+                if not patterns or any(pattern in name for pattern in patterns)]
+    if args.list:
+        for name, _ in selected:
+            print(name)
+        return
+    if not selected:
+        print(f"no benchmark matches {args.filter!r}")
+        sys.exit(1)
+
+    ctx = Context(args)
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'settings': {'llm_latency': args.llm_latency, 'graph_latency': args.graph_latency},
+        'benchmarks': {}
+    }
+    print(f"{'benchmark':<48}{'median us':>14}{'min us':>12}{'ops/s':>12}{'calls':>8}")
+    try:
+        for name, setup in selected:
+            timings, number = measure(setup(ctx), args.repeat, args.min_time)
+            result = summarize(timings, number)
+            results['benchmarks'][name] = result
+            print(f"{name:<48}{result['median_us']:>14.1f}{result['min_us']:>12.1f}"
+                  f"{result['ops_per_sec']:>12,.1f}{number:>8}")
+    finally:
+        ctx.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        merged = results
+        if baseline is not None and patterns:
+            # 일부 항목만 실행했으면 나머지 기준값은 유지
+            merged = {**results, 'benchmarks': {**baseline.get('benchmarks', {}), **results['benchmarks']}}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"\nbaseline written to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nno baseline at {args.baseline} (create one with --update-baseline)")
+        return
+    if baseline.get('machine') != results['machine']:
+        print(f"\nwarning: baseline was recorded on a different machine {baseline.get('machine')}")
+    if baseline.get('settings') != results['settings']:
+        print(f"warning: baseline stub settings differ {baseline.get('settings')}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than {args.tolerance}x baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,510 @@
+"""테스트와 벤치마크가 함께 쓰는 로컬 스텁 서버
+
+실제 외부 서비스(OpenAI, Meta Graph API) 대신 로컬에서 응답하는 HTTP 서버입니다.
+요청 수와 새로 맺어진 TCP 연결 수를 세어 커넥션 재사용 여부를 확인할 수 있습니다.
+부하 테스트용으로 응답 지연의 흔들림(latency_jitter)과 일정 비율의 500/429 응답
+(error_rate/throttle_rate)을 주입할 수 있습니다.
+"""
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+
+# 스텁 LLM이 돌려주는 변환 결과 본문 (실제 응답 길이와 비슷하게)
+STUB_POST = "오늘의 라떼아트 ☕️ 부드러운 우유 거품 위에 그린 하트가 너무 예쁘네요. " * 4
+
+
+def approx_tokens(text: str) -> int:
+    """토크나이저 없이 쓰는 대략적인 토큰 수 (한글은 글자당 약 1토큰, 그 외 4글자당 1토큰)"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return max(1, non_ascii + (len(text) - non_ascii) // 4)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler_class, latency: float = 0.0, token_latency: float = 0.0):
+        super().__init__(('127.0.0.1', 0), handler_class)
+        self.latency = latency
+        self.token_latency = token_latency  # 생성 토큰당 추가 지연 (LLM 스텁)
+        self.latency_jitter = 0.0  # 응답마다 latency에 더하는 0~latency_jitter초의 무작위 지연
+        self.error_rate = 0.0  # 500으로 응답할 요청 비율
+        self.throttle_rate = 0.0  # 429(Retry-After)로 응답할 요청 비율
+        self.retry_after = 1  # 429 응답의 Retry-After (초)
+        self.request_count = 0
+        self.connection_count = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.paths = []
+        self.embedded_texts = []  # /v1/embeddings 입력 (요청 순서대로)
+        self.completed_streams = 0  # 끝까지 보낸 스트리밍 응답 수 (클라이언트가 중간에 끊으면 세지 않음)
+        self.injected_errors = 0
+        self.injected_throttles = 0
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def handle_error(self, request, client_address):
+        # 응답을 보내기 전에 클라이언트가 연결을 끊은 경우(부하 테스트 중 앱 워커 종료 등)는 무시
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def get_request(self):
+        request = super().get_request()
+        with self._lock:
+            self.connection_count += 1
+        return request
+
+    def record(self, path: str):
+        with self._lock:
+            self.request_count += 1
+            self.paths.append(path)
+
+    def record_usage(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def reset_counters(self):
+        with self._lock:
+            self.request_count = 0
+            self.connection_count = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.paths = []
+            self.embedded_texts = []
+            self.completed_streams = 0
+            self.injected_errors = 0
+            self.injected_throttles = 0
+
+    def delay(self) -> float:
+        """이번 응답에 적용할 지연(초)"""
+        if not self.latency_jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.latency_jitter)
+
+    def draw_fault(self):
+        """error_rate/throttle_rate 확률로 'error' 또는 'throttle'을 뽑습니다 (주입하지 않으면 None)."""
+        if not (self.error_rate or self.throttle_rate):
+            return None
+        with self._lock:
+            value = self._random.random()
+            if value < self.throttle_rate:
+                self.injected_throttles += 1
+                return 'throttle'
+            if value < self.throttle_rate + self.error_rate:
+                self.injected_errors += 1
+                return 'error'
+        return None
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive 지원
+    disable_nagle_algorithm = True  # 헤더/본문 분할 전송 시 지연된 ACK 대기 방지
+
+    # inject_fault가 보내는 응답 본문 (서비스별 오류 형식으로 재정의)
+    ERROR_BODY = {'error': {'message': 'Injected server error'}}
+    THROTTLE_BODY = {'error': {'message': 'Injected rate limit'}}
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        return json.loads(body) if body else {}
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate_latency(self):
+        delay = self.server.delay()
+        if delay:
+            time.sleep(delay)
+
+    def inject_fault(self) -> bool:
+        """server.error_rate/throttle_rate 확률로 500 또는 429로 응답하고 True를 반환합니다."""
+        fault = self.server.draw_fault()
+        if fault == 'throttle':
+            self.send_json(self.THROTTLE_BODY, status=429, headers={'Retry-After': str(self.server.retry_after)})
+        elif fault == 'error':
+            self.send_json(self.ERROR_BODY, status=500)
+        return fault is not None
+
+
+class OpenAIStubHandler(JSONHandler):
+    """OpenAI 호환 API (/v1/models, /v1/chat/completions, /v1/embeddings)"""
+
+    ERROR_BODY = {'error': {'message': 'The server had an error while processing your request.',
+                            'type': 'server_error', 'code': None}}
+    THROTTLE_BODY = {'error': {'message': 'Rate limit reached for requests', 'type': 'requests',
+                               'code': 'rate_limit_exceeded'}}
+
+    def do_GET(self):
+        self.server.record(self.path)
+        if self.path.rstrip('/').endswith('/models'):
+            self.send_json({'object': 'list', 'data': [{'id': 'gpt-4o-mini', 'object': 'model'}]})
+        else:
+            self.send_json({'error': {'message': 'not found'}}, status=404)
+
+    def do_POST(self):
+        self.server.record(self.path)
+        payload = self.read_json()
+        self.simulate_latency()
+        if self.inject_fault():
+            return
+        if self.path.endswith('/chat/completions'):
+            response = self.chat_completion(payload)
+            usage = response['usage']
+            self.server.record_usage(usage['prompt_tokens'], usage['completion_tokens'])
+            if payload.get('stream'):
+                self.stream_chat_completion(payload, response)
+                return
+            if self.server.token_latency:
+                time.sleep(self.server.token_latency * usage['completion_tokens'])
+            self.send_json(response)
+        elif self.path.endswith('/embeddings'):
+            self.send_json(self.embeddings(payload))
+        else:
+            self.send_json({'error': {'message': 'not found'}}, status=404)
+
+    def chat_completion(self, payload):
+        prompt = ''.join(str(message.get('content', '')) for message in payload.get('messages', []))
+        if (payload.get('response_format') or {}).get('type') == 'json_object':
+            # 일괄 변환: 프롬프트의 "Target platforms:" 줄에 있는 플랫폼마다 결과 생성
+            platforms = []
+            for line in prompt.splitlines():
+                if line.strip().startswith('Target platforms:'):
+                    platforms = [p.strip() for p in line.split(':', 1)[1].split(',') if p.strip()]
+            content = json.dumps({p: f"[stub] {p} {STUB_POST}" for p in platforms}, ensure_ascii=False)
+        else:
+            content = f"[stub] {STUB_POST}"
+        prompt_tokens = approx_tokens(prompt)
+        completion_tokens = approx_tokens(content)
+        return {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'gpt-4o-mini'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }
+
+    def stream_chat_completion(self, payload, response):
+        """stream=True 요청: 응답 본문을 조각내어 SSE(chunked)로 보냅니다."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        content = response['choices'][0]['message']['content']
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        per_piece = self.server.token_latency * response['usage']['completion_tokens'] / max(1, len(pieces))
+        base = {'id': response['id'], 'object': 'chat.completion.chunk',
+                'created': response['created'], 'model': response['model']}
+        for piece in pieces:
+            if per_piece:
+                time.sleep(per_piece)
+            self._write_chunk({**base, 'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]})
+        self._write_chunk({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            self._write_chunk({**base, 'choices': [], 'usage': response['usage']})
+        self._write_raw(b'data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+        with self.server._lock:
+            self.server.completed_streams += 1
+
+    def _write_chunk(self, payload):
+        self._write_raw(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+    def _write_raw(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def embeddings(self, payload):
+        inputs = payload.get('input', [])
+        if not isinstance(inputs, list):
+            inputs = [inputs]
+        with self.server._lock:
+            self.server.embedded_texts.extend(inputs)
+        data = []
+        for index, text in enumerate(inputs):
+            seed = sum(text) if isinstance(text, list) else sum(map(ord, str(text)))
+            data.append({
+                'object': 'embedding',
+                'index': index,
+                'embedding': [((seed * (i + 1)) % 97) / 97.0 for i in range(8)]
+            })
+        return {
+            'object': 'list',
+            'data': data,
+            'model': payload.get('model', 'text-embedding-ada-002'),
+            'usage': {'prompt_tokens': len(inputs), 'total_tokens': len(inputs)}
+        }
+
+
+def start_openai_stub(latency: float = 0.0, token_latency: float = 0.0) -> StubServer:
+    return StubServer(OpenAIStubHandler, latency=latency, token_latency=token_latency).start()
+
+
+class GraphStubHandler(JSONHandler):
+    """Threads/Instagram Graph API 스텁
+
+    server.post_count 개의 합성 게시물을 돌려줍니다. 게시물 본문 앞에 요청한 access_token을
+    붙여 응답이 어느 토큰의 것인지 확인할 수 있습니다. server.nested_insights가 False면
+    insights.metric(...) 필드 확장 요청을 400으로 거부합니다.
+
+    게시 흐름(POST threads -> GET 컨테이너 status -> POST threads_publish)도 흉내 내며,
+    컨테이너는 server.container_ready_polls 번 조회될 때까지 IN_PROGRESS 상태입니다.
+
+    server.usage_limit가 있으면 access_token별로 usage_window초 동안의 호출 수를 세어
+    X-App-Usage(또는 X-Business-Use-Case-Usage) 헤더로 사용량(%)을 알려 주고, 한도를 넘은
+    호출은 Graph API처럼 오류 코드 4(HTTP 403)로 거부합니다.
+    """
+
+    ERROR_BODY = {'error': {'message': 'An unexpected error has occurred. Please retry your request later.',
+                            'type': 'OAuthException', 'code': 2, 'is_transient': True}}
+    THROTTLE_BODY = {'error': {'message': 'Application request limit reached', 'type': 'OAuthException',
+                               'code': 4, 'is_transient': True}}
+
+    def send_json(self, payload, status=200, headers=None):
+        headers = dict(headers or {})
+        usage = getattr(self, 'usage', None)
+        if usage is not None:
+            if self.server.usage_header == 'buc':
+                headers['X-Business-Use-Case-Usage'] = json.dumps({'stub-business': [{
+                    'type': 'instagram', 'call_count': usage, 'total_cputime': usage // 2,
+                    'total_time': usage // 2,
+                    'estimated_time_to_regain_access': 0 if usage < 100 else 1
+                }]})
+            else:
+                headers['X-App-Usage'] = json.dumps({'call_count': usage, 'total_cputime': usage // 2,
+                                                     'total_time': usage // 2})
+        super().send_json(payload, status=status, headers=headers)
+
+    def over_limit(self, access_token):
+        """사용량을 기록하고, 한도를 넘었으면 오류 코드 4로 응답한 뒤 True를 반환합니다."""
+        self.usage = None
+        if not self.server.usage_limit:
+            return False
+        calls = self.server.record_usage_call(access_token)
+        self.usage = min(100, calls * 100 // self.server.usage_limit)
+        if calls > self.server.usage_limit:
+            with self.server._lock:
+                self.server.rate_limited_count += 1
+            self.send_json({'error': {'message': 'Application request limit reached', 'code': 4}}, status=403)
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        self.server.record(url.path)
+        self.simulate_latency()
+        if self.over_limit(query.get('access_token')) or self.inject_fault():
+            return
+
+        if len(parts) >= 3 and parts[-1] == 'threads':
+            self.user_threads(query)
+        elif len(parts) >= 3 and parts[-1] == 'media':
+            self.user_media(query)
+        elif len(parts) >= 3 and parts[-1] == 'insights':
+            self.send_json({'data': media_insights(parts[-2])})
+        elif len(parts) >= 3 and parts[-1] == 'threads_insights':
+            self.send_json({'data': user_insights(query)})
+        elif len(parts) == 2 and parts[-1] in self.server.containers:
+            self.container_status(parts[-1])
+        else:
+            self.send_json({'error': {'message': 'Unknown path', 'code': 100}}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        payload = self.read_json()
+        self.server.record(url.path)
+        self.simulate_latency()
+        if self.over_limit(payload.get('access_token')) or self.inject_fault():
+            return
+
+        if len(parts) >= 3 and parts[-1] == 'threads':
+            with self.server._lock:
+                container_id = f"container_{len(self.server.containers)}"
+                self.server.containers[container_id] = {'polls': 0, 'status': 'IN_PROGRESS',
+                                                        'text': payload.get('text')}
+            self.send_json({'id': container_id})
+        elif len(parts) >= 3 and parts[-1] == 'threads_publish':
+            container = self.server.containers.get(payload.get('creation_id'))
+            if container is None or container['status'] != 'FINISHED':
+                self.send_json({'error': {'message': 'Media not ready for publishing', 'code': 9007}},
+                               status=400)
+                return
+            with self.server._lock:
+                container['status'] = 'PUBLISHED'
+                self.server.published.append(payload['creation_id'])
+            self.send_json({'id': f"published_{payload['creation_id']}"})
+        else:
+            self.send_json({'error': {'message': 'Unknown path', 'code': 100}}, status=404)
+
+    def container_status(self, container_id):
+        with self.server._lock:
+            container = self.server.containers[container_id]
+            container['polls'] += 1
+            if container['status'] == 'IN_PROGRESS' and container['polls'] > self.server.container_ready_polls:
+                container['status'] = 'FINISHED'
+            status = container['status']
+        self.send_json({'id': container_id, 'status': status})
+
+    def user_threads(self, query):
+        fields = query.get('fields', '')
+        nested = 'insights.metric(' in fields
+        if nested and not self.server.nested_insights:
+            self.send_json({'error': {'message': 'Tried accessing nonexisting field (insights)', 'code': 100}},
+                           status=400)
+            return
+        posts = []
+        media_ids, paging = self.page(query)
+        for media_id in media_ids:
+            post = {
+                'id': media_id,
+                'media_product_type': 'THREADS',
+                'media_type': 'TEXT_POST',
+                'permalink': f"https://www.threads.net/@stub/post/{media_id}",
+                'username': 'stub',
+                'text': f"[{query.get('access_token')}] 스텁 게시물 {media_id} #stub",
+                'timestamp': stub_timestamp(media_id),
+                'shortcode': media_id,
+                'is_quote_post': False
+            }
+            if nested:
+                post['insights'] = {'data': media_insights(media_id)}
+            posts.append(post)
+        self.send_json({'data': posts, **paging})
+
+    def user_media(self, query):
+        media_ids, paging = self.page(query)
+        posts = [{
+            'id': media_id,
+            'caption': f"[{query.get('access_token')}] 스텁 게시물 {media_id} #stub #snaps",
+            'media_type': 'IMAGE',
+            'media_url': f"https://example.com/{media_id}.jpg",
+            'permalink': f"https://www.instagram.com/p/{media_id}/",
+            'timestamp': stub_timestamp(media_id),
+            'like_count': sum(map(ord, media_id)) % 500 + self.server.engagement_bonus,
+            'comments_count': sum(map(ord, media_id)) % 50 + self.server.engagement_bonus
+        } for media_id in media_ids]
+        self.send_json({'data': posts, **paging})
+
+    def page(self, query):
+        """limit/after 커서로 게시물 ID 목록을 자르고 paging.next URL을 만듭니다."""
+        media_ids = self.server.media_ids()
+        limit = int(query.get('limit') or self.server.page_size)
+        offset = int(query.get('after') or 0)
+        page = media_ids[offset:offset + limit]
+        paging = {}
+        if offset + limit < len(media_ids):
+            next_query = urlencode({**query, 'after': offset + limit})
+            paging = {'paging': {
+                'cursors': {'after': str(offset + limit)},
+                'next': f"{self.server.url}{urlparse(self.path).path}?{next_query}"
+            }}
+        return page, paging
+
+
+def stub_timestamp(media_id: str) -> str:
+    index = int(media_id.rsplit('_', 1)[-1])
+    return time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime(1700000000 - index * 3600))
+
+
+def media_insights(media_id: str):
+    seed = sum(map(ord, media_id))
+    return [{'name': name, 'period': 'lifetime', 'values': [{'value': (seed * (i + 3)) % 50}]}
+            for i, name in enumerate(('views', 'likes', 'replies', 'reposts', 'quotes', 'shares'))]
+
+
+def user_insights(query):
+    """threads_insights 응답: views는 일별 시계열(values), 나머지는 구간 합계(total_value)"""
+    metrics = query.get('metric', 'views').split(',')
+    since = int(query.get('since', 1700000000 - 86400))
+    until = int(query.get('until', 1700000000))
+    days = range(since // 86400, until // 86400)
+    data = []
+    for name in metrics:
+        weight = len(name)
+        if name == 'views':
+            values = [{'value': (day * 7) % 100 + weight,
+                       'end_time': time.strftime('%Y-%m-%dT08:00:00+0000', time.gmtime((day + 1) * 86400))}
+                      for day in days]
+            data.append({'name': name, 'period': 'day', 'values': values})
+        else:
+            data.append({'name': name, 'period': 'day',
+                         'total_value': {'value': sum((day * 3) % 10 + weight for day in days)}})
+    return data
+
+
+class GraphStubServer(StubServer):
+    def __init__(self, latency: float = 0.0, post_count: int = 25, nested_insights: bool = True,
+                 page_size: int = 100):
+        super().__init__(GraphStubHandler, latency=latency)
+        self.post_count = post_count
+        self.nested_insights = nested_insights
+        self.page_size = page_size  # limit 파라미터가 없을 때의 페이지 크기
+        self.container_ready_polls = 1  # 컨테이너가 FINISHED가 되기 전 IN_PROGRESS로 응답할 조회 수
+        self.engagement_bonus = 0  # Instagram 미디어 좋아요/댓글 수에 더할 값 (참여 수 변화 흉내)
+        self.containers = {}
+        self.published = []
+        self.usage_limit = None  # usage_window초 동안 토큰당 허용 호출 수 (None이면 무제한)
+        self.usage_window = 1.0
+        self.usage_header = 'app'  # 'app'(X-App-Usage) 또는 'buc'(X-Business-Use-Case-Usage)
+        self.rate_limited_count = 0
+        self._usage_calls = {}
+
+    def record_usage_call(self, access_token) -> int:
+        """토큰의 최근 usage_window초 호출 수 (이번 호출 포함)"""
+        now = time.monotonic()
+        with self._lock:
+            calls = [t for t in self._usage_calls.get(access_token, []) if now - t < self.usage_window]
+            calls.append(now)
+            self._usage_calls[access_token] = calls
+            return len(calls)
+
+    def media_ids(self):
+        return [f"media_{index}" for index in range(self.post_count)]
+
+
+def start_graph_stub(latency: float = 0.0, post_count: int = 25, nested_insights: bool = True) -> GraphStubServer:
+    return GraphStubServer(latency=latency, post_count=post_count, nested_insights=nested_insights).start()
+
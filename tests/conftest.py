@@ -0,0 +1,136 @@
+"""테스트 공용 픽스처
+
+app_v1과 SnapsAI는 import 시점에 환경 변수(DB 주소, Graph API/OpenAI 주소, 캐시 경로)를 읽으므로
+pytest_configure에서 로컬 스텁 서버를 띄우고 환경 변수를 설정한 뒤, app 픽스처에서 앱을 불러옵니다.
+Graph API 호출 예산(GRAPH_RATE_*)은 기본값을 그대로 쓰며, 사용자마다 토큰이 달라 예산도 따로 잡힙니다.
+"""
+import itertools
+import os
+import tempfile
+
+import pytest
+from flask.testing import FlaskClient
+
+from testing.stubs import start_graph_stub, start_openai_stub
+
+_servers = {}
+_user_numbers = itertools.count(1)
+
+
+def pytest_configure(config):
+    root = tempfile.mkdtemp(prefix='snaps_tests_')
+    _servers['graph'] = start_graph_stub()
+    _servers['llm'] = start_openai_stub()
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(root, 'test.db')}",
+        'THREADS_GRAPH_URL': f"{_servers['graph'].url}/v1.0",
+        'INSTAGRAM_GRAPH_URL': f"{_servers['graph'].url}/v12.0",
+        'OPENAI_API_KEY': 'sk-test',  # CI 비밀 값 대신 스텁 사용
+        'OPENAI_API_BASE': f"{_servers['llm'].url}/v1",
+        'CONVERSION_CACHE_PATH': '',
+        'RAG_INDEX_DIR': os.path.join(root, 'rag_index'),
+        'EMBEDDING_CACHE_DIR': os.path.join(root, 'embedding_cache'),
+        'SINGLE_FLIGHT_LOCK_DIR': '',
+        'PUBLISH_RESUME_ON_START': 'False',
+        'THREAD_PUBLISH_POLL_INITIAL': '0.1',
+        'GRAPH_BACKOFF_FACTOR': '0.01',
+        'SECRET_KEY': 'test',
+    })
+
+
+def pytest_unconfigure(config):
+    for server in _servers.values():
+        server.stop()
+
+
+@pytest.fixture(scope='session')
+def graph_server():
+    return _servers['graph']
+
+
+@pytest.fixture(scope='session')
+def llm_server():
+    return _servers['llm']
+
+
+@pytest.fixture(autouse=True)
+def reset_stubs():
+    """테스트가 바꾼 스텁 설정(지연, 오류 주입, 게시물 수 등)을 기본값으로 되돌립니다."""
+    yield
+    graph, llm = _servers['graph'], _servers['llm']
+    for server in (graph, llm):
+        server.latency = 0.0
+        server.token_latency = 0.0
+        server.error_rate = 0.0
+        server.throttle_rate = 0.0
+        server.retry_after = 1
+        server.reset_counters()
+    graph.post_count = 25
+    graph.nested_insights = True
+    graph.container_ready_polls = 1
+    graph.engagement_bonus = 0
+    graph.usage_limit = None
+    graph.rate_limited_count = 0
+
+
+@pytest.fixture(scope='session')
+def app():
+    import app_v1
+    with app_v1.app.app_context():
+        app_v1.db.create_all()
+    return app_v1.app
+
+
+@pytest.fixture(scope='session')
+def db(app):
+    from app_v1 import db
+    return db
+
+
+class HTTPSClient(FlaskClient):
+    """기본 base_url이 https인 테스트 클라이언트 (Talisman의 https 리다이렉트와 Secure 세션 쿠키)"""
+
+    def open(self, *args, **kwargs):
+        if not args or isinstance(args[0], str):
+            kwargs.setdefault('base_url', 'https://localhost')
+        return super().open(*args, **kwargs)
+
+
+@pytest.fixture(scope='session')
+def make_user(app, db):
+    """Instagram/Thread 계정이 연동된 사용자를 만들고 id를 반환합니다 (토큰은 사용자마다 다름)."""
+    from app_v1 import User
+
+    def make(**fields):
+        name = f"user{next(_user_numbers)}"
+        values = {'username': name, 'email': f"{name}@example.com", 'instagram_id': name,
+                  'access_token': f"{name}-ig", 'thread_account_id': name, 'thread_access_token': f"{name}-th"}
+        values.update(fields)
+        with app.app_context():
+            user = User(**values)
+            user.set_password('test')
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture(scope='session')
+def login(app):
+    """user_id로 로그인한 테스트 클라이언트를 만듭니다."""
+    def make(user_id):
+        client = HTTPSClient(app, app.response_class, use_cookies=True)
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        return client
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def client(login, user):
+    return login(user)
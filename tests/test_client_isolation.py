@@ -0,0 +1,35 @@
+"""여러 사용자가 동시에 요청해도 서로의 액세스 토큰이 섞이지 않는지 확인
+
+스텁 Graph 서버는 게시물 본문 앞에 요청 토큰을 붙여 돌려주므로, 응답 어디에든 다른 사용자의 토큰이 보이면 실패입니다.
+사용자 수백 명(USERS)의 요청을 섞은 순서로 많은 스레드에서 동시에 보냅니다.
+"""
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+USERS = 200
+THREADS = 32
+TOKEN_RE = re.compile(r"\b(ig|th)-token-(\d+)\b")
+
+
+def test_concurrent_users_see_only_their_own_posts(make_user, login, graph_server):
+    graph_server.post_count = 3
+    graph_server.latency = 0.005
+    clients = [login(make_user(access_token=f"ig-token-{index}", thread_access_token=f"th-token-{index}"))
+               for index in range(USERS)]
+    # 사용자마다 /fetch_posts, /fetch_thread_posts 두 번씩 (두 번째는 저장소 응답) 을 모두 섞어서 실행
+    calls = [(index, route) for index in range(USERS) for route in ('posts', 'thread_posts') * 2]
+    random.Random(0).shuffle(calls)
+
+    def run_call(call):
+        index, route = call
+        client = clients[index]
+        response = client.post('/fetch_posts') if route == 'posts' else client.get('/fetch_thread_posts')
+        body = response.get_data(as_text=True)
+        posts = response.get_json().get('posts', [])
+        tokens = {int(number) for _, number in TOKEN_RE.findall(body)}
+        return bool(posts) and tokens == {index}
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(run_call, calls))
+    assert len(results) == USERS * 4 and all(results)
@@ -0,0 +1,136 @@
+"""임베딩 캐시(EmbeddingCache) 확인 (배치 조회, 동시 요청 합치기, 워커 프로세스 간 공유)"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # 워커 프로세스로 직접 실행할 때
+
+from SnapsAI import EmbeddingCache  # noqa: E402
+
+MODEL = 'test-model'
+DIM = 256
+
+
+def fake_vector(text, dim=DIM):
+    """텍스트마다 고정된 벡터 (검증용)"""
+    seed = int.from_bytes(text.encode('utf-8')[-8:].rjust(8, b'\0'), 'little') % (2 ** 32)
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class CountingEmbedder:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        time.sleep(self.latency)
+        return [fake_vector(text).tolist() for text in texts]
+
+
+def test_batch_embeds_only_missing_texts(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    embedder = CountingEmbedder()
+    texts = [f"caption {i % 80}" for i in range(100)]
+    cache.embed(texts, embedder, MODEL)
+    assert (embedder.calls, embedder.texts) == (1, 80)
+
+    vectors = cache.embed(texts + ['caption new'], embedder, MODEL)
+    assert (embedder.calls, embedder.texts) == (2, 81)
+    assert vectors.shape == (101, DIM)
+    assert np.allclose(vectors[0], fake_vector('caption 0'))
+
+
+def test_concurrent_requests_for_hot_text_embed_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    embedder = CountingEmbedder(latency=0.05)
+    barrier = threading.Barrier(16)
+
+    def embed_hot():
+        barrier.wait()
+        cache.embed(['오늘의 인기 캡션 #hot'], embedder, MODEL)
+
+    threads = [threading.Thread(target=embed_hot) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert embedder.texts == 1
+
+
+def embed_as_worker(path, worker, workers, count):
+    """다른 워커처럼 겹치는 캡션 묶음을 임베딩하고, 임베딩한 텍스트 수를 출력"""
+    cache = EmbeddingCache(path)
+    embedder = CountingEmbedder(latency=0.01)
+    texts = [f"caption {i}" for i in range(count)]
+    offset = worker * count // (2 * workers)
+    ordered = texts[offset:] + texts[:offset]
+    for start in range(0, len(ordered), 50):
+        batch = ordered[start:start + 50]
+        for text, vector in zip(batch, cache.embed(batch, embedder, MODEL)):
+            if not np.allclose(vector, fake_vector(text)):
+                sys.exit('mismatch')
+    print(embedder.texts)
+
+
+def test_workers_share_disk_cache(tmp_path):
+    path, workers, count = str(tmp_path), 4, 400
+    EmbeddingCache(path)  # 디렉터리/색인 미리 생성
+    procs = [subprocess.Popen([sys.executable, __file__, path, str(worker), str(workers), str(count)],
+                              stdout=subprocess.PIPE, text=True, cwd=ROOT)
+             for worker in range(workers)]
+    outputs = [proc.communicate()[0].strip() for proc in procs]
+    assert [proc.returncode for proc in procs] == [0] * workers
+    assert sum(int(output) for output in outputs) == count  # 워커 전체에서 캡션마다 한 번만 임베딩
+    assert sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+               if name.endswith('.f32')) // (DIM * 4) == count
+
+    embedder = CountingEmbedder()
+    EmbeddingCache(path).embed([f"caption {i}" for i in range(count)], embedder, MODEL)
+    assert embedder.texts == 0
+
+
+def test_disk_tier_evicts_oldest_segments(tmp_path):
+    row_bytes = DIM * 4
+    cache = EmbeddingCache(str(tmp_path), max_disk_bytes=400 * row_bytes)  # 세그먼트당 50행
+    embedder = CountingEmbedder()
+    for start in range(0, 1000, 20):
+        cache.embed([f"caption {i}" for i in range(start, start + 20)], embedder, MODEL)
+
+    sizes = [os.path.getsize(os.path.join(str(tmp_path), name)) for name in os.listdir(str(tmp_path))
+             if name.endswith('.f32')]
+    assert sum(sizes) <= 400 * row_bytes and len(sizes) <= EmbeddingCache.DISK_SEGMENTS
+    assert cache._conn.execute("SELECT COUNT(*) FROM embedding_rows").fetchone()[0] == sum(sizes) // row_bytes
+
+    # 최근 항목은 디스크에서, 제거된 오래된 항목은 다시 임베딩
+    embedder = CountingEmbedder()
+    vectors = EmbeddingCache(str(tmp_path)).embed(['caption 999', 'caption 0'], embedder, MODEL)
+    assert embedder.texts == 1
+    assert np.allclose(vectors[0], fake_vector('caption 999')) and np.allclose(vectors[1], fake_vector('caption 0'))
+
+
+def test_repeated_retrieval_embeds_query_once(tmp_path, llm_server):
+    import SnapsAI
+    converter = SnapsAI.RAGConverter(
+        index_store=SnapsAI.PostIndexStore(str(tmp_path / 'rag_index')),
+        embedding_cache=EmbeddingCache(path=str(tmp_path / 'embeddings'))
+    )
+    converter.index_posts('user-1', [{'id': f"p{i}", 'text': f"게시물 {i}", 'platform': 'Thread'} for i in range(20)])
+    llm_server.reset_counters()
+    for _ in range(5):
+        converter.similar_posts('user-1', '처음 보는 캡션 #new')
+    # 다른 테스트가 남긴 백그라운드 인덱싱의 임베딩 호출과 섞이지 않게 입력 텍스트로 셉니다
+    assert llm_server.embedded_texts.count('처음 보는 캡션 #new') == 1
+
+
+if __name__ == '__main__':
+    embed_as_worker(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]))
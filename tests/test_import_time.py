@@ -0,0 +1,38 @@
+"""모듈 import 시간 예산 확인 (python -X importtime)
+
+새 프로세스에서 모듈을 불러와 누적 import 시간을 예산과 비교하고, LLM/벡터 스토어 의존성처럼
+import 시점에 불러오면 안 되는 모듈이 로드되지 않았는지 확인합니다.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# 첫 사용 시점에만 불러와야 하는 무거운 의존성
+LAZY_MODULES = ('langchain', 'langchain_core', 'langchain_openai', 'langchain_community', 'openai',
+                'chromadb', 'tiktoken', 'bson')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module):
+    """(누적 import 시간(us), 로드된 금지 모듈)"""
+    code = (f"import sys, {module}; "
+            f"print(','.join(sorted({{name.split('.')[0] for name in sys.modules}} & set({LAZY_MODULES!r}))))")
+    env = dict(os.environ, RAG_WARMUP='False', PUBLISH_RESUME_ON_START='False')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        timings[name.strip()] = int(cumulative_us)
+    return timings[module], [name for name in result.stdout.strip().split(',') if name]
+
+
+@pytest.mark.parametrize('module,budget_ms', [('SnapsAI', 400), ('app_v1', 1500)])
+def test_import_time_budget(module, budget_ms):
+    total_us, loaded = min((measure(module) for _ in range(3)), key=lambda run: run[0])
+    assert loaded == []
+    assert total_us / 1000 <= budget_ms
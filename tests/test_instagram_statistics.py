@@ -0,0 +1,50 @@
+"""Instagram 게시물 통계 확인 (저장소 기반 집계, 좋아요/댓글 수 갱신, 조회 게시물 수 제한)"""
+import pytest
+
+
+@pytest.fixture
+def fresh_sync(monkeypatch):
+    """매 요청이 동기화하고 최근 게시물의 좋아요/댓글 수도 다시 가져오도록"""
+    import app_v1
+    monkeypatch.setattr(app_v1, 'MEDIA_SYNC_FRESHNESS', 0)
+    monkeypatch.setattr(app_v1, 'INSIGHTS_REFRESH_INTERVAL', 0)
+    monkeypatch.setattr(app_v1, 'INSIGHTS_REFRESH_DAYS', 100000)
+    monkeypatch.setattr(app_v1, 'RAG_INDEX_DIR', '')
+
+
+def test_seen_posts_update_engagement():
+    from SnapsAI import InstagramStatistics
+    posts = [{'id': str(i), 'timestamp': '2024-05-01T09:00:00+0000', 'caption': '#cafe',
+              'like_count': 10, 'comments_count': 1} for i in range(3)]
+    stats = InstagramStatistics()
+    assert stats.add_posts(posts) == 3
+    assert stats.add_posts([dict(posts[0], like_count=40, comments_count=5)]) == 0
+    summary = stats.summary()
+    assert (summary['total_posts'], summary['total_likes'], summary['total_comments']) == (3, 60, 7)
+    assert summary['popular_hashtags'] == [('cafe', 3)]
+
+
+def test_stats_are_built_from_the_media_store(client, graph_server, fresh_sync):
+    graph_server.post_count = 100
+    first = client.get('/fetch_instagram_stats').get_json()
+    assert first['total_posts'] == 30  # 최근 INSTAGRAM_STATS_POSTS개
+
+    graph_server.engagement_bonus = 2
+    second = client.get('/fetch_instagram_stats').get_json()
+    assert second['total_posts'] == 30
+    assert second['total_likes'] == first['total_likes'] + 60
+    assert second['total_comments'] == first['total_comments'] + 60
+    assert client.get('/fetch_instagram_stats?limit=10').get_json()['total_posts'] == 10
+
+
+def test_client_statistics_fetch_is_bounded(graph_server):
+    from SnapsAI import InstagramAPI
+    graph_server.post_count = 500
+    api = InstagramAPI('stats-token')
+    graph_server.reset_counters()
+    first = api.get_user_statistics(limit=30)
+    assert first['total_posts'] == 30 and graph_server.request_count == 1
+
+    graph_server.engagement_bonus = 1
+    second = api.get_user_statistics(limit=30)
+    assert second['total_posts'] == 30 and second['total_likes'] == first['total_likes'] + 30
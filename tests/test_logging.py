@@ -0,0 +1,154 @@
+"""백그라운드 로그 처리와 페이로드 샘플링 확인"""
+import io
+import json
+import logging
+import queue
+import threading
+import time
+
+import pytest
+
+CAPTION = '오늘 성수동 카페에서 라떼아트가 정말 예뻤어요 ☕️ ' * 40 + '#카페 #cafe #라떼'
+PAYLOAD = {'request': {'caption': CAPTION, 'targetPlatform': 'thread', 'hasImage': True},
+           'basic': CAPTION[:500], 'rag': CAPTION[:480]}
+
+
+class SlowHandler(logging.StreamHandler):
+    """디스크나 원격 수집기가 느린 상황: 레코드마다 delay초를 더 씀"""
+
+    def __init__(self, stream, delay):
+        super().__init__(stream)
+        self.delay = delay
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        super().emit(record)
+
+
+def isolated_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def per_call_us(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+@pytest.fixture
+def log_module(app, monkeypatch):
+    import app_v1
+    monkeypatch.setattr(app_v1, 'LOG_PAYLOAD_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(app_v1, 'LOG_PAYLOAD_MAX_CHARS', 300)
+    return app_v1
+
+
+def test_queued_log_call_does_not_wait_for_slow_handler(log_module):
+    formatter = log_module.StructuredFormatter()
+    slow = SlowHandler(io.StringIO(), 0.001)
+    slow.setFormatter(formatter)
+    sync_logger = isolated_logger('test.sync', slow)
+    sync_us = per_call_us(lambda: log_module.log_event(sync_logger, logging.INFO, "Converted post",
+                                                       payload=PAYLOAD, platform='Thread'), 100)
+
+    log_queue = queue.Queue()
+    async_logger = isolated_logger('test.async', log_module.NonBlockingQueueHandler(log_queue))
+    async_us = per_call_us(lambda: log_module.log_event(async_logger, logging.INFO, "Converted post",
+                                                        payload=PAYLOAD, platform='Thread'), 2000)
+    assert async_us * 5 < sync_us
+
+
+def test_payload_sampling(log_module):
+    log_queue = queue.Queue()
+    logger = isolated_logger('test.sampling', log_module.NonBlockingQueueHandler(log_queue))
+    calls = 20000
+    log_module.LOG_PAYLOAD_SAMPLE_RATE = 0.1
+    for _ in range(calls):
+        log_module.log_event(logger, logging.INFO, "Converted post", payload=PAYLOAD, platform='Thread')
+    sampled = sum(hasattr(log_queue.get_nowait(), 'payload') for _ in range(calls))
+    assert 0.08 <= sampled / calls <= 0.12
+
+
+def test_one_json_object_per_line_with_truncated_payload(log_module):
+    log_queue = queue.Queue()
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(log_module.StructuredFormatter())
+    listener = log_module.BackgroundLogListener(log_queue, handler)
+    logger = isolated_logger('test.format', log_module.NonBlockingQueueHandler(log_queue))
+    listener.start()
+    log_module.log_event(logger, logging.INFO, "Converted post", payload=PAYLOAD, platform='Thread',
+                         caption_chars=2000)
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.error("Conversion error", exc_info=True)
+    listener.stop()
+
+    entries = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(entries) == 2
+    assert entries[0]['platform'] == 'Thread' and 'exc_info' in entries[1]
+    text = entries[0]['payload']
+    assert text.startswith('{"request": {"caption": "오늘') and text.endswith(' chars)')
+    assert len(text) < 300 + 30
+
+
+def test_full_queue_drops_records_without_blocking(log_module):
+    release = threading.Event()
+
+    class StuckHandler(logging.Handler):
+        def emit(self, record):
+            release.wait()
+
+    log_queue = queue.Queue(10)
+    listener = log_module.BackgroundLogListener(log_queue, StuckHandler())
+    listener.start()
+    logger = isolated_logger('test.stuck', log_module.NonBlockingQueueHandler(log_queue))
+    dropped_before = sum(float(line.rsplit(' ', 1)[1]) for line in log_module.LOG_RECORDS_DROPPED.samples())
+    start = time.perf_counter()
+    for index in range(100):
+        logger.info("record %d", index)
+    elapsed = time.perf_counter() - start
+    dropped = sum(float(line.rsplit(' ', 1)[1]) for line in log_module.LOG_RECORDS_DROPPED.samples()) - dropped_before
+    release.set()
+    listener.stop()
+    assert elapsed < 0.05
+    assert 80 <= dropped <= 90
+
+
+def test_routes_log_structured_records(log_module, client, monkeypatch):
+    output = io.StringIO()
+    capture = logging.StreamHandler(output)
+    capture.setFormatter(log_module.StructuredFormatter())
+    monkeypatch.setattr(log_module.LOG_LISTENER, 'handlers', log_module.LOG_LISTENER.handlers + (capture,))
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.DEBUG)
+    try:
+        responses = [
+            client.post('/convert', json={'caption': CAPTION, 'targetPlatform': 'thread'}),
+            client.post('/fetch_posts', json={'limit': 20}),
+            client.post('/upload_to_thread', json={'content': CAPTION}),
+        ]
+    finally:
+        root.setLevel(level)
+    assert [response.status_code for response in responses] == [200, 200, 202]
+    log_module.LOG_LISTENER.queue.join()
+
+    entries = []
+    for line in output.getvalue().splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            pass
+    by_message = {entry['message']: entry for entry in entries}
+    assert 'caption_chars' in by_message['Converted post']
+    assert 'count' in by_message['Fetched posts']
+    assert 'job_id' in by_message['Queued Thread publish job']
+    assert max(len(entry.get('payload', '')) for entry in entries) < 300 + 30
+    assert output.getvalue().count(CAPTION[:200]) <= 2
@@ -0,0 +1,67 @@
+"""로컬 미디어 저장소 동기화 확인 (동시 첫 동기화, Instagram 인사이트 스냅샷)"""
+import threading
+import time
+
+import pytest
+
+
+def stub_items(count, prefix='media'):
+    return [{'id': f"{prefix}_{i}", 'caption': f"게시물 {i}", 'media_type': 'IMAGE',
+             'timestamp': '2024-05-01T00:00:00+0000'} for i in range(count)]
+
+
+@pytest.fixture
+def user_id(make_user):
+    return make_user()
+
+
+def test_concurrent_upsert_rereads_existing_rows(app, db, user_id):
+    """다른 워커가 같은 게시물/동기화 상태를 먼저 넣고 커밋해도 IntegrityError 없이 갱신되어야 함"""
+    from app_v1 import MediaPost, MediaSyncState, get_sync_state, upsert_media_posts
+    items = stub_items(10)
+    errors = []
+
+    def second_worker():
+        try:
+            with app.app_context():
+                get_sync_state(user_id, 'instagram').last_synced_at = None
+                posts = upsert_media_posts(user_id, 'instagram', [dict(item, caption='수정됨') for item in items])
+                assert len(posts) == 10
+                db.session.commit()
+        except Exception as e:
+            errors.append(e)
+
+    with app.app_context():
+        get_sync_state(user_id, 'instagram')
+        upsert_media_posts(user_id, 'instagram', items)
+        db.session.flush()  # 쓰기 잠금을 잡은 채로 두 번째 워커를 시작
+        worker = threading.Thread(target=second_worker)
+        worker.start()
+        time.sleep(0.3)
+        db.session.commit()
+    worker.join()
+
+    assert not errors
+    with app.app_context():
+        posts = MediaPost.query.filter_by(user_id=user_id, platform='instagram').all()
+        assert len(posts) == 10 and {post.text for post in posts} == {'수정됨'}
+        assert MediaSyncState.query.filter_by(user_id=user_id, platform='instagram').count() == 1
+
+
+def test_instagram_sync_records_insight_snapshots(app, db, user_id, monkeypatch):
+    import app_v1
+    from app_v1 import MediaPost, PostInsightSnapshot, User, sync_instagram_posts
+    monkeypatch.setattr(app_v1, 'RAG_INDEX_DIR', '')  # 백그라운드 인덱싱 없이 (다른 테스트의 임베딩 호출 수에 섞이지 않게)
+    with app.app_context():
+        sync_instagram_posts(db.session.get(User, user_id), force=True)
+        posts = MediaPost.query.filter_by(user_id=user_id, platform='instagram').all()
+        assert len(posts) == 25 and any(post.likes for post in posts)
+        snapshots = PostInsightSnapshot.query.filter(PostInsightSnapshot.post_id.in_([p.id for p in posts])).count()
+        assert snapshots == 25
+
+        # 인사이트 갱신 주기가 지나면 최근 게시물을 다시 가져와 스냅샷을 추가
+        monkeypatch.setattr(app_v1, 'INSIGHTS_REFRESH_INTERVAL', 0)
+        monkeypatch.setattr(app_v1, 'INSIGHTS_REFRESH_DAYS', 10000)
+        sync_instagram_posts(db.session.get(User, user_id), force=True)
+        snapshots = PostInsightSnapshot.query.filter(PostInsightSnapshot.post_id.in_([p.id for p in posts])).count()
+        assert snapshots == 50
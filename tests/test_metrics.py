@@ -0,0 +1,106 @@
+"""/metrics 엔드포인트 확인 (형식, 라우트별 의존성 시간, 외부 호출 재시도, 접근 제어)"""
+import re
+
+import pytest
+
+SCRAPE = {'base_url': 'http://localhost', 'headers': {'Authorization': 'Bearer scrape-token'}}
+
+
+def sample(text, name, **labels):
+    """메트릭 텍스트에서 이름과 레이블이 맞는 첫 샘플 값 (없으면 None)"""
+    for line in text.splitlines():
+        if not line.startswith(name + '{') and not line.startswith(name + ' '):
+            continue
+        if all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+@pytest.fixture
+def metrics_token(app, monkeypatch):
+    import app_v1
+    monkeypatch.setattr(app_v1, 'METRICS_TOKEN', 'scrape-token')
+
+
+@pytest.fixture(scope='module')
+def scraped(app, make_user, login, graph_server, llm_server):
+    """Graph API는 500, LLM은 429로 실패시킨 요청을 포함해 라우트를 호출한 뒤의 /metrics 본문"""
+    import app_v1
+    client = login(make_user())
+
+    statuses = {}
+    graph_server.error_rate = 1.0
+    statuses['fetch_thread_posts'] = client.get('/fetch_thread_posts').status_code
+    graph_server.error_rate = 0.0
+    llm_server.throttle_rate = 1.0
+    llm_server.retry_after = 0
+    statuses['convert_all'] = client.post('/convert_all', json={
+        'caption': '오늘의 라떼 ☕️ #metrics', 'platforms': ['instagram', 'thread']}).status_code
+    llm_server.throttle_rate = 0.0
+    body = client.post('/convert/stream', json={'caption': '주말 산책 #metrics', 'targetPlatform': 'thread'})
+    statuses['convert_stream'] = 'event: done' in body.get_data(as_text=True)
+
+    token = app_v1.METRICS_TOKEN
+    app_v1.METRICS_TOKEN = 'scrape-token'
+    try:
+        text = client.get('/metrics', **SCRAPE).get_data(as_text=True)
+    finally:
+        app_v1.METRICS_TOKEN = token
+    return statuses, text
+
+
+def test_routes_respond_while_dependencies_fail(scraped):
+    statuses, _ = scraped
+    assert statuses == {'fetch_thread_posts': 200, 'convert_all': 200, 'convert_stream': True}
+
+
+def test_metrics_are_hidden_without_token(client, monkeypatch):
+    import app_v1
+    monkeypatch.setattr(app_v1, 'METRICS_TOKEN', None)
+    assert client.get('/metrics', base_url='http://localhost').status_code == 404
+    assert client.get('/metrics', **SCRAPE).status_code == 404
+
+
+def test_metrics_require_token_over_http(client, metrics_token):
+    assert client.get('/metrics', base_url='http://localhost').status_code == 401
+    assert client.get('/metrics', base_url='http://localhost',
+                      headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', **SCRAPE)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+
+def test_prometheus_text_format(scraped):
+    _, text = scraped
+    names = set(re.findall(r'^# TYPE (\S+) \S+$', text, re.M))
+    assert {'snaps_http_request_duration_seconds', 'snaps_http_request_dependency_seconds',
+            'snaps_db_query_duration_seconds', 'snaps_graph_request_duration_seconds',
+            'snaps_graph_retries_total', 'snaps_llm_call_duration_seconds',
+            'snaps_llm_time_to_first_token_seconds', 'snaps_llm_tokens_total',
+            'snaps_llm_http_response_seconds', 'snaps_llm_retries_total'} <= names
+
+    for labels in set(re.findall(r'^snaps_http_request_duration_seconds_bucket\{(.*),le="[^"]+"\}', text, re.M)):
+        counts = [float(value) for value in re.findall(
+            rf'^snaps_http_request_duration_seconds_bucket\{{{re.escape(labels)},le="[^"]+"\}} (\S+)$', text, re.M)]
+        assert counts == sorted(counts)
+    count = sample(text, 'snaps_http_request_duration_seconds_count', route='/convert_all', status='200')
+    assert count >= 1
+    assert sample(text, 'snaps_http_request_duration_seconds_bucket', route='/convert_all', le='+Inf') == count
+
+
+def test_dependency_time_attributed_to_routes(scraped):
+    _, text = scraped
+    assert sample(text, 'snaps_http_request_dependency_seconds_sum', route='/convert_all', dependency='llm')
+    assert sample(text, 'snaps_http_request_dependency_seconds_sum', route='/fetch_thread_posts', dependency='graph')
+    assert sample(text, 'snaps_http_request_dependency_seconds_sum', route='/fetch_thread_posts', dependency='db')
+
+
+def test_external_call_retries_and_tokens(scraped):
+    _, text = scraped
+    assert sample(text, 'snaps_graph_retries_total', reason='500')
+    assert sample(text, 'snaps_graph_request_duration_seconds_count', status='500')
+    assert sample(text, 'snaps_llm_http_response_seconds_count', status='429')
+    assert sample(text, 'snaps_llm_retries_total', endpoint='completions')
+    assert sample(text, 'snaps_llm_tokens_total', kind='prompt')
+    assert sample(text, 'snaps_llm_tokens_total', kind='completion')
+    assert sample(text, 'snaps_llm_time_to_first_token_seconds_count') >= 1
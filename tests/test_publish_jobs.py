@@ -0,0 +1,57 @@
+"""/upload_to_thread 가 게시 완료를 기다리지 않고 작업 ID를 바로 반환하는지 확인
+
+스텁 Graph 서버의 컨테이너는 몇 번의 상태 조회 뒤에야 FINISHED가 됩니다.
+"""
+import time
+from datetime import datetime, timedelta
+
+
+def wait_for(client, status_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('published', 'failed'):
+            return job
+        time.sleep(0.05)
+    return job
+
+
+def test_upload_returns_job_and_publishes_once(client, login, graph_server):
+    graph_server.latency = 0.05
+    graph_server.container_ready_polls = 2
+    published_before = len(graph_server.published)
+
+    accepted = []
+    for index in range(8):
+        start = time.perf_counter()
+        response = client.post('/upload_to_thread', json={'content': f"게시물 {index}"})
+        accepted.append((time.perf_counter() - start, response))
+    # 최소 게시 경로(컨테이너 생성 + 상태 조회 3회 + 게시)보다 빨리 응답해야 함
+    assert max(elapsed for elapsed, _ in accepted) < 0.05 * 5
+    assert all(response.status_code == 202 for _, response in accepted)
+
+    jobs = [wait_for(client, response.get_json()['status_url']) for _, response in accepted]
+    assert all(job['status'] == 'published' and job['thread_id'] for job in jobs)
+    published = graph_server.published[published_before:]
+    assert len(published) == len(jobs) == len(set(published))
+
+
+def test_job_status_is_private(client, login, make_user):
+    response = client.post('/upload_to_thread', json={'content': '다른 사용자에게 보이지 않는 작업'})
+    other = login(make_user())
+    assert other.get(response.get_json()['status_url']).status_code == 404
+
+
+def test_resume_runs_pending_and_stale_jobs(app, db, client, user):
+    from app_v1 import PublishJob, resume_publish_jobs
+
+    # 재시작 전에 남은 작업(대기 중 + 임대 만료된 실행 중)은 다시 실행되어야 함
+    with app.app_context():
+        queued = PublishJob(user_id=user, content='재시작 전 대기 작업')
+        stale = PublishJob(user_id=user, content='중단된 실행 작업', status='running',
+                           locked_until=datetime.utcnow() - timedelta(seconds=60))
+        db.session.add_all([queued, stale])
+        db.session.commit()
+        job_ids = [queued.id, stale.id]
+    resume_publish_jobs()
+    assert [wait_for(client, f"/publish_jobs/{job_id}")['status'] for job_id in job_ids] == ['published', 'published']
@@ -0,0 +1,120 @@
+"""예약 게시 스케줄러 확인
+
+예약 시각이 된 작업만 정확히 한 번 게시되는지, 두 개의 스케줄러(여러 gunicorn 워커 흉내)가 같은 작업을
+넘겨받아도 DB 임대로 중복 게시되지 않는지, 먼 미래 작업만 남았을 때 잠들어 있는지, 스케줄러가 import
+시점이 아니라 프로세스마다 첫 요청에서 시작되는지 확인합니다.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # 프로세스로 직접 실행할 때
+
+
+def test_due_jobs_publish_exactly_once(app, client, user, graph_server):
+    from app_v1 import PublishJob, PublishScheduler
+
+    graph_server.latency = 0.005
+    graph_server.container_ready_polls = 0
+    published_before = len(graph_server.published)
+    # 다른 워커 프로세스의 스케줄러: DB에서만 작업을 알게 됨
+    other_scheduler = PublishScheduler(ThreadPoolExecutor(max_workers=4).submit, resync_interval=1.0)
+
+    now = datetime.utcnow()
+    for index in range(200):
+        response = client.post('/scheduled_posts', json={
+            'content': f"먼 미래 게시물 {index}",
+            'scheduled_at': (now + timedelta(days=1, seconds=index)).isoformat() + 'Z'
+        })
+        assert response.status_code == 201
+    due_ids = []
+    due_start = datetime.utcnow()
+    for index in range(20):
+        response = client.post('/scheduled_posts', json={
+            'content': f"예약 게시물 {index}",
+            'scheduled_at': (due_start + timedelta(seconds=2 + (index % 10) * 0.2)).isoformat() + 'Z'
+        })
+        assert response.status_code == 201
+        due_ids.append(response.get_json()['job_id'])
+    other_scheduler.start()
+    assert client.delete(f"/scheduled_posts/{due_ids[-1]}").status_code == 200
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        with app.app_context():
+            remaining = PublishJob.query.filter(PublishJob.user_id == user, PublishJob.id.in_(due_ids),
+                                                PublishJob.status.in_(('queued', 'running'))).count()
+        if remaining == 0:
+            break
+        time.sleep(0.2)
+
+    with app.app_context():
+        published = PublishJob.query.filter_by(user_id=user, status='published').count()
+        future_started = PublishJob.query.filter(PublishJob.user_id == user,
+                                                 PublishJob.run_at > now + timedelta(hours=1),
+                                                 PublishJob.status != 'queued').count()
+    calls = graph_server.published[published_before:]
+    assert published == len(due_ids) - 1
+    assert len(calls) == len(set(calls)) == len(due_ids) - 1
+    assert future_started == 0
+
+    # 먼 미래 작업만 남은 상태에서는 두 스케줄러 모두 잠들어 있어야 함
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    time.sleep(2)
+    idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start) * 100
+    assert idle_cpu <= 2
+
+
+@pytest.mark.parametrize('scheduled_at', [None, 1700000000, 'tomorrow', '2020-01-01T00:00:00Z'])
+def test_invalid_schedule_times_are_rejected(client, scheduled_at):
+    response = client.post('/scheduled_posts', json={'content': '예약 게시물', 'scheduled_at': scheduled_at})
+    assert response.status_code == 400 and not response.get_json()['success']
+
+
+def scheduler_running():
+    return any(thread.name == 'publish-scheduler' for thread in threading.enumerate())
+
+
+def request_in_child(app):
+    """fork한 자식 프로세스에서 요청 전후의 스케줄러 실행 여부를 종료 코드로 돌려줌"""
+    pid = os.fork()
+    if pid == 0:
+        before = scheduler_running()
+        app.test_client().get('/', base_url='https://localhost')
+        os._exit(0 if not before and scheduler_running() else 1)
+    return os.waitpid(pid, 0)[1]
+
+
+def check_lazy_start():
+    """gunicorn --preload처럼 import한 프로세스에서 fork한 워커마다 첫 요청에서 시작되는지 확인"""
+    from app_v1 import app
+    if scheduler_running():
+        sys.exit('scheduler started at import')
+    if request_in_child(app) != 0:
+        sys.exit('forked worker did not start its scheduler on first request')
+    if scheduler_running():
+        sys.exit('parent started without a request')
+    app.test_client().get('/', base_url='https://localhost')
+    if not scheduler_running():
+        sys.exit('scheduler not started on first request')
+    if request_in_child(app) != 0:
+        sys.exit('worker forked after start did not start its own scheduler')
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork 필요')
+def test_scheduler_starts_lazily_per_process(app):
+    env = dict(os.environ, PUBLISH_RESUME_ON_START='True')
+    result = subprocess.run([sys.executable, __file__], env=env, cwd=ROOT, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+
+if __name__ == '__main__':
+    check_lazy_start()
@@ -0,0 +1,171 @@
+"""사용자별 RAG 인덱스 확인 (증분 추가, 프롬프트 예시, 영구 저장, 크기 제한, 워커 프로세스 간 공유)"""
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # 워커 프로세스로 직접 실행할 때
+
+import SnapsAI  # noqa: E402
+
+POSTS = [{'id': f"instagram:{i}", 'text': f"오늘의 카페 기록 {i} ☕️ #cafe", 'platform': 'Instagram', 'kind': 'post'}
+         for i in range(50)]
+
+
+@pytest.fixture
+def converter(tmp_path, llm_server):
+    return SnapsAI.RAGConverter(
+        index_store=SnapsAI.PostIndexStore(str(tmp_path / 'rag_index'), SnapsAI.RAG_INDEX_MAX_ITEMS),
+        embedding_cache=SnapsAI.EmbeddingCache(path=str(tmp_path / 'embeddings'))
+    )
+
+
+def test_incremental_indexing_embeds_only_new_posts(converter, llm_server):
+    llm_server.reset_counters()
+    assert converter.index_posts('user-1', POSTS) == 50
+    assert llm_server.paths.count('/v1/embeddings') == 1
+
+    llm_server.reset_counters()
+    new_post = {'id': 'instagram:new', 'text': '새 게시물 #new', 'platform': 'Instagram', 'kind': 'post'}
+    assert converter.index_posts('user-1', POSTS + [new_post]) == 1
+    assert llm_server.paths.count('/v1/embeddings') == 1
+
+
+def test_similar_posts_are_used_as_prompt_examples(converter, llm_server):
+    converter.index_posts('user-1', POSTS)
+    llm_server.reset_counters()
+    examples = converter.similar_posts('user-1', POSTS[0]['text'])
+    assert len(examples) == SnapsAI.RAG_TOP_K
+    assert llm_server.request_count == 0  # 인덱스에 있는 텍스트는 저장된 벡터 사용
+    assert all(example['text'] != POSTS[0]['text'] for example in examples)
+
+    prompt = converter.prompt.format(target_platform='Thread', original_post=POSTS[0]['text'], has_image=True,
+                                     style_examples=SnapsAI.format_style_examples(examples))
+    assert examples[0]['text'] in prompt
+    assert converter.generate_enhanced_post(POSTS[0]['text'], 'Thread', True, use_cache=False, user_key='user-1')
+
+
+def test_prompt_and_cache_key_unchanged_without_examples(converter):
+    plain = converter.prompt.format(target_platform='Thread', original_post='x', has_image=True, style_examples='')
+    legacy = SnapsAI.ENHANCED_POST_TEMPLATE.replace('{style_examples}', '').format(
+        target_platform='Thread', original_post='x', has_image=True)
+    assert plain == legacy
+    assert converter._cache_key('x', 'Thread', True) == SnapsAI.ConversionCache.make_key(
+        'x', 'Thread', True, SnapsAI.RAG_PROMPT_VERSION, SnapsAI.RAG_MODEL_NAME)
+
+
+def test_index_is_persisted(converter, tmp_path):
+    converter.index_posts('user-1', POSTS)
+    examples = converter.similar_posts('user-1', POSTS[0]['text'])
+
+    restored = SnapsAI.PostIndexStore(str(tmp_path / 'rag_index'), SnapsAI.RAG_INDEX_MAX_ITEMS).get('user-1')
+    vector = restored.vector_for(POSTS[0]['text'])
+    assert len(restored) == 50 and vector is not None
+    assert [e['id'] for e in restored.search(vector, SnapsAI.RAG_TOP_K, exclude_text=POSTS[0]['text'])] \
+        == [e['id'] for e in examples]
+
+
+def test_oldest_items_are_evicted(tmp_path):
+    rng = np.random.default_rng(0)
+    index = SnapsAI.PostIndex(os.path.join(str(tmp_path), 'eviction'), max_items=100)
+    for batch in range(3):
+        if batch == 2:
+            # 갱신된 항목은 최근 항목으로 이동하여 제거되지 않아야 함
+            index.upsert([{'id': 'e-10', 'text': 'e 10 updated'}], rng.standard_normal((1, 8), dtype=np.float32))
+        index.upsert([{'id': f"e-{batch * 50 + i}", 'text': f"e {batch * 50 + i}"} for i in range(50)],
+                     rng.standard_normal((50, 8), dtype=np.float32))
+    ids = set(SnapsAI.PostIndex(index.path, max_items=100).store.ids())
+    assert len(ids) == 100
+    assert 'e-10' in ids and 'e-51' in ids and 'e-149' in ids
+    assert 'e-0' not in ids and 'e-50' not in ids
+
+
+def test_cache_key_ignores_examples_and_hit_skips_embedding(converter, llm_server):
+    """예시는 인덱스에 따라 바뀌므로 캐시 키는 요청 입력만으로 정하고, 캐시 적중 시에는 임베딩하지 않아야 함"""
+    converter.index_posts('user-1', POSTS)
+    caption = '처음 보는 캡션이라 임베딩이 필요한 글 #new'
+    first = converter.generate_enhanced_post(caption, 'Thread', True, user_key='user-1')
+
+    converter.index_posts('user-1', [{'id': 'instagram:later', 'text': '나중에 올린 글', 'kind': 'post'}])
+    llm_server.reset_counters()
+    assert converter.generate_enhanced_post(caption, 'Thread', True, user_key='user-1') == first
+    assert list(converter.stream_enhanced_post(caption, 'Thread', True, user_key='user-1')) == [first]
+    assert llm_server.request_count == 0
+    assert converter._cache_key(caption, 'Thread', True, 'user-1') != converter._cache_key(caption, 'Thread', True)
+
+
+def test_conversions_are_not_used_as_examples(converter):
+    converter.index_posts('user-1', POSTS[:5] + [
+        {'id': f"conversion:{i}", 'text': f"오늘의 카페 기록 {i} ☕️ #cafe 변환", 'platform': 'Thread', 'kind': 'conversion'}
+        for i in range(5)])
+    examples = converter.similar_posts('user-1', POSTS[0]['text'], k=10)
+    assert examples and all(example['kind'] == 'post' for example in examples)
+
+
+
+def test_vector_store_backend_must_implement_interface():
+    class PartialStore(SnapsAI.VectorStore):
+        def __len__(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        PartialStore()
+    assert len(SnapsAI.create_vector_store('numpy')) == 0
+
+
+def item_vector(item_id, dim=8):
+    """id마다 고정된 벡터 (검증용)"""
+    return np.random.default_rng(int(item_id.rsplit('-', 1)[1])).standard_normal(dim).astype(np.float32)
+
+
+def assert_index_matches_disk(index):
+    restored = SnapsAI.PostIndex(index.path, max_items=index.max_items)
+    assert list(restored._items) == list(index._items)
+    for item_id in restored._items:
+        assert np.allclose(restored.store.get(item_id), index.store.get(item_id), atol=1e-6)
+
+
+def upsert_as_worker(path, worker, count):
+    index = SnapsAI.PostIndex(path, max_items=100)
+    for start in range(0, count, 10):
+        ids = [f"w{worker}-{worker * 1000 + i}" for i in range(start, start + 10)]
+        index.upsert([{'id': item_id, 'text': item_id} for item_id in ids], [item_vector(i) for i in ids])
+
+
+def test_workers_append_to_shared_index(tmp_path):
+    path = str(tmp_path / 'shared')
+    procs = [subprocess.Popen([sys.executable, __file__, path, str(worker), '60'], cwd=ROOT) for worker in range(3)]
+    assert [proc.wait() for proc in procs] == [0] * 3
+
+    index = SnapsAI.PostIndex(path, max_items=100)
+    assert len(index) == 100  # 워커 셋이 덧붙인 180개 중 최근 100개
+    for item_id in index._items:
+        assert np.allclose(index.store.get(item_id), item_vector(item_id) / np.linalg.norm(item_vector(item_id)),
+                           atol=1e-6)
+
+
+def test_store_reloads_other_worker_writes_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(SnapsAI.PostIndex, 'COMPACT_MIN_RECORDS', 50)
+    root = str(tmp_path / 'rag_index')
+    writer = SnapsAI.PostIndexStore(root, max_items=30)
+    reader = SnapsAI.PostIndexStore(root, max_items=30)
+    assert len(reader.get('user-1')) == 0
+
+    for batch in range(10):
+        ids = [f"p-{batch * 10 + i}" for i in range(10)]
+        writer.get('user-1').upsert([{'id': i, 'text': i} for i in ids], [item_vector(i) for i in ids])
+        index = reader.get('user-1')  # 다른 워커의 추가/제거/compaction을 읽음
+        assert list(index._items) == list(writer.get('user-1')._items)
+        assert np.allclose(index.store.get(ids[-1]), writer.get('user-1').store.get(ids[-1]), atol=1e-6)
+
+    index = writer.get('user-1')
+    assert len(index) == 30 and index._records < 50
+    assert len([name for name in os.listdir(index.path) if name.endswith('.f32')]) == 1
+    assert_index_matches_disk(index)
+
+
+if __name__ == '__main__':
+    upsert_as_worker(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
@@ -0,0 +1,87 @@
+"""Graph API 토큰별 호출 예산(GraphRateLimiter) 확인
+
+스텁 Graph 서버는 사용량 헤더를 보내고, 한도를 넘은 호출은 Graph API처럼 오류 코드 4(HTTP 403)로 거부합니다.
+"""
+import threading
+import time
+
+from SnapsAI import GraphTransport, GraphRateLimiter, graph_priority, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+def burst(transport, url, token, calls, threads):
+    statuses = []
+    lock = threading.Lock()
+
+    def worker(count):
+        for _ in range(count):
+            try:
+                status = transport.get(url, params={'access_token': token, 'limit': 1}).status_code
+            except Exception as e:
+                status = type(e).__name__
+            with lock:
+                statuses.append(status)
+
+    workers = [threading.Thread(target=worker, args=(calls // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return statuses
+
+
+def test_budget_paces_calls_under_usage_limit(graph_server, monkeypatch):
+    import SnapsAI
+    monkeypatch.setattr(SnapsAI, 'GRAPH_RATE_COOLDOWN', 1)
+    graph_server.usage_limit = 50
+    graph_server.usage_window = 1.0
+    url = f"{graph_server.url}/v1.0/me/media"
+
+    statuses = burst(GraphTransport(max_retries=0), url, 'burst-none', 160, 8)
+    assert graph_server.rate_limited_count > 0 and statuses.count(200) < len(statuses)
+
+    time.sleep(graph_server.usage_window)
+    graph_server.rate_limited_count = 0
+    limiter = GraphRateLimiter(rate=200, capacity=20)
+    transport = GraphTransport(rate_limiter=limiter, max_retries=5)
+    statuses = burst(transport, url, 'burst-budget', 160, 8)
+    assert statuses.count(200) == len(statuses)
+
+    # 한도에 걸린 토큰과 별개로 다른 토큰은 바로 호출되어야 함
+    limiter.budget('burst-budget').update(usage=100, regain_seconds=5)
+    start = time.perf_counter()
+    response = transport.get(url, params={'access_token': 'other-token', 'limit': 1})
+    assert response.status_code == 200
+    assert time.perf_counter() - start < 0.5
+
+
+def test_interactive_calls_are_prioritised(graph_server):
+    url = f"{graph_server.url}/v1.0/me/media"
+    transport = GraphTransport(rate_limiter=GraphRateLimiter(rate=20, capacity=5))
+    stop = threading.Event()
+    background_waits = []
+
+    def background():
+        with graph_priority(PRIORITY_BACKGROUND):
+            while not stop.is_set():
+                start = time.perf_counter()
+                transport.get(url, params={'access_token': 'shared-token', 'limit': 1})
+                background_waits.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=background) for _ in range(4)]
+    for thread in workers:
+        thread.start()
+    time.sleep(1)
+    interactive_waits = []
+    with graph_priority(PRIORITY_INTERACTIVE):
+        for _ in range(10):
+            start = time.perf_counter()
+            transport.get(url, params={'access_token': 'shared-token', 'limit': 1})
+            interactive_waits.append(time.perf_counter() - start)
+            time.sleep(0.1)
+    stop.set()
+    for thread in workers:
+        thread.join()
+
+    interactive = sum(interactive_waits) / len(interactive_waits)
+    background_wait = sum(background_waits) / len(background_waits)
+    assert interactive * 3 < background_wait
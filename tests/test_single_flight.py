@@ -0,0 +1,112 @@
+"""동일한 동시 요청 합치기(single-flight) 확인
+
+같은 요청을 여러 탭(스레드)이나 워커 프로세스가 동시에 보내도, Graph 스텁이 받는 요청 수가 한 탭만
+요청할 때보다 많지 않아야 합니다.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # 워커 프로세스로 직접 실행할 때
+
+
+def run_concurrently(count, fn):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        results[index] = fn()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_transport_coalesces_identical_gets(graph_server):
+    from SnapsAI import GraphTransport, SingleFlight
+    graph_server.latency = 0.05
+    transport = GraphTransport(single_flight=SingleFlight())
+    graph_server.reset_counters()
+    run_concurrently(8, lambda: transport.get(
+        f"{graph_server.url}/v1.0/me/media", params={'access_token': 'tab-token', 'limit': 5}).json())
+    assert graph_server.request_count == 1
+
+
+def test_coalesced_calls_get_their_own_response(graph_server):
+    from SnapsAI import GraphTransport, SingleFlight
+    graph_server.latency = 0.05
+    transport = GraphTransport(single_flight=SingleFlight())
+    graph_server.reset_counters()
+    responses = run_concurrently(8, lambda: transport.get(
+        f"{graph_server.url}/v1.0/me/media", params={'access_token': 'copy-token', 'limit': 5}))
+    assert graph_server.request_count == 1
+    assert len({id(response) for response in responses}) == 8
+
+    # 한 호출이 파싱 결과나 헤더를 고쳐도 다른 호출의 응답은 그대로
+    first = responses[0].json()
+    first['data'].clear()
+    responses[0].headers['X-Test'] = 'changed'
+    for response in responses[1:]:
+        assert response.status_code == 200 and len(response.json()['data']) == 5
+        assert 'X-Test' not in response.headers
+
+
+@pytest.mark.parametrize('method,path', [('POST', '/fetch_posts'), ('GET', '/fetch_thread_posts'),
+                                         ('GET', '/thread_statistics')])
+def test_tabs_of_one_user_share_a_sync(method, path, make_user, login, graph_server):
+    graph_server.latency = 0.05
+
+    def tab_request(user_id):
+        return login(user_id).open(path, method=method, json={} if method == 'POST' else None).status_code
+
+    single = make_user()
+    graph_server.reset_counters()
+    assert tab_request(single) == 200
+    one_tab = graph_server.request_count
+
+    user_id = make_user()
+    graph_server.reset_counters()
+    statuses = run_concurrently(8, lambda: tab_request(user_id))
+    assert statuses == [200] * 8
+    assert graph_server.request_count <= one_tab
+
+
+def request_as_worker(user_id, start_at):
+    """다른 워커 프로세스처럼 앱을 불러 start_at 시각에 /thread_statistics를 요청"""
+    from app_v1 import app
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    time.sleep(max(0.0, start_at - time.time()))
+    response = client.get('/thread_statistics', base_url='https://localhost')
+    sys.exit(0 if response.status_code == 200 else 1)
+
+
+def test_worker_processes_share_a_sync_through_lock_dir(make_user, login, graph_server, tmp_path):
+    graph_server.latency = 0.05
+    single = make_user()
+    graph_server.reset_counters()
+    assert login(single).get('/thread_statistics').status_code == 200
+    one_worker = graph_server.request_count
+
+    user_id = make_user()
+    env = dict(os.environ, SINGLE_FLIGHT_LOCK_DIR=str(tmp_path))
+    start_at = time.time() + 5  # 두 프로세스가 앱을 다 불러온 뒤 동시에 요청
+    graph_server.reset_counters()
+    children = [subprocess.Popen([sys.executable, __file__, str(user_id), str(start_at)], env=env, cwd=ROOT)
+                for _ in range(2)]
+    assert [process.wait() for process in children] == [0, 0]
+    assert graph_server.request_count <= one_worker
+
+
+if __name__ == '__main__':
+    request_as_worker(int(sys.argv[1]), float(sys.argv[2]))
@@ -0,0 +1,75 @@
+"""스트리밍 라우트 확인 (게시물 전체 이력 NDJSON, 여러 플랫폼 동시 변환 SSE)"""
+import json
+
+
+def ndjson(response):
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_fetch_posts_stream(client, graph_server):
+    graph_server.post_count = 40
+    posts = ndjson(client.get('/fetch_posts/stream'))
+    assert [post['id'] for post in posts] == [f"media_{index}" for index in range(40)]
+    assert all(post['caption'].endswith('#stub #snaps') for post in posts)
+
+    assert len(ndjson(client.get('/fetch_posts/stream?max_items=15'))) == 15
+
+
+def test_fetch_thread_posts_stream(client, graph_server):
+    graph_server.post_count = 40
+    posts = ndjson(client.get('/fetch_thread_posts/stream'))
+    assert [post['id'] for post in posts] == [f"media_{index}" for index in range(40)]
+
+    # since(unix time)보다 오래된 게시물은 제외 (스텁 게시물은 한 시간 간격)
+    posts = ndjson(client.get(f"/fetch_thread_posts/stream?since={1700000000 - 9 * 3600}"))
+    assert [post['id'] for post in posts] == [f"media_{index}" for index in range(10)]
+
+
+def test_stream_routes_require_login(app):
+    client = app.test_client()
+    assert client.get('/fetch_posts/stream', base_url='https://localhost').status_code == 401
+    assert client.get('/fetch_thread_posts/stream', base_url='https://localhost').status_code == 401
+
+
+def test_convert_all_stream_workers_share_request_context(app, user):
+    """플랫폼별 스트림 워커의 LLM 시간도 요청의 의존성 시간으로 집계되어야 함"""
+    from flask import session
+    from SnapsAI import track_dependencies
+    import app_v1
+    body = {'caption': '주말 브런치 🥞 #stream', 'platforms': ['instagram', 'thread'], 'forceRegenerate': True}
+    with app.test_request_context('/convert_all/stream', method='POST', json=body,
+                                  base_url='https://localhost'), track_dependencies() as timings:
+        session['user_id'] = user
+        events = app_v1.convert_all_stream().get_data(as_text=True)
+    assert events.count('event: done') == 2 and 'event: end' in events
+    assert timings.totals.get('llm', 0) > 0
+
+
+def test_convert_all_stream_stops_producers_on_disconnect(client, llm_server):
+    """클라이언트가 연결을 끊으면 플랫폼별 스트림도 남은 토큰을 받지 않고 멈춰야 함"""
+    import time
+    llm_server.token_latency = 0.01  # 스트림 하나에 약 1.5초
+    body = {'caption': '연결을 끊을 캡션 #disconnect', 'platforms': ['instagram', 'thread'], 'forceRegenerate': True}
+    response = client.post('/convert_all/stream', json=body, buffered=False)
+    events = iter(response.response)
+    while b'event: chunk' not in next(events):
+        pass
+    response.close()
+
+    time.sleep(3)  # 멈추지 않았다면 두 스트림 모두 끝까지 받았을 시간
+    assert llm_server.completed_streams == 0
+
+
+def test_empty_stream_is_not_cached():
+    import SnapsAI
+
+    class EmptyLLM:
+        def stream(self, prompt):
+            return iter(())
+
+    converter = SnapsAI.RAGConverter(cache=SnapsAI.ConversionCache(path=None))
+    converter.llm = EmptyLLM()
+    assert list(converter.stream_enhanced_post('빈 응답 캡션', 'Thread', True)) == []
+    assert converter.cache.get(converter._cache_key('빈 응답 캡션', 'Thread', True)) is None
@@ -0,0 +1,76 @@
+"""/fetch_thread_posts 가 게시물 수와 관계없이 일정한 수의 Graph API 요청만 보내는지 확인
+
+게시물 수마다 새 사용자로 첫 동기화를 하고, 이어서 저장소에서 응답하는 두 번째 요청을 확인합니다.
+insights 필드 확장 거부는 그 토큰의 클라이언트에만 적용되어야 합니다.
+"""
+import json
+
+import pytest
+import requests
+
+
+def fetch(client, graph_server, post_count):
+    graph_server.reset_counters()
+    response = client.get('/fetch_thread_posts?limit=1000')
+    posts = response.get_json().get('posts', [])
+    assert response.status_code == 200
+    assert len(posts) == post_count and 'likes' in posts[0]
+    return graph_server.request_count
+
+
+@pytest.mark.parametrize('post_count', [5, 25, 100])
+def test_nested_insights_sync_in_constant_requests(post_count, make_user, login, graph_server):
+    graph_server.post_count = post_count
+    client = login(make_user())
+    assert fetch(client, graph_server, post_count) <= 2
+    assert fetch(client, graph_server, post_count) <= 1
+
+
+@pytest.mark.parametrize('post_count', [5, 25])
+def test_falls_back_to_per_post_insights(post_count, make_user, login, graph_server):
+    graph_server.nested_insights = False
+    graph_server.post_count = post_count
+    client = login(make_user())
+    fetch(client, graph_server, post_count)
+    assert fetch(client, graph_server, post_count) <= 1
+
+
+def test_fallback_is_scoped_to_the_rejected_token(make_user, login, graph_server):
+    from SnapsAI import thread_client
+    graph_server.nested_insights = False
+    fetch(login(make_user(thread_access_token='rejected-th')), graph_server, 25)
+    assert not thread_client('rejected-th').nested_insights_enabled()
+
+    # 다른 토큰은 계속 insights 필드 확장으로 한 번에 조회
+    graph_server.nested_insights = True
+    assert fetch(login(make_user()), graph_server, 25) <= 2
+
+
+def graph_error(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps(body).encode('utf-8')
+    return requests.HTTPError(response=response)
+
+
+def test_only_unsupported_field_errors_disable_nested_insights(monkeypatch):
+    from SnapsAI import ThreadAPI
+    api = ThreadAPI('token', transport=object())
+    expired = graph_error(400, {'error': {'message': 'Error validating access token', 'type': 'OAuthException',
+                                          'code': 190}})
+    assert not api._check_nested_insights_error(expired)
+    assert not api._check_nested_insights_error(graph_error(400, {'error': {'message': 'Invalid parameter',
+                                                                             'code': 100}}))
+    assert api.nested_insights_enabled()
+
+    unsupported = graph_error(400, {'error': {'message': 'Tried accessing nonexisting field (insights)',
+                                              'code': 100}})
+    assert api._check_nested_insights_error(unsupported)
+    assert not api.nested_insights_enabled()
+    assert ThreadAPI('other-token', transport=object()).nested_insights_enabled()
+
+    # 일정 시간이 지나면 다시 시도
+    monkeypatch.setattr(ThreadAPI, 'NESTED_INSIGHTS_RETRY_AFTER', 0)
+    assert api._check_nested_insights_error(unsupported)
+    assert api.nested_insights_enabled()
@@ -0,0 +1,72 @@
+"""/thread_statistics 가 일별 집계 테이블에서 응답하는지 확인 (Graph API 호출 예산은 기본값)
+
+첫 요청은 threads_insights를 한 번(시계열 지표) + 하루당 한 번(합계 지표) 조회해 집계를 채우고,
+이후 요청은 Graph API를 호출하지 않아야 합니다. 요청 안에서 채우지 못한 과거 구간은 백그라운드에서 채웁니다.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def statistics(client, graph_server, query=''):
+    graph_server.reset_counters()
+    response = client.get(f"/thread_statistics{query}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['likes_data']) == len(data['dates'])
+    assert data['total_likes'] == sum(data['likes_data'])
+    assert data['total_views'] > 0
+    return data, graph_server.request_count
+
+
+@pytest.fixture
+def stats_client(login, make_user):
+    return login(make_user())
+
+
+def test_rollups_are_served_from_the_store(stats_client, graph_server):
+    today = datetime.utcnow().date()
+    data, requests_made = statistics(stats_client, graph_server)
+    assert requests_made <= 31
+    assert (data['granularity'], len(data['dates'])) == ('day', 30)
+
+    data, requests_made = statistics(stats_client, graph_server)
+    assert requests_made == 0 and len(data['dates']) == 30
+
+    data, requests_made = statistics(stats_client, graph_server, f"?since={(today - timedelta(days=6)).isoformat()}")
+    assert requests_made == 0 and len(data['dates']) == 7
+
+
+def test_backfill_runs_in_background_under_default_budget(stats_client, graph_server):
+    query = f"?since={(datetime.utcnow().date() - timedelta(days=89)).isoformat()}&granularity=day"
+    start = time.perf_counter()
+    data, _ = statistics(stats_client, graph_server, query)
+    assert time.perf_counter() - start < 2  # 요청 안에서는 burst 안의 최근 30일만 조회
+    assert data['backfill_pending'] and len(data['dates']) == 90
+
+    # 백그라운드 작업이 도는 동안에도 요청은 저장된 집계로 바로 응답
+    deadline = time.monotonic() + 60
+    while data['backfill_pending']:
+        assert time.monotonic() < deadline
+        time.sleep(1)
+        start = time.perf_counter()
+        data = stats_client.get(f"/thread_statistics{query}").get_json()
+        assert time.perf_counter() - start < 1
+    assert graph_server.request_count <= 90 + 3  # 하루당 한 번 + 구간(30일)당 시계열 한 번
+
+    data, requests_made = statistics(stats_client, graph_server, query)
+    assert requests_made == 0 and not data['backfill_pending']
+    assert all(data['likes_data']) and len(data['likes_data']) == 90
+
+
+def test_granularity(stats_client, graph_server):
+    since = (datetime.utcnow().date() - timedelta(days=29)).isoformat()
+    daily, _ = statistics(stats_client, graph_server, f"?since={since}&granularity=day")
+    weekly, requests_made = statistics(stats_client, graph_server, f"?since={since}&granularity=week")
+    assert requests_made == 0
+    assert weekly['granularity'] == 'week' and len(weekly['dates']) < len(daily['dates'])
+    for metric in ('views', 'likes', 'replies', 'reposts', 'quotes'):
+        assert daily[f'total_{metric}'] == weekly[f'total_{metric}']
+
+    assert stats_client.get('/thread_statistics?granularity=hour').status_code == 400